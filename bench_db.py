@@ -0,0 +1,233 @@
+# Database benchmark.
+#
+# Builds a synthetic DB (100k matches by default) with the full schema, then
+# times the bot's hot queries against a copy stripped back to a rollback
+# journal and no secondary indexes ("before") and against the migrated DB
+# with WAL, synchronous=NORMAL and indexes ("after"). Prints one JSON object
+# per query:
+#
+#   python bench_db.py --output bench_output.txt
+#   python bench_db.py --matches 500000 --players 50000 --repeat 50
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from migrations import migrate, SCHEMA_VERSION
+from regions import REGION_ROLE_NAMES, regions_to_mask
+from timestamps import now_ts
+
+STATUSES = ["IDLE"] * 90 + ["IN_QUEUE"] * 8 + ["IN_MATCH"] * 2
+
+# (name, sql, params factory) mirroring the queries in db.py
+QUERIES = [
+    ("queued_players", """
+        SELECT discord_id, mmr, queue_time, region_mask FROM players WHERE queue_status = 'IN_QUEUE'
+    """, lambda rng, n: ()),
+    ("queue_timeouts", """
+        SELECT discord_id FROM players WHERE queue_status = 'IN_QUEUE' AND queue_time <= ?
+    """, lambda rng, n: (now_ts() - rng.randrange(50 * 60, 60 * 60),)),
+    ("ping_candidates", """
+        SELECT discord_id, ping FROM players
+        WHERE queue_status = 'IDLE'
+        AND ping IN (?, ?)
+        AND mmr BETWEEN ? AND ?
+        AND region_mask & ? != 0
+        AND (ping_time IS NULL OR ping_time < ?)
+    """, lambda rng, n: (1, 2, *_mmr_window(rng), _region_mask(rng), now_ts() - 60 * 60)),
+    ("leaderboard", """
+        SELECT discord_id, mmr, wins, losses FROM players WHERE wins > 0 OR losses > 0
+    """, lambda rng, n: ()),
+    ("recent_matches", """
+        SELECT player1_id, player2_id, winner_id, created_at
+        FROM matches
+        WHERE player1_id = ? OR player2_id = ?
+            AND status == 'REPORTED'
+            AND winner_id IS NOT NULL
+        ORDER BY created_at DESC
+        LIMIT 5
+    """, lambda rng, n: (_player(rng, n),) * 2),
+    ("pending_matches", """
+        SELECT m.match_id, m.player1_id, m.player2_id, m.created_at, p1.region_mask, p2.region_mask
+        FROM matches m
+        JOIN players p1 ON p1.discord_id = m.player1_id
+        JOIN players p2 ON p2.discord_id = m.player2_id
+        WHERE m.status = 'WAITING_CONFIRM'
+    """, lambda rng, n: ()),
+    ("active_match_channels", """
+        SELECT channel_id, match_id FROM matches WHERE status = 'CONFIRMED' AND channel_id IS NOT NULL
+    """, lambda rng, n: ()),
+]
+
+
+def _player(rng, n):
+    return str(rng.randrange(n))
+
+
+def _region_mask(rng):
+    return regions_to_mask(rng.sample(REGION_ROLE_NAMES, rng.choice((1, 1, 2))))
+
+
+def _mmr_window(rng):
+    centre = rng.randint(600, 1400)
+    return centre - 160, centre + 160
+
+
+def populate(path, players, matches, seed):
+    rng = random.Random(seed)
+    now = now_ts()
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO players (discord_id, ign, platform, mmr, rankcheck_date, wins, losses, queue_status, queue_time, region_mask, ping, ping_time) "
+        "VALUES (?, ?, 'epic', ?, ?, 0, 0, ?, ?, ?, ?, ?)",
+        [
+            (
+                str(i), f"player{i}", max(0, int(rng.gauss(1000, 200))), now,
+                rng.choice(STATUSES), now - rng.randrange(60 * 60),
+                _region_mask(rng),
+                rng.choice((0, 0, 0, 1, 2)),
+                now - rng.randrange(48 * 60 * 60) if rng.random() < 0.5 else None,
+            )
+            for i in range(players)
+        ]
+    )
+
+    rows = []
+    results = {}
+    for match_id in range(1, matches + 1):
+        p1, p2 = rng.sample(range(players), 2)
+        status = rng.choices(("REPORTED", "CANCELED", "CONFIRMED", "WAITING_CONFIRM"), (94, 4, 1, 1))[0]
+        winner = rng.choice((p1, p2)) if status == "REPORTED" else None
+        if winner is not None:
+            loser = p2 if winner == p1 else p1
+            results.setdefault(winner, [0, 0])[0] += 1
+            results.setdefault(loser, [0, 0])[1] += 1
+        created = now - (matches - match_id) * 120
+        rows.append((
+            match_id, str(p1), str(p2), status, str(winner) if winner is not None else None,
+            rng.randrange(10**17, 10**18) if status == "CONFIRMED" else None, created
+        ))
+    conn.executemany(
+        "INSERT INTO matches (match_id, player1_id, player2_id, status, winner_id, channel_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.executemany(
+        "UPDATE players SET wins = ?, losses = ? WHERE discord_id = ?",
+        [(wins, losses, str(pid)) for pid, (wins, losses) in results.items()]
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def strip_to_baseline(path):
+    conn = sqlite3.connect(path)
+    indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall()
+    for (name,) in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def time_queries(path, players, repeat, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    timings = {}
+    for name, sql, params in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            args = params(rng, players)
+            started = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params(rng, players))]
+        timings[name] = (samples, plan)
+    conn.close()
+    return timings
+
+
+def time_writes(path, players, repeat, seed):
+    # Queue join/leave as the bot issues them: one small transaction each
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        conn.execute("PRAGMA synchronous = NORMAL")
+    samples = []
+    for _ in range(repeat):
+        discord_id = _player(rng, players)
+        started = time.perf_counter()
+        conn.execute("UPDATE players SET queue_status = 'IN_QUEUE', queue_time = ? WHERE discord_id = ?", (now_ts(), discord_id))
+        conn.commit()
+        conn.execute("UPDATE players SET queue_status = 'IDLE' WHERE discord_id = ?", (discord_id,))
+        conn.commit()
+        samples.append((time.perf_counter() - started) * 1000)
+    conn.close()
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "p50": round(statistics.median(ordered), 3),
+        "p90": round(ordered[int(len(ordered) * 0.9) - 1], 3),
+        "max": round(ordered[-1], 3),
+        "mean": round(statistics.fmean(ordered), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare hot query latency before and after the schema migrations.")
+    parser.add_argument("--matches", type=int, default=100_000)
+    parser.add_argument("--players", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=200, help="runs per query")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="append JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="duelsbot-bench-")
+    before = os.path.join(workdir, "before.db")
+    after = os.path.join(workdir, "after.db")
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        migrate(after)
+        populate(after, args.players, args.matches, args.seed)
+        shutil.copyfile(after, before)
+        strip_to_baseline(before)
+
+        base = {"matches": args.matches, "players": args.players, "repeat": args.repeat}
+        results = {}
+        for label, path in (("before", before), ("after", after)):
+            results[label] = time_queries(path, args.players, args.repeat, args.seed)
+            results[label]["queue_join_leave"] = (time_writes(path, args.players, args.repeat, args.seed), [])
+
+        for name in results["before"]:
+            before_samples, before_plan = results["before"][name]
+            after_samples, after_plan = results["after"][name]
+            out.write(json.dumps({
+                **base,
+                "query": name,
+                "before_ms": summarize(before_samples),
+                "after_ms": summarize(after_samples),
+                "speedup_p50": round(statistics.median(before_samples) / max(statistics.median(after_samples), 1e-6), 1),
+                "before_plan": before_plan,
+                "after_plan": after_plan,
+                "schema_version": SCHEMA_VERSION,
+            }) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
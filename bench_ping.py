@@ -0,0 +1,174 @@
+# Ping candidate benchmark.
+#
+# Builds a synthetic DB (20k players, 2k of them ping subscribers by
+# default) and times what a !q does to find and mark players to ping:
+#
+#   candidates  the SQL scan the bot used to run ("before") against
+#               Database.get_ping_candidates served from the PingIndex ("after")
+#   ping_times  one UPDATE per pinged player ("before") against the single
+#               batched UPDATE in Database.set_ping_times ("after")
+#
+# Prints one JSON object per measurement:
+#
+#   python bench_ping.py --output bench_output.txt
+#   python bench_ping.py --players 50000 --subscribers 10000
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from bench_db import STATUSES, summarize, _mmr_window, _region_mask
+from db import Database
+from migrations import migrate
+from timestamps import now_ts
+
+PING_MODES = (1, 2)
+
+CANDIDATES_SQL = """
+    SELECT discord_id, ping FROM players
+    WHERE queue_status = 'IDLE'
+    AND ping IN (?, ?)
+    AND mmr BETWEEN ? AND ?
+    AND region_mask & ? != 0
+    AND (ping_time IS NULL OR ping_time < ?)
+"""
+
+
+def populate(path, players, subscribers, seed):
+    rng = random.Random(seed)
+    now = now_ts()
+    subscribed = set(rng.sample(range(players), subscribers))
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO players (discord_id, ign, platform, mmr, rankcheck_date, queue_status, queue_time, region_mask, ping, ping_time) "
+        "VALUES (?, ?, 'epic', ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                str(i), f"player{i}", max(0, int(rng.gauss(1000, 200))), now,
+                rng.choice(STATUSES), now - rng.randrange(60 * 60),
+                _region_mask(rng),
+                rng.choice(PING_MODES) if i in subscribed else 0,
+                now - rng.randrange(4 * 60 * 60) if rng.random() < 0.5 else None,
+            )
+            for i in range(players)
+        ]
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def lookups(rng, repeat):
+    cutoff = now_ts() - 60 * 60
+    return [(*_mmr_window(rng), _region_mask(rng), cutoff) for _ in range(repeat)]
+
+
+def time_sql_candidates(path, args):
+    conn = sqlite3.connect(path)
+    samples, results = [], []
+    for min_mmr, max_mmr, mask, cutoff in args:
+        started = time.perf_counter()
+        rows = conn.execute(CANDIDATES_SQL, (*PING_MODES, min_mmr, max_mmr, mask, cutoff)).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+        results.append(sorted(rows))
+    conn.close()
+    return samples, results
+
+
+async def time_index_candidates(path, args):
+    db = Database(path)
+    await db.load_players()
+    samples, results = [], []
+    for min_mmr, max_mmr, mask, cutoff in args:
+        started = time.perf_counter()
+        rows = await db.get_ping_candidates(PING_MODES, min_mmr, max_mmr, cutoff, mask)
+        samples.append((time.perf_counter() - started) * 1000)
+        results.append(sorted(rows))
+    db.close()
+    return samples, results
+
+
+def time_row_updates(path, batches):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous = NORMAL")
+    samples = []
+    for ids in batches:
+        started = time.perf_counter()
+        for discord_id in ids:
+            conn.execute("UPDATE players SET ping_time = ? WHERE discord_id = ?", (now_ts(), discord_id))
+            conn.commit()
+        samples.append((time.perf_counter() - started) * 1000)
+    conn.close()
+    return samples
+
+
+async def time_batched_updates(path, batches):
+    db = Database(path)
+    samples = []
+    for ids in batches:
+        started = time.perf_counter()
+        await db.set_ping_times(ids, now_ts())
+        samples.append((time.perf_counter() - started) * 1000)
+    db.close()
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare ping candidate lookup and ping_time writes before and after the PingIndex.")
+    parser.add_argument("--players", type=int, default=20_000)
+    parser.add_argument("--subscribers", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=200, help="lookups / write batches per measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="append JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="duelsbot-bench-")
+    path = os.path.join(workdir, "ping.db")
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        migrate(path)
+        populate(path, args.players, args.subscribers, args.seed)
+        rng = random.Random(args.seed)
+        base = {"players": args.players, "subscribers": args.subscribers, "repeat": args.repeat}
+
+        queries = lookups(rng, args.repeat)
+        before_samples, before_rows = time_sql_candidates(path, queries)
+        after_samples, after_rows = asyncio.run(time_index_candidates(path, queries))
+        if before_rows != after_rows:
+            raise SystemExit("PingIndex candidates differ from the SQL query")
+
+        # Write batches the size of what the lookups actually found
+        batches = [[discord_id for discord_id, _ in rows] or [str(rng.randrange(args.players))] for rows in before_rows]
+        row_samples = time_row_updates(path, batches)
+        batched_samples = asyncio.run(time_batched_updates(path, batches))
+
+        found = [len(rows) for rows in before_rows]
+        for name, before, after in (
+            ("candidates", before_samples, after_samples),
+            ("ping_times", row_samples, batched_samples),
+        ):
+            out.write(json.dumps({
+                **base,
+                "measurement": name,
+                "candidates_found": {"p50": statistics.median(found), "max": max(found)},
+                "before_ms": summarize(before),
+                "after_ms": summarize(after),
+                "speedup_p50": round(statistics.median(before) / max(statistics.median(after), 1e-6), 1),
+            }) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import discord
+
+from guilds import guilds
+from db import db
+from outbound import outbound, MATCH, REPLY
+
+POOL_CATEGORY = "Feer Duels - 2mans"
+POOL_PREFIX = "duel-room-"
+MIN_IDLE = 2
+MAX_IDLE = 15
+THROUGHPUT_WINDOW_SECONDS = 15 * 60  # Keep roughly this window's worth of leases warm
+
+# Pooled channels keep their name: Discord only allows two renames per
+# channel every 10 minutes, so leasing edits the overwrites alone and the
+# match id is posted in the channel instead.
+
+
+class ChannelPool:
+    def __init__(self):
+        self.idle = deque()
+        self.leased = {}  # channel id -> match id
+        self.names = {}  # channel id -> name, for every channel the pool owns
+        self.recent_leases = deque()
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+        self._create_lock = asyncio.Lock()
+        self._replenishing = False
+
+    def is_pooled(self, channel):
+        return channel.name.startswith(POOL_PREFIX)
+
+    def target_idle(self):
+        cutoff = time.time() - THROUGHPUT_WINDOW_SECONDS
+        while self.recent_leases and self.recent_leases[0] < cutoff:
+            self.recent_leases.popleft()
+        return max(MIN_IDLE, min(MAX_IDLE, len(self.recent_leases)))
+
+    def _idle_overwrites(self, guild):
+        return {guild.default_role: discord.PermissionOverwrite(read_messages=False)}
+
+    async def load(self, guild):
+        async with self._load_lock:
+            if self.loaded:
+                return
+            category = guilds.category(POOL_CATEGORY)
+            if category is None:
+                logging.warning(f"⚠️ Category '{POOL_CATEGORY}' not found; match channels can't be pooled")
+                return
+
+            in_use = await db.get_active_match_channels()
+
+            for channel in category.text_channels:
+                if not self.is_pooled(channel):
+                    continue
+                self.names[channel.id] = channel.name
+                if channel.id in in_use:
+                    self.leased[channel.id] = in_use[channel.id]
+                else:
+                    self.idle.append(channel)
+
+            self.loaded = True
+            logging.info(f"🏊 Channel pool loaded: {len(self.idle)} idle, {len(self.leased)} in use")
+
+    def _next_name(self):
+        # Lowest number not taken by one of our idle or leased channels
+        taken = {name[len(POOL_PREFIX):] for name in self.names.values()}
+        n = 1
+        while str(n) in taken:
+            n += 1
+        return f"{POOL_PREFIX}{n}"
+
+    async def _create(self, guild, overwrites, priority=REPLY):
+        # Serialised so a lease and the top-up can't pick the same name
+        async with self._create_lock:
+            category = guilds.category(POOL_CATEGORY)
+            name = self._next_name()
+            channel = await outbound.call(priority, f"guild:{guild.id}", guild.create_text_channel,
+                                          name=name, overwrites=overwrites, category=category,
+                                          idempotent=False, description=f"create #{name}")
+            self.names[channel.id] = channel.name
+            return channel
+
+    def _forget(self, channel):
+        self.leased.pop(channel.id, None)
+        self.names.pop(channel.id, None)
+
+    async def lease(self, guild, match_id, overwrites):
+        await self.load(guild)
+        self.recent_leases.append(time.time())
+
+        channel = None
+        while self.idle and channel is None:
+            candidate = self.idle.popleft()
+            if guild.get_channel(candidate.id) is not None:
+                channel = candidate
+            else:
+                self._forget(candidate)
+
+        if channel is None:
+            logging.info(f"[MATCH {match_id}] 🏊 Pool empty, creating a new match channel")
+            channel = await self._create(guild, overwrites, MATCH)
+        else:
+            await outbound.call(MATCH, f"channel:{channel.id}", channel.edit, overwrites=overwrites,
+                                reason=f"Leased for match {match_id}", description=f"lease #{channel.name}")
+
+        self.leased[channel.id] = match_id
+        self.schedule_replenish(guild)
+        return channel
+
+    async def release(self, channel, reason="Match reported"):
+        match_id = self.leased.pop(channel.id, None)
+        if not self.is_pooled(channel):
+            # Channels created before pooling existed are simply removed
+            await outbound.call(REPLY, f"channel:{channel.id}", channel.delete, reason=reason,
+                                description=f"delete #{channel.name}")
+            return
+
+        if len(self.idle) >= self.target_idle():
+            self._forget(channel)
+            await outbound.call(REPLY, f"channel:{channel.id}", channel.delete, reason=f"{reason} (pool shrinking)",
+                                description=f"delete #{channel.name}")
+            logging.info(f"🏊 Deleted #{channel.name}; pool already has {len(self.idle)} idle")
+            return
+
+        bucket = f"channel:{channel.id}"
+        await outbound.call(REPLY, bucket, channel.purge, limit=None, description=f"purge #{channel.name}")
+        await outbound.call(REPLY, bucket, channel.edit, overwrites=self._idle_overwrites(channel.guild), reason=reason,
+                            description=f"reset #{channel.name}")
+        self.idle.append(channel)
+        logging.info(f"🏊 Returned #{channel.name} to the pool (match {match_id}); {len(self.idle)} idle")
+
+    def schedule_replenish(self, guild):
+        if not self._replenishing:
+            self._replenishing = True
+            asyncio.get_running_loop().create_task(self._replenish(guild))
+
+    async def _replenish(self, guild):
+        try:
+            while len(self.idle) < self.target_idle():
+                channel = await self._create(guild, self._idle_overwrites(guild))
+                self.idle.append(channel)
+                logging.info(f"🏊 Pre-created #{channel.name}; {len(self.idle)} idle")
+        except Exception as e:
+            logging.warning(f"⚠️ Could not top up channel pool: {e}")
+        finally:
+            self._replenishing = False
+
+
+channel_pool = ChannelPool()
+
+
+async def warm_channel_pool(bot):
+    await bot.wait_until_ready()
+    guild = guilds.get_guild()
+    if guild is None:
+        return
+    await channel_pool.load(guild)
+    channel_pool.schedule_replenish(guild)
@@ -1,20 +1,9 @@
-import sqlite3
+import logging
 
-# Connect to or create the database
-conn = sqlite3.connect('mmr.db')
-cursor = conn.cursor()
+from db import DB_PATH
+from migrations import migrate
 
-# Create the players table if it doesn't exist
-cursor.execute('''
-CREATE TABLE matches (
-    match_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    player1_id TEXT,
-    player2_id TEXT,
-    status TEXT, -- PENDING, CONFIRMED, REPORTED, COMPLETE
-    winner_id TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-''')
-
-conn.commit()
-conn.close()
\ No newline at end of file
+# Create or upgrade the database. The bot also runs this on startup.
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+version = migrate(DB_PATH)
+logging.info(f"🗄️ {DB_PATH} is at schema version {version}")
@@ -0,0 +1,416 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from migrations import configure
+from player_cache import PlayerCache, PlayerRecord, PLAYER_COLUMNS
+
+DB_PATH = os.getenv("DUELSBOT_DB", "mmr.db")
+READ_CONNECTIONS = 4
+BATCH_SIZE = 500  # Ids per IN (...) list, well under SQLite's variable limit
+
+MatchReport = namedtuple("MatchReport", (
+    "match_id", "winner_id", "loser_id", "winner_mmr", "loser_mmr", "new_winner_mmr", "new_loser_mmr", "channel_id",
+))
+
+# All SQLite work runs off the event loop. Writes are serialised on a single
+# thread that owns the only writer connection; reads go to a small pool of
+# threads that each keep their own connection open.
+#
+# Per-player reads are served from a write-through PlayerCache; every write
+# that touches players updates it once the transaction has committed.
+
+
+class Database:
+    def __init__(self, path=DB_PATH, readers=READ_CONNECTIONS):
+        self.path = path
+        self.readers = readers
+        self._writer = None
+        self._reader_pool = None
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.players = PlayerCache()
+        self._players_lock = None
+
+    def open(self, path=None):
+        self.close()
+        if path is not None:
+            self.path = path
+        self.players = PlayerCache()
+        return self
+
+    def close(self):
+        for pool in (self._writer, self._reader_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        self._writer = self._reader_pool = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Each connection stays on its thread; close() only touches them once
+            # the executors have shut down.
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            configure(conn)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _run_write(self, fn, args):
+        # BEGIN IMMEDIATE takes the write lock up front, so reads inside a
+        # write callback see the state the callback's own updates apply to.
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            result = fn(conn.cursor(), *args)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _run_read(self, fn, args):
+        return fn(self._connection().cursor(), *args)
+
+    async def write(self, fn, *args):
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        return await asyncio.get_running_loop().run_in_executor(self._writer, self._run_write, fn, args)
+
+    async def read(self, fn, *args):
+        if self._reader_pool is None:
+            self._reader_pool = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="db-reader")
+        return await asyncio.get_running_loop().run_in_executor(self._reader_pool, self._run_read, fn, args)
+
+    # --- players -----------------------------------------------------------
+
+    async def load_players(self):
+        if self._players_lock is None:
+            self._players_lock = asyncio.Lock()
+        async with self._players_lock:
+            if self.players.loaded:
+                return
+            def query(cursor):
+                cursor.execute(f"SELECT {PLAYER_COLUMNS} FROM players")
+                return cursor.fetchall()
+            # Runs on the writer thread so the snapshot is ordered against
+            # writes: earlier ones are in it, later ones update it afterwards.
+            self.players.load(await self.write(query))
+
+    async def get_player(self, discord_id) -> PlayerRecord | None:
+        if not self.players.loaded:
+            await self.load_players()
+        return self.players.get(discord_id)
+
+    async def get_player_status(self, discord_id: str) -> tuple[str | None, int] | None:
+        player = await self.get_player(discord_id)
+        return (player.status, player.mmr) if player else None
+
+    async def player_exists(self, discord_id: str) -> bool:
+        return await self.get_player(discord_id) is not None
+
+    async def get_registration(self, discord_id: str) -> tuple[str, str, int, int | None] | None:
+        player = await self.get_player(discord_id)
+        return (player.ign, player.platform, player.mmr, player.rankcheck_date) if player else None
+
+    async def save_rankcheck(self, discord_id: str, ign: str, platform: str, mmr: int, rankcheck_date: int, existing: bool):
+        def update(cursor):
+            if existing:
+                cursor.execute(
+                    "UPDATE players SET ign = ?, platform = ?, mmr = ?, rankcheck_date = ? WHERE discord_id = ?",
+                    (ign, platform, mmr, rankcheck_date, discord_id)
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO players (discord_id, ign, platform, mmr, rankcheck_date) VALUES (?, ?, ?, ?, ?)",
+                    (discord_id, ign, platform, mmr, rankcheck_date)
+                )
+        await self.write(update)
+        if existing:
+            self.players.update(discord_id, ign=ign, platform=platform, mmr=mmr, rankcheck_date=rankcheck_date)
+        else:
+            self.players.put(PlayerRecord(discord_id, ign, platform, mmr, rankcheck_date))
+
+    async def set_ping(self, discord_id: str, ping: int):
+        def update(cursor):
+            cursor.execute("UPDATE players SET ping = ? WHERE discord_id = ?", (ping, discord_id))
+        await self.write(update)
+        self.players.update(discord_id, ping=ping)
+
+    async def get_ping_candidates(self, ping_modes, min_mmr, max_mmr, cutoff: int, region_mask) -> list[tuple[str, int]]:
+        # Idle subscribers in range sharing a region who weren't pinged since cutoff
+        if not self.players.loaded:
+            await self.load_players()
+        records = self.players.records
+        candidates = []
+        for discord_id in self.players.pings.in_range(min_mmr, max_mmr, region_mask):
+            player = records[discord_id]
+            if player.ping in ping_modes and (player.ping_time is None or player.ping_time < cutoff):
+                candidates.append((discord_id, player.ping))
+        return candidates
+
+    async def set_ping_times(self, discord_ids, ping_time: int):
+        discord_ids = list(discord_ids)
+        def update(cursor):
+            for i in range(0, len(discord_ids), BATCH_SIZE):
+                batch = discord_ids[i:i + BATCH_SIZE]
+                cursor.execute(
+                    f"UPDATE players SET ping_time = ? WHERE discord_id IN ({','.join('?' * len(batch))})",
+                    (ping_time, *batch)
+                )
+        await self.write(update)
+        for discord_id in discord_ids:
+            self.players.update(discord_id, ping_time=ping_time)
+
+    async def get_leaderboard(self) -> list[tuple[str, int, int, int]]:
+        # Ranked players, highest MMR first
+        if not self.players.loaded:
+            await self.load_players()
+        records = self.players.records
+        return [
+            (discord_id, mmr, records[discord_id].wins, records[discord_id].losses)
+            for discord_id, mmr in self.players.ranks.ordered()
+        ]
+
+    async def get_standing(self, discord_id, radius=2) -> tuple[int | None, int, list[tuple[int, str, int]]]:
+        # (position, ranked players, [(position, discord_id, mmr)] around them)
+        if not self.players.loaded:
+            await self.load_players()
+        ranks = self.players.ranks
+        return ranks.position(discord_id), len(ranks), ranks.around(discord_id, radius)
+
+    def leaderboard_version(self) -> int:
+        return self.players.ranks.version
+
+    # --- queue -------------------------------------------------------------
+
+    async def get_queued_players(self) -> list[tuple[str, int, int, int]]:
+        def query(cursor):
+            cursor.execute("SELECT discord_id, mmr, queue_time, region_mask FROM players WHERE queue_status = 'IN_QUEUE'")
+            return cursor.fetchall()
+        return await self.read(query)
+
+    async def join_queue(self, discord_id: str, queue_time: int, region_mask: int) -> int:
+        # Conditional so a player paired in the meantime can't be put back in
+        # the queue; returns the number of rows changed (0 or 1).
+        def update(cursor):
+            cursor.execute(
+                "UPDATE players SET queue_status = 'IN_QUEUE', queue_time = ?, region_mask = ? "
+                "WHERE discord_id = ? AND (queue_status IS NULL OR queue_status IN ('IDLE', 'IN_QUEUE'))",
+                (queue_time, region_mask, discord_id)
+            )
+            return cursor.rowcount
+        changed = await self.write(update)
+        if changed:
+            self.players.update(discord_id, status="IN_QUEUE", queue_time=queue_time, region_mask=region_mask)
+        return changed
+
+    async def leave_queue(self, discord_id: str) -> int:
+        # Only leaves from IN_QUEUE: create_matches may have paired the player
+        # since the caller checked. Returns the number of rows changed.
+        def update(cursor):
+            cursor.execute(
+                "UPDATE players SET queue_status = 'IDLE' WHERE discord_id = ? AND queue_status = 'IN_QUEUE'",
+                (discord_id,)
+            )
+            return cursor.rowcount
+        changed = await self.write(update)
+        if changed:
+            self.players.update(discord_id, status="IDLE")
+        return changed
+
+    async def expire_queued(self, cutoff: int) -> list[str]:
+        # Everyone queued at or before `cutoff`, via idx_players_queue_time
+        def update(cursor):
+            cursor.execute(
+                "UPDATE players SET queue_status = 'IDLE' WHERE queue_status = 'IN_QUEUE' AND queue_time <= ? RETURNING discord_id",
+                (cutoff,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+        expired = await self.write(update)
+        for discord_id in expired:
+            self.players.update(discord_id, status="IDLE")
+        return expired
+
+    # --- matches -----------------------------------------------------------
+
+    async def create_matches(self, pairs, created_at: int, queue_times=None) -> list[int | None]:
+        # A pair is only matched if both players are still IN_QUEUE (and, with
+        # queue_times, still on the same queue entry): either may have left or
+        # left and re-queued while the write waited. Returns one match id per
+        # pair, None for pairs that were skipped.
+        def update(cursor):
+            match_ids = []
+            for pair in pairs:
+                cursor.execute(
+                    "SELECT discord_id, queue_time FROM players WHERE discord_id IN (?, ?) AND queue_status = 'IN_QUEUE'",
+                    pair
+                )
+                queued = dict(cursor.fetchall())
+                if len(queued) != 2 or (queue_times and any(queued[p] != queue_times[p] for p in pair)):
+                    match_ids.append(None)
+                    continue
+                cursor.execute(
+                    "INSERT INTO matches (player1_id, player2_id, status, created_at) VALUES (?, ?, 'WAITING_CONFIRM', ?)",
+                    (*pair, created_at)
+                )
+                match_ids.append(cursor.lastrowid)
+                cursor.execute(
+                    "UPDATE players SET queue_status = 'IN_MATCH' WHERE discord_id IN (?, ?)",
+                    pair
+                )
+            return match_ids
+        match_ids = await self.write(update)
+        for match_id, pair in zip(match_ids, pairs):
+            if match_id is not None:
+                for discord_id in pair:
+                    self.players.update(discord_id, status="IN_MATCH")
+        return match_ids
+
+    async def get_pending_matches(self) -> list[tuple[int, str, str, int, int, int]]:
+        def query(cursor):
+            cursor.execute("""
+                SELECT m.match_id, m.player1_id, m.player2_id, m.created_at, p1.region_mask, p2.region_mask
+                FROM matches m
+                JOIN players p1 ON p1.discord_id = m.player1_id
+                JOIN players p2 ON p2.discord_id = m.player2_id
+                WHERE m.status = 'WAITING_CONFIRM'
+            """)
+            return cursor.fetchall()
+        return await self.read(query)
+
+    async def abandon_match(self, match_id: int, idle_ids, requeue_ids) -> dict:
+        # Drops an unconfirmed match. Returns {discord_id: (mmr, queue_time, region_mask)}
+        # for the players put back in the queue.
+        def update(cursor):
+            cursor.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
+            requeued = {}
+            for discord_id in idle_ids:
+                cursor.execute("UPDATE players SET queue_status = 'IDLE' WHERE discord_id = ?", (discord_id,))
+            for discord_id in requeue_ids:
+                cursor.execute("UPDATE players SET queue_status = 'IN_QUEUE' WHERE discord_id = ?", (discord_id,))
+                cursor.execute("SELECT mmr, queue_time, region_mask FROM players WHERE discord_id = ?", (discord_id,))
+                row = cursor.fetchone()
+                if row:
+                    requeued[discord_id] = row
+            return requeued
+        requeued = await self.write(update)
+        for discord_id in idle_ids:
+            self.players.update(discord_id, status="IDLE")
+        for discord_id in requeue_ids:
+            self.players.update(discord_id, status="IN_QUEUE")
+        return requeued
+
+    async def confirm_match(self, match_id: int):
+        def update(cursor):
+            cursor.execute("UPDATE matches SET status = 'CONFIRMED' WHERE match_id = ?", (match_id,))
+        await self.write(update)
+
+    async def set_match_channel(self, match_id: int, channel_id: int):
+        def update(cursor):
+            cursor.execute("UPDATE matches SET channel_id = ? WHERE match_id = ?", (channel_id, match_id))
+        await self.write(update)
+
+    async def get_active_match_channels(self) -> dict[int, int]:
+        def query(cursor):
+            cursor.execute("SELECT channel_id, match_id FROM matches WHERE status = 'CONFIRMED' AND channel_id IS NOT NULL")
+            return {int(channel_id): match_id for channel_id, match_id in cursor.fetchall()}
+        return await self.read(query)
+
+    async def get_match(self, match_id: int) -> tuple[str, str, str, str | None] | None:
+        def query(cursor):
+            cursor.execute("SELECT player1_id, player2_id, status, winner_id FROM matches WHERE match_id = ?", (match_id,))
+            return cursor.fetchone()
+        return await self.read(query)
+
+    async def cancel_match(self, match_id: int, canceler_id: str, is_moderator: bool) -> tuple[str, str, int | None] | None:
+        # Cancels a confirmed, unreported match the caller may cancel.
+        # Returns (player1_id, player2_id, channel_id), or None if nothing changed.
+        def update(cursor):
+            cursor.execute("""
+                UPDATE matches SET status = 'CANCELED'
+                WHERE match_id = ? AND status = 'CONFIRMED' AND winner_id IS NULL
+                AND (? OR ? IN (player1_id, player2_id))
+                RETURNING player1_id, player2_id, channel_id
+            """, (match_id, is_moderator, canceler_id))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute("UPDATE players SET queue_status = 'IDLE' WHERE discord_id IN (?, ?)", row[:2])
+            return row
+        row = await self.write(update)
+        if row:
+            for discord_id in row[:2]:
+                self.players.update(discord_id, status="IDLE")
+        return row
+
+    async def report_match(self, match_id: int, reporter_id: str, reporter_won: bool, rate) -> MatchReport | None:
+        # Records the result in one transaction. The conditional UPDATE only
+        # matches a confirmed, unreported match the reporter played in, so a
+        # second report finds nothing to update. rate(winner_mmr, loser_mmr)
+        # returns the new MMRs and sees the values read in this transaction.
+        def update(cursor):
+            cursor.execute("""
+                UPDATE matches
+                SET status = 'REPORTED',
+                    winner_id = CASE WHEN ? THEN ?
+                                     WHEN player1_id = ? THEN player2_id
+                                     ELSE player1_id END
+                WHERE match_id = ? AND status = 'CONFIRMED' AND winner_id IS NULL
+                AND ? IN (player1_id, player2_id)
+                RETURNING player1_id, player2_id, winner_id, channel_id
+            """, (reporter_won, reporter_id, reporter_id, match_id, reporter_id))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            p1_id, p2_id, winner_id, channel_id = row
+            loser_id = p2_id if winner_id == p1_id else p1_id
+
+            cursor.execute("SELECT discord_id, mmr FROM players WHERE discord_id IN (?, ?)", (winner_id, loser_id))
+            mmrs = dict(cursor.fetchall())
+            winner_mmr, loser_mmr = mmrs[winner_id], mmrs[loser_id]
+            new_winner_mmr, new_loser_mmr = rate(winner_mmr, loser_mmr)
+
+            cursor.execute(
+                "UPDATE players SET mmr = ?, wins = wins + 1, queue_status = 'IDLE' WHERE discord_id = ?",
+                (new_winner_mmr, winner_id)
+            )
+            cursor.execute(
+                "UPDATE players SET mmr = ?, losses = losses + 1, queue_status = 'IDLE' WHERE discord_id = ?",
+                (new_loser_mmr, loser_id)
+            )
+            return MatchReport(match_id, winner_id, loser_id, winner_mmr, loser_mmr, new_winner_mmr, new_loser_mmr, channel_id)
+        report = await self.write(update)
+        if report:
+            winner, loser = self.players.records.get(report.winner_id), self.players.records.get(report.loser_id)
+            if winner:
+                self.players.update(report.winner_id, mmr=report.new_winner_mmr, wins=winner.wins + 1, status="IDLE")
+            if loser:
+                self.players.update(report.loser_id, mmr=report.new_loser_mmr, losses=loser.losses + 1, status="IDLE")
+        return report
+
+    async def get_recent_matches(self, discord_id, limit=5) -> list[tuple[str, str, str, int]]:
+        def query(cursor):
+            cursor.execute("""
+                SELECT player1_id, player2_id, winner_id, created_at
+                FROM matches
+                WHERE player1_id = ? OR player2_id = ?
+                    AND status == 'REPORTED'
+                    AND winner_id IS NOT NULL
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, (discord_id, discord_id, limit))
+            return cursor.fetchall()
+        return await self.read(query)
+
+
+db = Database()
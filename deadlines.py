@@ -0,0 +1,49 @@
+import heapq
+import itertools
+
+
+class DeadlineHeap:
+    # Min-heap of (when, key). Rescheduling or cancelling a key just marks the
+    # old heap entry stale; stale entries are dropped when they reach the top.
+
+    def __init__(self):
+        self._heap = []
+        self._live = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._live)
+
+    def __contains__(self, key):
+        return key in self._live
+
+    def schedule(self, key, when: float):
+        seq = next(self._seq)
+        self._live[key] = (when, seq)
+        heapq.heappush(self._heap, (when, seq, key))
+
+    def cancel(self, key):
+        self._live.pop(key, None)
+
+    def clear(self):
+        self._heap.clear()
+        self._live.clear()
+
+    def _prune(self):
+        heap = self._heap
+        while heap and self._live.get(heap[0][2]) != heap[0][:2]:
+            heapq.heappop(heap)
+
+    def next_deadline(self) -> float | None:
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list:
+        due = []
+        while True:
+            self._prune()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, key = heapq.heappop(self._heap)
+            del self._live[key]
+            due.append(key)
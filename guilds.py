@@ -0,0 +1,119 @@
+import logging
+
+import discord
+from discord.ext import commands
+
+from utils import FEER_GUILD_ID
+
+# Name -> object maps for the server's text channels, categories and roles,
+# so "queue-here", "PING", "Rank A" etc. are dict lookups instead of scans of
+# guild.text_channels / guild.roles. Built from the gateway cache on first
+# use and rebuilt when a channel or role is created, updated or deleted.
+# Duplicate names resolve like discord.utils.get did: first in guild order.
+
+
+class GuildRegistry:
+    def __init__(self, guild_id=FEER_GUILD_ID):
+        self.guild_id = guild_id
+        self.bot = None
+        self.guild = None
+        self.text_channels = {}
+        self.categories = {}
+        self.roles = {}
+        self.rebuilds = 0
+
+    def attach(self, bot):
+        self.bot = bot
+
+    def _resolve_guild(self):
+        if self.bot is None:
+            return None
+        guild = self.bot.get_guild(self.guild_id)
+        if guild is None and self.bot.guilds:
+            guild = self.bot.guilds[0]
+            logging.warning(f"⚠️ Guild {self.guild_id} not found; using {guild.name} ({guild.id})")
+        return guild
+
+    def refresh(self):
+        guild = self._resolve_guild()
+        if guild is not None:
+            self.build(guild)
+        return guild
+
+    def _ensure(self):
+        if self.guild is None:
+            self.refresh()
+        return self.guild
+
+    def build(self, guild):
+        self.guild = guild
+        self._index_channels()
+        self._index_roles()
+        logging.info(
+            f"🗂️ Guild registry built for {guild.name}: {len(self.text_channels)} text channels, "
+            f"{len(self.categories)} categories, {len(self.roles)} roles"
+        )
+
+    def _index_channels(self):
+        self.text_channels = _first_by_name(self.guild.text_channels)
+        self.categories = _first_by_name(self.guild.categories)
+        self.rebuilds += 1
+
+    def _index_roles(self):
+        # guild.roles is lowest first; discord.utils.get picked the first match
+        self.roles = _first_by_name(self.guild.roles)
+        self.rebuilds += 1
+
+    def get_guild(self) -> discord.Guild | None:
+        return self._ensure()
+
+    def text_channel(self, name) -> discord.TextChannel | None:
+        self._ensure()
+        return self.text_channels.get(name)
+
+    def category(self, name) -> discord.CategoryChannel | None:
+        self._ensure()
+        return self.categories.get(name)
+
+    def role(self, name) -> discord.Role | None:
+        self._ensure()
+        return self.roles.get(name)
+
+    def _ours(self, obj):
+        return self.guild is not None and obj.guild.id == self.guild.id
+
+    async def on_channel_changed(self, channel, *_):
+        if self._ours(channel):
+            self._index_channels()
+
+    async def on_role_changed(self, role, *_):
+        if self._ours(role):
+            self._index_roles()
+
+    async def on_guild_available(self, guild):
+        if guild.id == self.guild_id or (self.guild is not None and guild.id == self.guild.id):
+            self.build(guild)
+
+
+def _first_by_name(items):
+    by_name = {}
+    for item in items:
+        by_name.setdefault(item.name, item)
+    return by_name
+
+
+guilds = GuildRegistry()
+
+
+def register_guild_registry(bot: commands.Bot):
+    guilds.attach(bot)
+
+    @bot.listen("on_ready")
+    async def build_guild_registry():
+        guilds.refresh()
+
+    for event in ("on_guild_channel_create", "on_guild_channel_delete", "on_guild_channel_update"):
+        bot.add_listener(guilds.on_channel_changed, event)
+    for event in ("on_guild_role_create", "on_guild_role_delete", "on_guild_role_update"):
+        bot.add_listener(guilds.on_role_changed, event)
+    bot.add_listener(guilds.on_guild_available, "on_guild_available")
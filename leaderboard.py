@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+
+import discord
+from discord.ext import commands
+
+from utils import get_rank
+from db import db
+from guilds import guilds
+from members import members
+from outbound import outbound, LEADERBOARD, dm
+
+MAX_CHARS = 1900  # For safety buffer from Discord's 2000 char limit
+RANK_ORDER = ["Rank S", "Rank X", "Rank A", "Rank B", "Rank C", "Rank D"]
+HISTORY_LIMIT = 50  # Bot messages adopted from #leaderboard after a restart
+DEBOUNCE_SECONDS = float(os.getenv("LEADERBOARD_DEBOUNCE_SECONDS", "5"))  # Quiet time before a render
+MAX_STALENESS_SECONDS = float(os.getenv("LEADERBOARD_MAX_STALENESS_SECONDS", "30"))  # Render by then even if requests keep coming
+BOARD_MARKER = "-# 📋 Leaderboard"  # Last line of every board message
+
+# The board is a run of bot messages in #leaderboard. Each update renders the
+# chunks again and only edits the messages whose text changed, sending or
+# deleting messages at the tail when the board grows or shrinks. Board
+# messages end with BOARD_MARKER, which is how they're told apart from the
+# bot's other messages in the channel after a restart; boards posted before
+# the marker existed are deleted then.
+#
+# Rendered chunks are also kept per guild and double as the pages of
+# `!leaderboard <page>`; they're reused until the standings change.
+
+
+class LeaderboardBoard:
+    def __init__(self):
+        self.messages = {}  # channel id -> [(message id, content)]
+        self.locks = defaultdict(asyncio.Lock)
+        self.edits = 0
+        self.sends = 0
+        self.deletes = 0
+
+    async def _adopt(self, channel):
+        # First update after startup: pick up what is already posted. History
+        # comes newest first, so the board is the latest messages, not
+        # whatever sat at the start of the last HISTORY_LIMIT.
+        posted = []
+        unmarked = []
+        async for message in channel.history(limit=HISTORY_LIMIT):
+            if message.author != channel.guild.me:
+                continue
+            if message.content.endswith(BOARD_MARKER):
+                posted.append((message.id, message.content))
+            elif message.content.startswith("```") and message.content.endswith("```"):
+                # Board from before BOARD_MARKER existed
+                unmarked.append(message.id)
+        posted.reverse()
+        self.messages[channel.id] = posted
+
+        for message_id in unmarked:
+            try:
+                await outbound.call(LEADERBOARD, f"channel:{channel.id}", channel.get_partial_message(message_id).delete,
+                                    description="leaderboard cleanup")
+            except discord.NotFound:
+                pass
+        if unmarked:
+            logging.info(f"🧹 Deleted {len(unmarked)} unmarked leaderboard message(s) in #{channel.name}")
+
+    async def update(self, channel, chunks):
+        chunks = [f"{chunk}\n{BOARD_MARKER}" for chunk in chunks]
+        async with self.locks[channel.id]:
+            if channel.id not in self.messages:
+                await self._adopt(channel)
+            posted = self.messages[channel.id]
+            bucket = f"channel:{channel.id}"
+
+            updated = []
+            for i, content in enumerate(chunks):
+                if i < len(posted):
+                    message_id, old = posted[i]
+                    if old != content:
+                        try:
+                            await outbound.call(LEADERBOARD, bucket, channel.get_partial_message(message_id).edit,
+                                                content=content, description="leaderboard edit")
+                            self.edits += 1
+                        except discord.NotFound:
+                            # Someone deleted it; rebuild from scratch next time
+                            self.messages.pop(channel.id, None)
+                            raise
+                    updated.append((message_id, content))
+                else:
+                    message = await outbound.call(LEADERBOARD, bucket, channel.send, content, idempotent=False,
+                                                  description="leaderboard send")
+                    self.sends += 1
+                    updated.append((message.id, content))
+
+            for message_id, _ in posted[len(chunks):]:
+                try:
+                    await outbound.call(LEADERBOARD, bucket, channel.get_partial_message(message_id).delete,
+                                        description="leaderboard delete")
+                except discord.NotFound:
+                    pass
+                self.deletes += 1
+
+            self.messages[channel.id] = updated
+            return updated
+
+
+class LeaderboardRefresher:
+    # Coalesces refresh requests: a render happens once requests have been
+    # quiet for `debounce` seconds, or `max_staleness` seconds after the first
+    # unserved request, whichever is sooner. Requests arriving mid-render
+    # queue one more render.
+    def __init__(self, debounce=DEBOUNCE_SECONDS, max_staleness=MAX_STALENESS_SECONDS):
+        self.debounce = debounce
+        self.max_staleness = max_staleness
+        self.channel = None
+        self.first_request = None
+        self.last_request = None
+        self.requests = 0
+        self.renders = 0
+        self.skipped = 0
+        self.failures = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def request(self, channel, reason=""):
+        now = time.monotonic()
+        self.requests += 1
+        if self.first_request is None:
+            self.first_request = now
+        else:
+            self.skipped += 1  # Served by the render already pending
+        self.last_request = now
+        self.channel = channel
+        logging.info(f"📋 Leaderboard refresh requested{f' ({reason})' if reason else ''}")
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def due_at(self):
+        return min(self.last_request + self.debounce, self.first_request + self.max_staleness)
+
+    async def _run(self):
+        while self.first_request is not None:
+            delay = self.due_at() - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            channel = self.channel
+            self.first_request = self.last_request = None
+            try:
+                await post_leaderboard(channel)
+                self.renders += 1
+            except Exception:
+                self.failures += 1
+                logging.exception("⚠️ Leaderboard refresh failed")
+            logging.info(f"📋 Leaderboard refresher: {self.stats()}")
+
+    def stats(self):
+        return {"requests": self.requests, "renders": self.renders, "skipped": self.skipped, "failures": self.failures}
+
+
+class RenderedPages:
+    def __init__(self):
+        self.pages = {}  # guild id -> (leaderboard version, chunks)
+        self.hits = 0
+        self.renders = 0
+
+    async def get(self, guild, fresh=False) -> list[str]:
+        version = db.leaderboard_version()
+        cached = self.pages.get(guild.id)
+        if not fresh and cached and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        # Tag with the version seen before rendering, so changes made while
+        # names were being resolved still invalidate the result.
+        chunks = await render_leaderboard(guild)
+        self.pages[guild.id] = (version, chunks)
+        self.renders += 1
+        return chunks
+
+
+board = LeaderboardBoard()
+refresher = LeaderboardRefresher()
+rendered = RenderedPages()
+
+
+async def render_leaderboard(guild) -> list[str]:
+    # Already ordered by MMR, highest first
+    players = await db.get_leaderboard()
+
+    # Group players by rank
+    rank_groups = defaultdict(list)
+    for player in players:
+        rank_groups[get_rank(player[1])].append(player)
+
+    lines = []
+    lines.append(f"{'Rank':<5} {'MMR':<5} {'W':<3} {'L':<3} {'Player':<20}")
+    lines.append("-" * 45)
+    for rank in RANK_ORDER:
+        group = rank_groups.get(rank)
+        if not group:
+            continue
+
+        lines.append(f"--------------{rank}--------------")
+
+        for idx, (discord_id, mmr, wins, losses) in enumerate(group, start=1):
+            name = await members.display_name(guild, discord_id)
+            if name is None:
+                logging.warning(f"{discord_id} user doesn't exist anymore")
+                continue
+            lines.append(f"{idx:<5} {mmr:<5} {wins:<3} {losses:<3} {name:<20}")
+
+    return chunk_lines(lines)
+
+
+def chunk_lines(lines) -> list[str]:
+    chunks = []
+    message = "```\n"
+    for line in lines:
+        if len(message) + len(line) + 1 > MAX_CHARS:
+            chunks.append(message + "```")
+            message = "```\n"
+        message += line + "\n"
+    chunks.append(message + "```")
+    return chunks
+
+
+async def post_leaderboard(channel):
+    # Always re-render for the board so renamed players get picked up
+    chunks = await rendered.get(channel.guild, fresh=True)
+    edits, sends, deletes = board.edits, board.sends, board.deletes
+    await board.update(channel, chunks)
+    logging.info(
+        f"📢 Leaderboard updated: {board.edits - edits} edited, {board.sends - sends} sent, "
+        f"{board.deletes - deletes} deleted of {len(chunks)} message(s); "
+        f"member lookups {members.stats}, hit ratio {members.hit_ratio()}"
+    )
+
+
+def register_leaderboard_command(bot: commands.Bot):
+    @bot.command()
+    async def leaderboard(ctx, page: int = None):
+        if page is not None:
+            # Sent by DM so pages don't end up between the board's messages
+            chunks = await rendered.get(ctx.guild or guilds.get_guild())
+            if not 1 <= page <= len(chunks):
+                content = f"❌ Page must be between 1 and {len(chunks)}."
+            else:
+                content = f"{chunks[page - 1]}\nPage {page}/{len(chunks)}"
+            await dm(ctx.author, content)
+            return
+
+        if ctx.channel.name != "leaderboard":
+            return
+
+        refresher.request(ctx.channel, f"!leaderboard from {ctx.author}")
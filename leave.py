@@ -1,8 +1,11 @@
 import discord
 from discord.ext import commands
-import sqlite3
 import logging
-from utils import create_queue_embed
+from db import db
+from queue_index import queue_index
+from queue_status import queue_status
+from outbound import delete_command, dm
+from matchmaker import request_matchmaking
 
 def register_leave_command(bot: commands.Bot):
     @bot.command(aliases=["l"])
@@ -16,48 +19,40 @@ def register_leave_command(bot: commands.Bot):
 
         user_id = str(ctx.author.id)
 
-        conn = sqlite3.connect("mmr.db")
-        cursor = conn.cursor()
         logging.info(f"[LEAVE] Checking queue status for user_id={user_id}")
-
-        cursor.execute("SELECT queue_status FROM players WHERE discord_id = ?", (user_id,))
-        row = cursor.fetchone()
+        row = await db.get_player_status(user_id)
 
         if not row:
             logging.warning("[LEAVE] User not found in database.")
             if ctx.guild:  # Only try deleting if not DM
-                await ctx.message.delete()
-            await ctx.author.send("❌ You are not registered in the system.")
-            conn.close()
+                await delete_command(ctx)
+            await dm(ctx.author, "❌ You are not registered in the system.")
             return
 
-        queue_status = row[0]
-        logging.info(f"[LEAVE] Current queue_status for {user_id}: {queue_status}")
+        status = row[0]
+        logging.info(f"[LEAVE] Current queue_status for {user_id}: {status}")
 
-        if queue_status != "IN_QUEUE":
+        if status != "IN_QUEUE":
             logging.info("[LEAVE] User is not in queue.")
             if ctx.guild:
-                await ctx.message.delete()
-            await ctx.author.send("ℹ️ You are not currently in the queue.")
-            conn.close()
+                await delete_command(ctx)
+            await dm(ctx.author, "ℹ️ You are not currently in the queue.")
             return
 
         logging.info(f"[LEAVE] Updating user {user_id} to IDLE.")
-        cursor.execute("UPDATE players SET queue_status = 'IDLE' WHERE discord_id = ?", (user_id,))
-        conn.commit()
-        conn.close()
-
-        embed = create_queue_embed("A player has left the queue")
-        logging.info(f"[LEAVE] Sending queue update embed")
+        if not await db.leave_queue(user_id):
+            # Paired by the matchmaker since the status check
+            logging.info(f"[LEAVE] {user_id} was matched before leaving.")
+            if ctx.guild:
+                await delete_command(ctx)
+            await dm(ctx.author, "ℹ️ You've already been matched. Check your DMs to confirm or cancel the match.")
+            return
+        queue_index.remove(user_id)
+        request_matchmaking(f"{user_id} left the queue")
+        queue_status.request(f"{user_id} left the queue")
 
         if ctx.guild:
-            await ctx.message.delete()
-            await ctx.channel.send(embed=embed)
-        else:
-            # Try to send to the queue channel if invoked in DMs
-            queue_channel = discord.utils.get(bot.get_all_channels(), name="queue-here")
-            if queue_channel:
-                await queue_channel.send(embed=embed)
-
-        await ctx.author.send("✅ You have left the queue.")
+            await delete_command(ctx)
+
+        await dm(ctx.author, "✅ You have left the queue.")
         logging.info(f"[LEAVE] User {user_id} has successfully left the queue.")
@@ -1,243 +1,470 @@
 import asyncio
-import sqlite3
-import datetime
+import time
 import discord
 from discord import Embed
 import random
 import string
 import logging
-
-from utils import FEER_GUILD_ID
-
-EXPAND_INTERVAL_SECONDS = 60
+import os
+
+from guilds import guilds
+from queue_status import queue_status
+from outbound import outbound, MATCH, REPLY, PING, dm
+from members import members
+from queue_index import queue_index
+from regions import mask_to_regions
+from pairing import get_pairing_engine
+from deadlines import DeadlineHeap
+from channel_pool import channel_pool
+from db import db
+
+COALESCE_SECONDS = 0.25  # Signals arriving within this window share one pass
+MIN_WAKE_SECONDS = 1  # Floor on deadline sleeps so a due deadline can't spin the loop
 BASE_RANGE = 160 #50
 RANGE_EXPAND_PER_MINUTE = 2#25
+TIMEOUT_MINUTES = 60
+PAIRING_ENGINE = os.getenv("MATCHMAKING_ENGINE", "greedy")  # "greedy" or "batch"
+
+pairing_engine = get_pairing_engine(PAIRING_ENGINE)
+
+clock = time.time  # Swapped for a virtual clock by simulate.py
+
+_wakeup = asyncio.Event()
+_scheduler_task = None
+_next_deadline = None  # Epoch seconds of the next timeout or range overlap
+
+def request_matchmaking(reason: str = ""):
+    # Safe to call from any handler; bursts are coalesced into a single pass
+    logging.info(f"🔔 Matchmaking requested{f' ({reason})' if reason else ''}")
+    _wakeup.set()
+
+def start_matchmaking_scheduler(bot):
+    global _scheduler_task
+    if _scheduler_task is None or _scheduler_task.done():
+        _scheduler_task = bot.loop.create_task(matchmaking_loop(bot))
+    start_confirmation_timeouts(bot)
+    return _scheduler_task
 
 async def matchmaking_loop(bot):
     await bot.wait_until_ready()
+    _wakeup.set()  # Run one pass right away on startup
     while not bot.is_closed():
-        await run_matchmaking(bot)
-        await asyncio.sleep(EXPAND_INTERVAL_SECONDS)
+        timeout = None
+        if _next_deadline is not None:
+            timeout = max(_next_deadline - clock(), MIN_WAKE_SECONDS)
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=timeout)
+            await asyncio.sleep(COALESCE_SECONDS)
+        except asyncio.TimeoutError:
+            logging.info("⏰ Matchmaking deadline reached")
+        _wakeup.clear()
+
+        try:
+            await run_matchmaking(bot)
+        except Exception:
+            logging.exception("⚠️ Matchmaker pass failed")
+
+def match_range(entry, now: float) -> float:
+    return BASE_RANGE + RANGE_EXPAND_PER_MINUTE * (now - entry.queued_at) / 60
+
+def next_overlap_time(now: float):
+    # Earliest moment an older player's widening range reaches a later player
+    # that shares a region with them and isn't already inside it. The older
+    # player's range is the wider one, so that is the only window that
+    # matters for a pair.
+    if RANGE_EXPAND_PER_MINUTE <= 0:
+        return None
+    earliest = None
+    for entry in queue_index.entries.values():
+        diff = queue_index.nearest_later_diff(entry, beyond=match_range(entry, now))
+        if diff is None:
+            continue
+        when = entry.queued_at + max(diff - BASE_RANGE, 0) / RANGE_EXPAND_PER_MINUTE * 60
+        if earliest is None or when < earliest:
+            earliest = when
+    return earliest
+
+def schedule_next_deadline():
+    global _next_deadline
+    deadlines = []
+    oldest = queue_index.oldest_queued_at()
+    if oldest is not None:
+        deadlines.append(oldest + TIMEOUT_MINUTES * 60)
+    overlap = next_overlap_time(clock())
+    if overlap is not None:
+        deadlines.append(overlap)
+    _next_deadline = min(deadlines) if deadlines else None
+    if _next_deadline is not None:
+        logging.info(f"⏲️ Next matchmaking deadline in {_next_deadline - clock():.1f}s")
+
+async def notify_timeouts(bot, player_ids):
+    message = f"⏳ You were removed from the queue after waiting {TIMEOUT_MINUTES} minutes without a match."
+    await asyncio.gather(*(send_dm(bot, p_id, message) for p_id in player_ids))
+
+async def expire_timed_out_players(now: float):
+    cutoff = int(now) - TIMEOUT_MINUTES * 60
+    expired = queue_index.pop_queued_before(cutoff)
+    if not expired:
+        return []
+
+    for entry in expired:
+        logging.info(f"⏳ Removing player {entry.discord_id} from queue due to timeout ({(now - entry.queued_at) / 60:.1f} min)")
+
+    # The DB is the source of truth for who actually timed out
+    player_ids = await db.expire_queued(cutoff)
+    for player_id in player_ids:
+        queue_index.remove(player_id)
+    return player_ids
+
+async def load_queue_index():
+    queue_index.load(await db.get_queued_players())
+
+def restore_pairs(pairs):
+    # pair() already took these players out of the index; if their match
+    # wasn't written they are still queued in the DB, so put them back.
+    # Anyone who left meanwhile stays out, and anyone who re-queued is
+    # already back in.
+    for pair in pairs:
+        for entry in pair:
+            record = db.players.get(entry.discord_id)
+            if record is not None and record.status != "IN_QUEUE":
+                continue
+            if entry.discord_id not in queue_index:
+                queue_index.add(entry.discord_id, entry.mmr, entry.queued_at, entry.region_mask)
+
+async def abandon_match(match_id, idle_ids, requeue_ids):
+    requeued = await db.abandon_match(match_id, idle_ids, requeue_ids)
+    for player_id, row in requeued.items():
+        queue_index.add(player_id, *row)
+    if requeued:
+        queue_status.request(f"match {match_id} abandoned")
 
 async def run_matchmaking(bot):
     # try:
         logging.info("🔄 Running matchmaking loop...")
 
-        with sqlite3.connect("mmr.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT discord_id, mmr, queue_time, regions FROM players WHERE queue_status = 'IN_QUEUE'")
-            queued_players = cursor.fetchall()
+        if not queue_index.loaded:
+            await load_queue_index()
+
+        queued_players = queue_index.oldest_first()
+        now_ts = clock()
 
         logging.info(f"📥 {len(queued_players)} players currently in queue")
         for player in queued_players:
-            logging.info(f"  - ID: {player[0]}, MMR: {player[1]}, Queued at: {player[2]}, Regions: {player[3]}")
+            logging.info(f"  - ID: {player.discord_id}, MMR: {player.mmr}, Queued at: {player.queued_at}, Regions: {player.regions}")
 
-        queued_players.sort(key=lambda x: x[2])  # Sort by queue time (oldest first)
-        matched = set()
-
-        for i, (p1_id, p1_mmr, p1_time_str, p1_regions_str) in enumerate(queued_players):
-            if p1_id in matched:
-                continue
+        pairs = pairing_engine.pair(queue_index, now_ts, lambda entry: match_range(entry, now_ts))
 
-            p1_time = datetime.datetime.fromisoformat(p1_time_str)
-            wait_minutes = (datetime.datetime.now(datetime.UTC) - p1_time).total_seconds() / 60
-            mmr_range = BASE_RANGE + RANGE_EXPAND_PER_MINUTE * wait_minutes
-            p1_regions = set(p1_regions_str.split(','))
+        created_at = int(now_ts)
+        queue_times = {entry.discord_id: entry.queued_at for pair in pairs for entry in pair}
+        try:
+            match_ids = await db.create_matches([(p1.discord_id, p2.discord_id) for p1, p2 in pairs], created_at, queue_times) if pairs else []
+        except Exception:
+            restore_pairs(pairs)
+            raise
 
-            logging.info(f"🔍 Trying to match player {p1_id} (MMR: {p1_mmr}, Regions: {p1_regions}, Wait: {wait_minutes:.1f} min, Range: ±{mmr_range:.1f})")
+        # Pairs the DB refused had a player leave (or leave and re-queue)
+        # while the write was pending; the partner goes back in the queue
+        skipped = [pair for match_id, pair in zip(match_ids, pairs) if match_id is None]
+        if skipped:
+            logging.info(f"↩️ Skipped {len(skipped)} pair(s) whose players left the queue meanwhile")
+            restore_pairs(skipped)
+        pairs = [pair for match_id, pair in zip(match_ids, pairs) if match_id is not None]
+        match_ids = [match_id for match_id in match_ids if match_id is not None]
 
-            for j in range(i + 1, len(queued_players)):
-                p2_id, p2_mmr, p2_time_str, p2_regions_str = queued_players[j]
-                if p2_id in matched:
-                    continue
+        queue_channel = guilds.text_channel("queue-here") if pairs else None
 
-                p2_regions = set(p2_regions_str.split(','))
-                mmr_diff = abs(p1_mmr - p2_mmr)
+        for match_id, (p1, p2) in zip(match_ids, pairs):
+            p1_id, p2_id = p1.discord_id, p2.discord_id
+            logging.info(f"🔍 Paired {p1_id} (MMR: {p1.mmr}, Regions: {p1.regions}, Wait: {(now_ts - p1.queued_at) / 60:.1f} min, Range: ±{match_range(p1, now_ts):.1f})")
+            logging.info(f"   ↪ with {p2_id} (MMR: {p2.mmr}, Regions: {p2.regions}, Diff: {abs(p1.mmr - p2.mmr)})")
 
-                logging.info(f"   ↪ Checking {p2_id} (MMR: {p2_mmr}, Regions: {p2_regions}, Diff: {mmr_diff})")
+            matched_regions = mask_to_regions(p1.region_mask & p2.region_mask)
 
-                if mmr_diff <= mmr_range and p1_regions & p2_regions:
-                    now = datetime.datetime.now(datetime.UTC).isoformat()
+            logging.info(f"✅ Matched {p1_id} and {p2_id} in regions {matched_regions} (match_id: {match_id})")
 
-                    with sqlite3.connect("mmr.db") as conn:
-                        cursor = conn.cursor()
-                        cursor.execute(
-                            "INSERT INTO matches (player1_id, player2_id, status, created_at) VALUES (?, ?, 'WAITING_CONFIRM', ?)",
-                            (p1_id, p2_id, now)
-                        )
-                        match_id = cursor.lastrowid
+            if queue_channel:
+                outbound.post(PING, f"channel:{queue_channel.id}", queue_channel.send,
+                              "🔔 A match has been found! Check your DMs to see if it's you.",
+                              description="match found notice", droppable=True, idempotent=False, max_age=30)
 
-                        cursor.execute(
-                            "UPDATE players SET queue_status = 'IN_MATCH' WHERE discord_id IN (?, ?)",
-                            (p1_id, p2_id)
-                        )
-                        conn.commit()
+            bot.loop.create_task(send_match_confirmation(bot, match_id, p1_id, p2_id, matched_regions))
 
-                    matched.update({p1_id, p2_id})
-                    matched_regions = sorted(p1_regions & p2_regions)
+        # Timeout check (only players still waiting in the queue)
+        timed_out = await expire_timed_out_players(clock())
+        if timed_out:
+            bot.loop.create_task(notify_timeouts(bot, timed_out))
 
-                    logging.info(f"✅ Matched {p1_id} and {p2_id} in regions {matched_regions} (match_id: {match_id})")
+        if pairs or skipped or timed_out:
+            queue_status.request("matchmaking pass")
 
-                    guild = bot.get_guild(FEER_GUILD_ID)
-                    queue_channel = discord.utils.get(guild.text_channels, name="queue-here")
-                    if queue_channel:
-                        await queue_channel.send("🔔 A match has been found! Check your DMs to see if it's you.")
+        schedule_next_deadline()
 
-                    bot.loop.create_task(send_match_confirmation(bot, match_id, p1_id, p2_id, matched_regions))
-                    break  # done with p1
-
-        # Timeout check
-        TIMEOUT_MINUTES = 60
-        now = datetime.datetime.now(datetime.UTC)
-        for player in queued_players:
-            p_id, _, p_time_str, _ = player
-            p_time = datetime.datetime.fromisoformat(p_time_str)
-            wait_minutes = (now - p_time).total_seconds() / 60
-
-            if wait_minutes >= TIMEOUT_MINUTES:
-                logging.info(f"⏳ Removing player {p_id} from queue due to timeout ({wait_minutes:.1f} min)")
-                with sqlite3.connect("mmr.db") as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("UPDATE players SET queue_status = 'IDLE' WHERE discord_id = ?", (p_id,))
-                    conn.commit()
-
-                try:
-                    user = await bot.fetch_user(int(p_id))
-                    await user.send("⏳ You were removed from the queue after waiting 60 minutes without a match.")
-                except Exception as dm_error:
-                    logging.warning(f"⚠️ Could not DM {p_id}: {dm_error}")
-                    
     # except Exception as e:
     #     logging.info(f"⚠️ Matchmaker error: {e}")
 
 
 
 CONFIRM_TIMEOUT = 420  # 7 minutes
+RESTORE_WAIT_SECONDS = 2  # Interactions must be answered within 3s
+CONFIRM = "confirm"
+CANCEL = "cancel"
+
+class PendingMatch:
+    # One match waiting on both players. responses[pid] is None until that
+    # player presses a button; `done` flips as soon as the outcome is decided
+    # so late clicks and the timeout can't act on it twice.
+    __slots__ = ("match_id", "player_ids", "matched_regions", "responses", "done")
+
+    def __init__(self, match_id, player_ids, matched_regions):
+        self.match_id = match_id
+        self.player_ids = player_ids
+        self.matched_regions = matched_regions
+        self.responses = {pid: None for pid in player_ids}
+        self.done = False
+
+pending_matches = {}  # match_id -> PendingMatch
+confirmation_deadlines = DeadlineHeap()  # match_id -> epoch seconds
+_confirmation_wakeup = asyncio.Event()
+_confirmations_restored = asyncio.Event()
+_confirmation_task = None
+
+async def send_dm(bot, player_id, content, priority=REPLY):
+    try:
+        user = await members.user(bot, player_id)
+        if user is None:
+            logging.warning(f"⚠️ Could not DM {player_id}: user not found")
+            return
+        await dm(user, content, priority)
+    except Exception as dm_error:
+        logging.warning(f"⚠️ Could not DM {player_id}: {dm_error}")
+
+class ConfirmationButton(discord.ui.DynamicItem[discord.ui.Button], template=r"duels:match:(?P<match_id>\d+):(?P<action>confirm|cancel)"):
+    # The match id and action live in the custom_id, so buttons on DMs sent
+    # before a restart keep working once the bot is back up.
+    def __init__(self, match_id: int, action: str):
+        if action == CONFIRM:
+            button = discord.ui.Button(label="Confirm", emoji="✅", style=discord.ButtonStyle.success,
+                                       custom_id=f"duels:match:{match_id}:{action}")
+        else:
+            button = discord.ui.Button(label="Cancel", emoji="❌", style=discord.ButtonStyle.danger,
+                                       custom_id=f"duels:match:{match_id}:{action}")
+        super().__init__(button)
+        self.match_id = match_id
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["match_id"]), match["action"])
+
+    async def callback(self, interaction):
+        await handle_confirmation_response(interaction.client, interaction, self.match_id, str(interaction.user.id), self.action)
+
+def confirmation_view(match_id):
+    view = discord.ui.View(timeout=None)
+    view.add_item(ConfirmationButton(match_id, CONFIRM))
+    view.add_item(ConfirmationButton(match_id, CANCEL))
+    return view
+
+def register_confirmation_buttons(bot):
+    bot.add_dynamic_items(ConfirmationButton)
+
+def start_confirmation_timeouts(bot):
+    global _confirmation_task
+    if _confirmation_task is None or _confirmation_task.done():
+        _confirmation_task = bot.loop.create_task(confirmation_timeout_loop(bot))
+    return _confirmation_task
+
+async def restore_pending_confirmations(bot):
+    # Rebuild confirmations that were still open when the bot stopped. Who had
+    # already pressed Confirm isn't stored, so both players are asked to press
+    # it again on the same message.
+    # Every match is registered before any DM goes out, so clicks don't wait
+    # on the notices.
+    try:
+        rows = await db.get_pending_matches()
+        restored = []
+        for match_id, p1_id, p2_id, created_at, p1_mask, p2_mask in rows:
+            if match_id in pending_matches:
+                continue
+            matched_regions = mask_to_regions(p1_mask & p2_mask)
+            pending_matches[match_id] = PendingMatch(match_id, [str(p1_id), str(p2_id)], matched_regions)
+            confirmation_deadlines.schedule(match_id, created_at + CONFIRM_TIMEOUT)
+            restored.append(match_id)
+    finally:
+        _confirmations_restored.set()
+    if restored:
+        logging.info(f"♻️ Restored {len(restored)} pending match confirmation(s)")
+
+    await asyncio.gather(*(
+        send_dm(bot, pid, f"♻️ The bot restarted while match `{match_id}` was waiting. Please press **Confirm** on the match message again.")
+        for match_id in restored
+        for pid in pending_matches[match_id].player_ids
+    ))
+
+async def confirmation_timeout_loop(bot):
+    await bot.wait_until_ready()
+    await restore_pending_confirmations(bot)
+    while not bot.is_closed():
+        deadline = confirmation_deadlines.next_deadline()
+        timeout = None if deadline is None else max(deadline - clock(), 0)
+        try:
+            await asyncio.wait_for(_confirmation_wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        _confirmation_wakeup.clear()
+
+        for match_id in confirmation_deadlines.pop_due(clock()):
+            pending = pending_matches.get(match_id)
+            if pending is not None:
+                bot.loop.create_task(expire_confirmation(bot, pending))
+
+def close_pending(pending):
+    pending.done = True
+    pending_matches.pop(pending.match_id, None)
+    confirmation_deadlines.cancel(pending.match_id)
+
+def confirmation_embed(matched_regions, status=None):
+    description = (
+        f"Press **Confirm** to accept or **Cancel** to decline.\n"
+        f"You have {CONFIRM_TIMEOUT/60} minutes.\n\n"
+        f"**Matched Region(s):** {', '.join(matched_regions)}"
+    )
+    if status:
+        description += f"\n\n{status}"
+    return Embed(title="🎮 Match Found!", description=description, color=discord.Color.green())
 
 async def send_match_confirmation(bot, match_id, player1_id, player2_id, matched_regions):
         logging.info(f"[MATCH {match_id}] ➤ Starting match confirmation between {player1_id} and {player2_id} in regions: {matched_regions}")
-        
-        guild = bot.get_guild(FEER_GUILD_ID)
-        player_ids = [player1_id, player2_id]
-        confirmed = {}
-        messages = {}
-
-        def make_embed():
-            return Embed(
-                title="🎮 Match Found!",
-                description=(
-                    f"React with ✅ to confirm or ❌ to cancel.\n"
-                    f"You have {CONFIRM_TIMEOUT/60} minutes.\n\n"
-                    f"**Matched Region(s):** {', '.join(matched_regions)}"
-                ),
-                color=discord.Color.green()
-            )
 
-        # Send DM to each player
-        for pid in player_ids:
+        pending = PendingMatch(match_id, [player1_id, player2_id], matched_regions)
+        pending_matches[match_id] = pending
+        confirmation_deadlines.schedule(match_id, clock() + CONFIRM_TIMEOUT)
+        _confirmation_wakeup.set()
+
+        # Send DM to each player (both players in parallel); the buttons ride
+        # along with the message so there are no follow-up calls
+        async def send_confirmation(pid):
             logging.info(f"[MATCH {match_id}] ➤ Sending DM to user {pid}")
-            user = await bot.fetch_user(int(pid))
-            msg = await user.send(embed=make_embed())
-            await msg.add_reaction("✅")
-            await msg.add_reaction("❌")
-            confirmed[pid] = None # Placeholder for reaction
-            messages[pid] = msg
+            user = await members.user(bot, pid)
+            if user is None:
+                logging.warning(f"[MATCH {match_id}] ⚠️ User {pid} not found; confirmation will time out")
+                return
+            await dm(user, priority=MATCH, embed=confirmation_embed(matched_regions), view=confirmation_view(match_id))
             logging.info(f"[MATCH {match_id}] ✅ Sent match confirmation to {user.name} ({pid})")
 
-        def check(reaction, user):
-            try:
-                if user.id not in messages:
-                    logging.warning(f"[MATCH {match_id}] ⚠️ Ignoring reaction from user {user.id}, not a match participant")
-                    return False
-                logging.info(f"[MATCH {match_id}] 🔍 Reaction received: {user.id} on message {reaction.message.id}")
-                return (
-                    str(reaction.emoji) in ["✅", "❌"]
-                    and user.id in player_ids
-                    and reaction.message.id == messages[user.id].id
-                )
-            except Exception as check_error:
-                logging.info(f"[MATCH {match_id}] ⚠️ Error in check function: {check_error}")
-                return False
-
-        while True:
-            try:
-                logging.info(f"[MATCH {match_id}] ⏳ Waiting for reaction (timeout in {CONFIRM_TIMEOUT}s)...")
-                reaction, user = await bot.wait_for("reaction_add", timeout=CONFIRM_TIMEOUT, check=check)
-                emoji = str(reaction.emoji)
-                user_id = user.id
-                logging.info(f"[MATCH {match_id}] 🔁 Reaction: {user_id} reacted with {emoji}")
-
-                if confirmed[user_id] is not None:
-                    logging.warning(f"[MATCH {match_id}] ⏭️ Ignoring duplicate reaction from {user_id}")
-                    continue
-
-                confirmed[user_id] = emoji
-
-                if emoji == "❌":
-                    # Cancel immediately
-                    logging.info(f"[MATCH {match_id}] ❌ Match canceled by {user_id}")
-                    canceler_id = user_id
-                    other_id = next(pid for pid in player_ids if pid != canceler_id)
-
-                    # Update database
-                    conn = sqlite3.connect("mmr.db")
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
-                    cursor.execute("UPDATE players SET queue_status = 'IDLE' WHERE discord_id = ?", (canceler_id,))
-                    cursor.execute("UPDATE players SET queue_status = 'IN_QUEUE' WHERE discord_id = ?", (other_id,))
-                    conn.commit()
-                    conn.close()
-
-                    # Notify players
-                    canceler = await bot.fetch_user(int(canceler_id))
-                    other = await bot.fetch_user(int(other_id))
-                    await canceler.send("❌ You canceled the match. You've been removed from the queue.")
-                    await other.send("🔁 Your opponent canceled. You've been returned to the queue.")
-                    return
-
-                elif emoji == "✅":
-                    await user.send("✅ Confirmed! Waiting for your opponent...")
-
-                if all(r in ["✅", "❌"] for r in confirmed.values()):
-                    logging.info(f"[MATCH {match_id}] ✅ All players responded. Proceeding...")
-                    break
+        await asyncio.gather(*(send_confirmation(pid) for pid in pending.player_ids))
+        logging.info(f"[MATCH {match_id}] ⏳ Waiting for confirmations (timeout in {CONFIRM_TIMEOUT}s)...")
 
+async def handle_confirmation_response(bot, interaction, match_id, user_id, action):
+        pending = pending_matches.get(match_id)
+        if pending is None and not _confirmations_restored.is_set():
+            # Clicked right after a restart, before the open matches are reloaded
+            try:
+                await asyncio.wait_for(_confirmations_restored.wait(), timeout=RESTORE_WAIT_SECONDS)
             except asyncio.TimeoutError:
-                logging.info(f"[MATCH {match_id}] ⏰ Confirmation timed out.")
-                conn = sqlite3.connect("mmr.db")
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
-
-                for pid in player_ids:
-                    if confirmed[pid] is None:
-                        # Did not react – mark as idle
-                        logging.info(f"[MATCH {match_id}] ⏰ Timeout: {pid} to idle")
-                        cursor.execute("UPDATE players SET queue_status = 'IDLE' WHERE discord_id = ?", (pid,))
-                    else:
-                        # Reacted – still interested, return to queue
-                        logging.info(f"[MATCH {match_id}] ⏰ Timeout: {pid} to IN_QUEUE")
-                        cursor.execute("UPDATE players SET queue_status = 'IN_QUEUE' WHERE discord_id = ?", (pid,))
-                conn.commit()
-                conn.close()
-
-                for pid in player_ids:
-                    user = await bot.fetch_user(int(pid))
-                    if confirmed[pid] is None:
-                        await user.send("⏰ Match timed out. You didn't respond in time and have been marked as idle.")
-                    else:
-                        await user.send("⏰ Match timed out. Your opponent didn’t confirm, so you’ve been returned to the queue.")
+                pass
+            pending = pending_matches.get(match_id)
+        if pending is None:
+            match = await db.get_match(match_id)
+            if match is not None and match[2] == "WAITING_CONFIRM":
+                # Still open in the DB; keep the buttons so the click can be retried
+                await interaction.response.send_message("⏳ This match is still loading. Please press the button again in a moment.", ephemeral=True)
                 return
+        if pending is None or pending.done or user_id not in pending.responses:
+            await interaction.response.edit_message(content="⌛ This match is no longer active.", embed=None, view=None)
+            return
+        if pending.responses[user_id] == action:
+            logging.warning(f"[MATCH {match_id}] ⏭️ Ignoring duplicate response from {user_id}")
+            await interaction.response.defer()
+            return
+
+        logging.info(f"[MATCH {match_id}] 🔁 {user_id} pressed {action}")
+        pending.responses[user_id] = action
+
+        if action == CANCEL:
+            # Cancel immediately
+            close_pending(pending)
+            await interaction.response.edit_message(
+                embed=confirmation_embed(pending.matched_regions, "❌ You canceled the match. You've been removed from the queue."),
+                view=None
+            )
+            logging.info(f"[MATCH {match_id}] ❌ Match canceled by {user_id}")
+            canceler_id = user_id
+            other_id = next(pid for pid in pending.player_ids if pid != canceler_id)
+
+            # Update database
+            await abandon_match(match_id, [canceler_id], [other_id])
+            request_matchmaking("confirmation canceled")
+
+            await send_dm(bot, other_id, "🔁 Your opponent canceled. You've been returned to the queue.")
+            return
+
+        if all(r == CONFIRM for r in pending.responses.values()):
+            close_pending(pending)
+            await interaction.response.edit_message(
+                embed=confirmation_embed(pending.matched_regions, "✅ Both players confirmed! Setting up your match..."),
+                view=None
+            )
+            logging.info(f"[MATCH {match_id}] ✅ All players responded. Proceeding...")
+            await start_confirmed_match(bot, pending)
+        else:
+            # Buttons stay so the player can still back out while waiting
+            await interaction.response.edit_message(
+                embed=confirmation_embed(pending.matched_regions, "✅ Confirmed! Waiting for your opponent...")
+            )
 
-        # Both confirmed
-        logging.info(f"[MATCH {match_id}] ✅ Both players confirmed. Creating match channel...")
-        conn = sqlite3.connect("mmr.db")
-        cursor = conn.cursor()
-        cursor.execute("UPDATE matches SET status = 'CONFIRMED' WHERE match_id = ?", (match_id,))
-        conn.commit()
-        conn.close()
+async def expire_confirmation(bot, pending):
+        match_id = pending.match_id
+        if pending.done:
+            return
+        close_pending(pending)
+
+        logging.info(f"[MATCH {match_id}] ⏰ Confirmation timed out.")
+        idle_ids, requeue_ids = [], []
+        for pid in pending.player_ids:
+            if pending.responses[pid] is None:
+                # Did not respond – mark as idle
+                logging.info(f"[MATCH {match_id}] ⏰ Timeout: {pid} to idle")
+                idle_ids.append(pid)
+            else:
+                # Confirmed – still interested, return to queue
+                logging.info(f"[MATCH {match_id}] ⏰ Timeout: {pid} to IN_QUEUE")
+                requeue_ids.append(pid)
+        await abandon_match(match_id, idle_ids, requeue_ids)
+        request_matchmaking("confirmation timed out")
+
+        await asyncio.gather(*(
+            send_dm(bot, pid, "⏰ Match timed out. You didn't respond in time and have been marked as idle.")
+            if pending.responses[pid] is None else
+            send_dm(bot, pid, "⏰ Match timed out. Your opponent didn’t confirm, so you’ve been returned to the queue.")
+            for pid in pending.player_ids
+        ))
+
+async def start_confirmed_match(bot, pending):
+        match_id = pending.match_id
+        player1_id, player2_id = pending.player_ids
+        player_ids = pending.player_ids
+        matched_regions = pending.matched_regions
+        guild = guilds.get_guild()
+
+        p1, p2 = await asyncio.gather(members.member(guild, player1_id), members.member(guild, player2_id))
+        missing = [pid for pid, member in zip(player_ids, (p1, p2)) if member is None]
+        if missing:
+            # Left the server after confirming; nobody to open the channel to
+            present = [pid for pid in player_ids if pid not in missing]
+            logging.warning(f"[MATCH {match_id}] 🚪 {', '.join(missing)} not in the server. Canceling match...")
+            await abandon_match(match_id, missing, present)
+            request_matchmaking("confirmed player missing")
+            await asyncio.gather(*(
+                send_dm(bot, pid, "⚠️ Your opponent is no longer in the server, so you’ve been returned to the queue.", MATCH)
+                for pid in present
+            ))
+            return
 
-        p1 = guild.get_member(int(player1_id))
-        p2 = guild.get_member(int(player2_id))
+        # Both confirmed
+        logging.info(f"[MATCH {match_id}] ✅ Both players confirmed. Leasing match channel...")
+        await db.confirm_match(match_id)
 
         overwrites = {
             guild.default_role: discord.PermissionOverwrite(read_messages=False),
@@ -245,33 +472,24 @@ async def send_match_confirmation(bot, match_id, player1_id, player2_id, matched
             p2: discord.PermissionOverwrite(read_messages=True, send_messages=True),
         }
 
-        mod_role = discord.utils.get(guild.roles, name="Mod")
+        mod_role = guilds.role("Mod")
         if mod_role:
             overwrites[mod_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
 
-        category = discord.utils.get(guild.categories, name="Feer Duels - 2mans")
-        match_channel = await guild.create_text_channel(
-            name=f"match-{match_id}",
-            overwrites=overwrites,
-            category=category
-        )
+        match_channel = await channel_pool.lease(guild, match_id, overwrites)
 
-        logging.info(f"[MATCH {match_id}] 📺 Created channel #{match_channel.name} (ID: {match_channel.id})")
+        logging.info(f"[MATCH {match_id}] 📺 Leased channel #{match_channel.name} (ID: {match_channel.id})")
 
-        conn = sqlite3.connect("mmr.db")
-        cursor = conn.cursor()
-        cursor.execute("UPDATE matches SET channel_id = ? WHERE match_id = ?", (match_channel.id, match_id))
-        conn.commit()
-        conn.close()
+        await db.set_match_channel(match_id, match_channel.id)
 
         match_name = f"duel{match_id}"
         match_password = ''.join(random.choices(string.ascii_lowercase + string.digits, k=4))
         host = p1.display_name if random.choice([True, False]) else p2.display_name
         logging.info(f"[MATCH {match_id}] 🧩 Match setup: name={match_name}, pass={match_password}, host={host}")
 
-        score_report_channel = discord.utils.get(guild.text_channels, name="score-report")
+        score_report_channel = guilds.text_channel("score-report")
 
-        await match_channel.send(
+        await outbound.call(MATCH, f"channel:{match_channel.id}", match_channel.send,
             f"🎮 **Match `{match_id}` Confirmed!**\n"
             f"🏟️ Private Match Name: `{match_name}`\n"
             f"🔐 Password: `{match_password}`\n"
@@ -280,13 +498,13 @@ async def send_match_confirmation(bot, match_id, player1_id, player2_id, matched
             f"\nThis match is a **Best of 3**.\n"
             f"Once complete, one of you should report the result in <#{score_report_channel.id}> using:\n"
             f"`!report {match_id} W` or `!report {match_id} L`\n\n"
-            f"Good luck!"
+            f"Good luck!",
+            description=f"match {match_id} setup", idempotent=False
         )
 
-        for pid in player_ids:
-            user = await bot.fetch_user(int(pid))
-            await user.send(
-                f"✅ Match confirmed! Head to {match_channel.mention} for match setup info. GLHF 🎮"
-            )
-            logging.info(f"[MATCH {match_id}] ✉️ Sent final DM to {user.name} ({pid})")
+        await asyncio.gather(*(
+            send_dm(bot, pid, f"✅ Match confirmed! Head to {match_channel.mention} for match setup info. GLHF 🎮", MATCH)
+            for pid in player_ids
+        ))
+        logging.info(f"[MATCH {match_id}] ✉️ Sent final DMs to {', '.join(player_ids)}")
 
@@ -0,0 +1,73 @@
+import logging
+import os
+
+import discord
+
+from ttl_cache import TTLCache
+
+# Resolves discord ids to members/users without spending REST calls where it
+# can: the gateway cache first (intents.members keeps it populated), then a
+# bounded LRU of recent REST results, and only then the API. Concurrent
+# lookups of the same id share one request. Ids that no longer exist are
+# cached as None for the same TTL, so departed players on the leaderboard
+# don't cost a call on every render.
+
+MAX_ENTRIES = int(os.getenv("MEMBER_CACHE_SIZE", "5000"))
+TTL_SECONDS = float(os.getenv("MEMBER_CACHE_TTL_SECONDS", "600"))
+
+
+class MemberResolver:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.cache = TTLCache(max_entries, ttl)  # key -> member/user or None
+        self.counters = {"gateway": 0, "fetched": 0, "not_found": 0, "errors": 0}
+
+    @property
+    def stats(self):
+        return {**self.counters, "cached": self.cache.hits, "coalesced": self.cache.coalesced}
+
+    async def member(self, guild, discord_id) -> discord.Member | None:
+        discord_id = int(discord_id)
+        member = guild.get_member(discord_id)
+        if member is not None:
+            self.counters["gateway"] += 1
+            return member
+        key = ("member", guild.id, discord_id)
+        return await self.cache.get_or_fetch(key, lambda: self._fetch(key, guild.fetch_member, discord_id))
+
+    async def user(self, bot, discord_id) -> discord.User | None:
+        discord_id = int(discord_id)
+        user = bot.get_user(discord_id)
+        if user is not None:
+            self.counters["gateway"] += 1
+            return user
+        key = ("user", discord_id)
+        return await self.cache.get_or_fetch(key, lambda: self._fetch(key, bot.fetch_user, discord_id))
+
+    async def display_name(self, guild, discord_id) -> str | None:
+        member = await self.member(guild, discord_id)
+        return member.display_name if member else None
+
+    async def _fetch(self, key, fetch, discord_id):
+        self.counters["fetched"] += 1
+        try:
+            value = await fetch(discord_id)
+        except discord.NotFound:
+            self.counters["not_found"] += 1
+            value = None
+        except discord.HTTPException as e:
+            # Not cached: the next lookup tries again
+            self.counters["errors"] += 1
+            logging.warning(f"⚠️ Could not fetch {key[0]} {discord_id}: {e}")
+            return None
+        self.cache.put(key, value)
+        return value
+
+    def hit_ratio(self) -> float | None:
+        stats = self.stats
+        lookups = stats["gateway"] + stats["cached"] + stats["coalesced"] + stats["fetched"]
+        if not lookups:
+            return None
+        return round(1 - stats["fetched"] / lookups, 4)
+
+
+members = MemberResolver()
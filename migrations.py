@@ -0,0 +1,269 @@
+import logging
+import sqlite3
+
+from regions import parse_region_string
+from timestamps import to_epoch
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Each step must be safe on the production DB, which predates this file and
+# already has the tables (and most columns) created by hand.
+
+
+def _column_names(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _columns(cursor, table):
+    return set(_column_names(cursor, table))
+
+
+def _copy_table(cursor, source, target, conversions):
+    # Copies the columns both tables share, by name, converting those listed
+    # in conversions (column -> SQL expression). Columns only the new table
+    # has take their defaults; a column only the old table has would be lost,
+    # so that aborts the migration instead.
+    old = _column_names(cursor, source)
+    new = _column_names(cursor, target)
+    unexpected = [name for name in old if name not in new]
+    if unexpected:
+        raise RuntimeError(f"{source} has columns the migration doesn't know about: {', '.join(unexpected)}")
+    shared = [name for name in new if name in old]
+    cursor.execute(f"""
+        INSERT INTO {target} ({", ".join(shared)})
+        SELECT {", ".join(conversions.get(name, name) for name in shared)}
+        FROM {source}
+    """)
+
+
+def _add_columns(cursor, table, columns):
+    existing = _columns(cursor, table)
+    for name, decl in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def create_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS players (
+            discord_id TEXT PRIMARY KEY,
+            ign TEXT,
+            platform TEXT,
+            mmr INTEGER,
+            rankcheck_date TEXT,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            queue_status TEXT DEFAULT 'IDLE', -- IDLE, IN_QUEUE, IN_MATCH
+            queue_time TIMESTAMP,
+            regions TEXT,
+            ping INTEGER NOT NULL DEFAULT 0, -- see ping.PING_*
+            ping_time TIMESTAMP
+        )
+    """)
+    _add_columns(cursor, "players", [
+        ("wins", "INTEGER NOT NULL DEFAULT 0"),
+        ("losses", "INTEGER NOT NULL DEFAULT 0"),
+        ("queue_status", "TEXT DEFAULT 'IDLE'"),
+        ("queue_time", "TIMESTAMP"),
+        ("regions", "TEXT"),
+        ("ping", "INTEGER NOT NULL DEFAULT 0"),
+        ("ping_time", "TIMESTAMP"),
+    ])
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS matches (
+            match_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player1_id TEXT,
+            player2_id TEXT,
+            status TEXT, -- WAITING_CONFIRM, CONFIRMED, REPORTED, CANCELED
+            winner_id TEXT,
+            channel_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    _add_columns(cursor, "matches", [("channel_id", "INTEGER")])
+
+
+def create_indexes(cursor):
+    # Matchmaker reload and the queue embed: queue_status = 'IN_QUEUE'
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_queue
+        ON players (queue_status, mmr, discord_id, queue_time, regions)
+    """)
+    # Ping candidates: queue_status = 'IDLE' AND ping IN (...) AND mmr BETWEEN ...
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_ping
+        ON players (queue_status, ping, mmr, ping_time, discord_id, regions)
+    """)
+    # Leaderboard: only players with at least one result
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_leaderboard
+        ON players (mmr DESC, discord_id, wins, losses)
+        WHERE wins > 0 OR losses > 0
+    """)
+    # !stats: recent matches for either seat
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_matches_player1
+        ON matches (player1_id, created_at, player2_id, winner_id, status)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_matches_player2
+        ON matches (player2_id, created_at, player1_id, winner_id, status)
+    """)
+    # Pending confirmations and leased channels
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_matches_status
+        ON matches (status, channel_id)
+    """)
+
+
+def region_bitmask(cursor):
+    # Replace the comma separated regions column with regions.REGION_BITS
+    cursor.execute("ALTER TABLE players ADD COLUMN region_mask INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("SELECT discord_id, regions FROM players WHERE regions IS NOT NULL AND regions != ''")
+    cursor.executemany(
+        "UPDATE players SET region_mask = ? WHERE discord_id = ?",
+        [(parse_region_string(regions), discord_id) for discord_id, regions in cursor.fetchall()]
+    )
+    cursor.execute("DROP INDEX IF EXISTS idx_players_queue")
+    cursor.execute("DROP INDEX IF EXISTS idx_players_ping")
+    cursor.execute("ALTER TABLE players DROP COLUMN regions")
+    cursor.execute("""
+        CREATE INDEX idx_players_queue
+        ON players (queue_status, mmr, discord_id, queue_time, region_mask)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_players_ping
+        ON players (queue_status, ping, mmr, ping_time, region_mask, discord_id)
+    """)
+
+
+def epoch_timestamps(cursor):
+    # SQLite can't change a column's type, so both tables are rebuilt with
+    # INTEGER epoch columns and the old ISO strings / datetimes converted.
+    cursor.connection.create_function("to_epoch", 1, to_epoch)
+
+    cursor.execute("""
+        CREATE TABLE players_new (
+            discord_id TEXT PRIMARY KEY,
+            ign TEXT,
+            platform TEXT,
+            mmr INTEGER,
+            rankcheck_date INTEGER,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            queue_status TEXT DEFAULT 'IDLE', -- IDLE, IN_QUEUE, IN_MATCH
+            queue_time INTEGER,
+            region_mask INTEGER NOT NULL DEFAULT 0, -- see regions.REGION_BITS
+            ping INTEGER NOT NULL DEFAULT 0, -- see ping.PING_*
+            ping_time INTEGER
+        )
+    """)
+    _copy_table(cursor, "players", "players_new", {
+        "rankcheck_date": "to_epoch(rankcheck_date)",
+        "wins": "COALESCE(wins, 0)",
+        "losses": "COALESCE(losses, 0)",
+        "queue_time": "to_epoch(queue_time)",
+        "ping": "COALESCE(ping, 0)",
+        "ping_time": "to_epoch(ping_time)",
+    })
+    cursor.execute("DROP TABLE players")
+    cursor.execute("ALTER TABLE players_new RENAME TO players")
+
+    cursor.execute("""
+        CREATE TABLE matches_new (
+            match_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player1_id TEXT,
+            player2_id TEXT,
+            status TEXT, -- WAITING_CONFIRM, CONFIRMED, REPORTED, CANCELED
+            winner_id TEXT,
+            channel_id INTEGER,
+            created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    """)
+    _copy_table(cursor, "matches", "matches_new", {
+        "created_at": "COALESCE(to_epoch(created_at), 0)",
+    })
+    cursor.execute("DROP TABLE matches")
+    cursor.execute("ALTER TABLE matches_new RENAME TO matches")
+
+    cursor.execute("""
+        CREATE INDEX idx_players_queue
+        ON players (queue_status, mmr, discord_id, queue_time, region_mask)
+    """)
+    # Queue timeouts: queue_status = 'IN_QUEUE' AND queue_time < ?
+    cursor.execute("""
+        CREATE INDEX idx_players_queue_time
+        ON players (queue_status, queue_time)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_players_ping
+        ON players (queue_status, ping, mmr, ping_time, region_mask, discord_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_players_leaderboard
+        ON players (mmr DESC, discord_id, wins, losses)
+        WHERE wins > 0 OR losses > 0
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_matches_player1
+        ON matches (player1_id, created_at, player2_id, winner_id, status)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_matches_player2
+        ON matches (player2_id, created_at, player1_id, winner_id, status)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_matches_status
+        ON matches (status, channel_id)
+    """)
+
+
+MIGRATIONS = [
+    (1, "create tables", create_tables),
+    (2, "hot-path indexes", create_indexes),
+    (3, "region bitmask", region_bitmask),
+    (4, "epoch timestamps", epoch_timestamps),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def configure(conn):
+    # WAL lets the reader pool run alongside the writer; with WAL, NORMAL
+    # only fsyncs at checkpoints and can't corrupt the DB on power loss.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA busy_timeout = 5000")
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(path, target=SCHEMA_VERSION):
+    conn = sqlite3.connect(path)
+    try:
+        configure(conn)
+        current = start = schema_version(conn)
+        for version, description, step in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+            cursor = conn.cursor()
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            logging.info(f"🗄️ Applied migration {version}: {description}")
+            current = version
+        if current != start:
+            # Give the planner fresh statistics for the new indexes
+            conn.execute("ANALYZE")
+            conn.commit()
+        return current
+    finally:
+        conn.close()
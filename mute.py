@@ -1,8 +1,10 @@
 import discord
 from discord.ext import commands
-import sqlite3
 import logging
 from ping import PING_NO
+from db import db
+from guilds import guilds
+from outbound import outbound, REPLY, delete_command, reply
 
 def register_mute_command(bot: commands.Bot):
     @bot.command()
@@ -14,38 +16,33 @@ def register_mute_command(bot: commands.Bot):
         # Disallow using the command in public channels except #queue-here
         if not isinstance(ctx.channel, discord.DMChannel) and ctx.channel.name != "queue-here":
             logging.warning(f"User {ctx.author} tried to !mute from #{ctx.channel.name}, which is not allowed.")
-            await ctx.send("❌ You can only use `!mute` in DMs or in the #queue-here channel.")
-            await ctx.message.delete()
+            await reply(ctx, "❌ You can only use `!mute` in DMs or in the #queue-here channel.")
+            await delete_command(ctx)
             return
 
         # Get the member and guild
-        guild = discord.utils.get(bot.guilds)
+        guild = guilds.get_guild()
         member = guild.get_member(ctx.author.id)
 
         if not member:
-            await ctx.send("❌ Could not verify your account. Please try again later.")
+            await reply(ctx, "❌ Could not verify your account. Please try again later.")
             return
 
         # Check if the player exists in the database
-        conn = sqlite3.connect("mmr.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM players WHERE discord_id = ?", (user_id,))
-        if not cursor.fetchone():
-            await ctx.send("❌ You are not registered. Use `!rankcheck` first.")
-            conn.close()
+        if not await db.player_exists(user_id):
+            await reply(ctx, "❌ You are not registered. Use `!rankcheck` first.")
             return
 
         # Update ping column
-        cursor.execute("UPDATE players SET ping = ? WHERE discord_id = ?", (PING_NO, user_id,))
-        conn.commit()
-        conn.close()
+        await db.set_ping(user_id, PING_NO)
         logging.info(f"Set ping = {PING_NO} for {user_id}")
 
         # Remove ping role
-        ping_role = discord.utils.get(guild.roles, name="PING")
+        ping_role = guilds.role("PING")
         if ping_role and ping_role in member.roles:
-            await member.remove_roles(ping_role)
-            await ctx.send("🔇 You have been muted from match pings.")
+            await outbound.call(REPLY, f"guild:{guild.id}", member.remove_roles, ping_role,
+                                description=f"PING role from {user_id}")
+            await reply(ctx, "🔇 You have been muted from match pings.")
             logging.info(f"Removed Ping role from {user_id}")
         else:
-            await ctx.send("ℹ️ You weren’t being pinged anyway.")
+            await reply(ctx, "ℹ️ You weren’t being pinged anyway.")
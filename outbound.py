@@ -0,0 +1,223 @@
+import asyncio
+import itertools
+import logging
+import os
+import statistics
+import time
+from collections import Counter, deque
+
+from retry import backoff_delay, is_transient
+
+# Central queue for messages, edits and DMs the bot sends to Discord.
+#
+# Every call is tagged with a priority class and a bucket (roughly a Discord
+# rate-limit route: one channel, one user's DMs). Higher classes always go
+# first; at most BUCKET_CONCURRENCY calls run per bucket and CONCURRENCY in
+# total, and the low classes (pings, leaderboard) may only use
+# LOW_PRIORITY_SLOTS of those, so a fan-out of pings can't hold up match
+# confirmations. Transient failures are retried with backoff without holding
+# a slot; calls that aren't idempotent (sends) aren't retried after a
+# timeout, which may have come after Discord accepted them. This is the only
+# layer that retries Discord calls. Droppable items are discarded once they
+# are older than their max_age or when their class backs up past MAX_DEPTH.
+
+MATCH, REPLY, PING, LEADERBOARD = range(4)
+CLASS_NAMES = ("match", "reply", "ping", "leaderboard")
+LOW_PRIORITY = PING
+
+CONCURRENCY = int(os.getenv("OUTBOUND_CONCURRENCY", "8"))
+LOW_PRIORITY_SLOTS = int(os.getenv("OUTBOUND_LOW_PRIORITY_SLOTS", "4"))
+BUCKET_CONCURRENCY = 1
+MAX_DEPTH = 500  # Per class, before droppable items are shed
+MAX_ATTEMPTS = 4
+LATENCY_SAMPLES = 500
+REPORT_INTERVAL_SECONDS = float(os.getenv("OUTBOUND_REPORT_INTERVAL_SECONDS", "300"))  # Snapshot logged at most this often
+
+
+class Dropped(Exception):
+    pass
+
+
+class OutboundItem:
+    __slots__ = ("priority", "bucket", "fn", "args", "kwargs", "description", "droppable", "idempotent",
+                 "expires_at", "queued_at", "attempts", "future")
+
+    def __init__(self, priority, bucket, fn, args, kwargs, description, droppable, idempotent, max_age, future):
+        self.priority = priority
+        self.bucket = bucket
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.description = description
+        self.droppable = droppable
+        self.idempotent = idempotent
+        self.queued_at = time.monotonic()
+        self.expires_at = self.queued_at + max_age if max_age is not None else None
+        self.attempts = 0
+        self.future = future
+
+
+class Outbound:
+    def __init__(self, concurrency=CONCURRENCY, low_priority_slots=LOW_PRIORITY_SLOTS):
+        self.concurrency = concurrency
+        self.low_priority_slots = low_priority_slots
+        self.queues = [deque() for _ in CLASS_NAMES]
+        self.in_flight = 0
+        self.low_in_flight = 0
+        self.busy = Counter()  # bucket -> calls running
+        self.latency = [deque(maxlen=LATENCY_SAMPLES) for _ in CLASS_NAMES]
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "dropped": 0, "failed": 0}
+        self._seq = itertools.count()
+        self.last_report = time.monotonic()
+
+    def post(self, priority, bucket, fn, *args, description=None, droppable=False, idempotent=True, max_age=None,
+             **kwargs):
+        # Fire and forget; failures are logged
+        future = self._submit(priority, bucket, fn, args, kwargs, description, droppable, idempotent, max_age)
+        future.add_done_callback(_consume)
+        return future
+
+    async def call(self, priority, bucket, fn, *args, description=None, droppable=False, idempotent=True, max_age=None,
+                   **kwargs):
+        # Waits for the call to go out and returns its result or raises its
+        # final error (Dropped if it was shed)
+        return await self._submit(priority, bucket, fn, args, kwargs, description, droppable, idempotent, max_age)
+
+    def _submit(self, priority, bucket, fn, args, kwargs, description, droppable, idempotent, max_age):
+        future = asyncio.get_running_loop().create_future()
+        item = OutboundItem(priority, bucket, fn, args, kwargs, description or f"{CLASS_NAMES[priority]} {bucket}",
+                            droppable, idempotent, max_age, future)
+        self.stats["queued"] += 1
+        self._report()
+        queue = self.queues[priority]
+        queue.append(item)
+        if len(queue) > MAX_DEPTH:
+            self._shed(queue)
+        self._pump()
+        return future
+
+    def _shed(self, queue):
+        for item in queue:
+            if item.droppable:
+                queue.remove(item)
+                self._drop(item, "queue full")
+                return
+
+    def _drop(self, item, reason):
+        self.stats["dropped"] += 1
+        logging.info(f"🗑️ Dropped '{item.description}' ({reason})")
+        if not item.future.done():
+            item.future.set_exception(Dropped(reason))
+
+    def _pump(self):
+        now = time.monotonic()
+        for priority, queue in enumerate(self.queues):
+            deferred = []
+            while queue and self.in_flight < self.concurrency:
+                if priority >= LOW_PRIORITY and self.low_in_flight >= self.low_priority_slots:
+                    break
+                item = queue.popleft()
+                if item.droppable and item.expires_at is not None and now > item.expires_at:
+                    self._drop(item, "stale")
+                    continue
+                if self.busy[item.bucket] >= BUCKET_CONCURRENCY:
+                    deferred.append(item)
+                    continue
+                self._start(item)
+            queue.extendleft(reversed(deferred))
+            if self.in_flight >= self.concurrency:
+                return
+
+    def _start(self, item):
+        self.in_flight += 1
+        if item.priority >= LOW_PRIORITY:
+            self.low_in_flight += 1
+        self.busy[item.bucket] += 1
+        asyncio.get_running_loop().create_task(self._run(item))
+
+    async def _run(self, item):
+        item.attempts += 1
+        try:
+            result = await item.fn(*item.args, **item.kwargs)
+        except Exception as e:
+            self._failed(item, e)
+        else:
+            self.stats["sent"] += 1
+            self.latency[item.priority].append(time.monotonic() - item.queued_at)
+            if not item.future.done():
+                item.future.set_result(result)
+        finally:
+            self.in_flight -= 1
+            if item.priority >= LOW_PRIORITY:
+                self.low_in_flight -= 1
+            self.busy[item.bucket] -= 1
+            if not self.busy[item.bucket]:
+                del self.busy[item.bucket]
+            self._pump()
+
+    def _failed(self, item, e):
+        if is_transient(e, item.idempotent) and item.attempts < MAX_ATTEMPTS:
+            delay = backoff_delay(item.attempts)
+            self.stats["retried"] += 1
+            logging.warning(f"🔁 '{item.description}' failed ({e}); retry {item.attempts}/{MAX_ATTEMPTS - 1} in {delay:.1f}s")
+            asyncio.get_running_loop().call_later(delay, self._requeue, item)
+            return
+        self.stats["failed"] += 1
+        logging.warning(f"⚠️ '{item.description}' failed: {e}")
+        if not item.future.done():
+            item.future.set_exception(e)
+
+    def _requeue(self, item):
+        self.queues[item.priority].appendleft(item)
+        self._pump()
+
+    def _report(self):
+        # Piggybacks on traffic, so an idle bot doesn't log anything
+        now = time.monotonic()
+        if now - self.last_report >= REPORT_INTERVAL_SECONDS:
+            self.last_report = now
+            logging.info(f"📤 Outbound: {self.snapshot()}")
+
+    def snapshot(self):
+        latency = {}
+        for name, samples in zip(CLASS_NAMES, self.latency):
+            if samples:
+                ordered = sorted(samples)
+                latency[name] = {
+                    "p50_ms": round(statistics.median(ordered) * 1000, 1),
+                    "p90_ms": round(ordered[int(len(ordered) * 0.9) - 1] * 1000, 1) if len(ordered) >= 10 else None,
+                }
+        return {
+            **self.stats,
+            "depth": {name: len(queue) for name, queue in zip(CLASS_NAMES, self.queues)},
+            "in_flight": self.in_flight,
+            "latency": latency,
+        }
+
+
+def _consume(future):
+    # post() callers don't await; the failure has already been logged
+    if not future.cancelled():
+        future.exception()
+
+
+outbound = Outbound()
+
+
+async def reply(ctx, content=None, priority=REPLY, **kwargs):
+    return await outbound.call(priority, f"channel:{ctx.channel.id}", ctx.send, content, idempotent=False,
+                               description=f"reply in {ctx.channel.id}", **kwargs)
+
+
+async def dm(user, content=None, priority=REPLY, **kwargs):
+    return await outbound.call(priority, f"dm:{user.id}", user.send, content, idempotent=False,
+                               description=f"DM to {user.id}", **kwargs)
+
+
+async def react(ctx, emoji):
+    await outbound.call(REPLY, f"channel:{ctx.channel.id}", ctx.message.add_reaction, emoji,
+                        description=f"reaction {emoji}")
+
+
+async def delete_command(ctx):
+    await outbound.call(REPLY, f"channel:{ctx.channel.id}", ctx.message.delete, description=f"delete !{ctx.command}")
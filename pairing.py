@@ -0,0 +1,342 @@
+import bisect
+import logging
+import os
+from collections import deque
+
+# Batch engine weights: a pair costs its MMR gap, minus a bonus for how long
+# both players have waited and for every extra region they share.
+WAIT_WEIGHT = float(os.getenv("MATCHMAKING_WAIT_WEIGHT", "1.0"))  # MMR points per minute waited
+REGION_WEIGHT = float(os.getenv("MATCHMAKING_REGION_WEIGHT", "5.0"))  # MMR points per shared region
+SEARCH_BUDGET = 200_000  # Neighbour checks per augmenting path search before it gives up
+
+INF = float("inf")
+
+
+class PairingStats:
+    __slots__ = ("passes", "pairs", "wait_seconds")
+
+    def __init__(self):
+        self.passes = 0
+        self.pairs = 0
+        self.wait_seconds = 0.0
+
+    def record(self, pairs, now):
+        self.passes += 1
+        self.pairs += len(pairs)
+        for p1, p2 in pairs:
+            self.wait_seconds += (now - p1.queued_at) + (now - p2.queued_at)
+
+    @property
+    def average_wait_minutes(self):
+        return self.wait_seconds / (2 * self.pairs) / 60 if self.pairs else 0.0
+
+    def as_dict(self):
+        return {
+            "passes": self.passes,
+            "pairs": self.pairs,
+            "average_wait_minutes": round(self.average_wait_minutes, 2),
+        }
+
+
+class PairingEngine:
+    # pair() picks pairs from the queue index, removes them from it and
+    # returns (older, newer) entry tuples. range_for(entry) is the entry's
+    # current ±MMR window.
+    name = None
+
+    def __init__(self):
+        self.stats = PairingStats()
+
+    def pair(self, index, now, range_for):
+        pairs = self._pair(index, now, range_for)
+        self.stats.record(pairs, now)
+        logging.info(f"🧮 [{self.name}] {len(pairs)} pair(s) this pass; totals {self.stats.as_dict()}")
+        return pairs
+
+    def _pair(self, index, now, range_for):
+        raise NotImplementedError
+
+
+class _MinTree:
+    # Segment tree over one region bucket holding each player's queue rank,
+    # so "oldest player within this MMR slice" is a single O(log n) query.
+    __slots__ = ("size", "tree")
+
+    def __init__(self, values):
+        self.size = len(values)
+        self.tree = [INF] * self.size + list(values)
+        for i in range(self.size - 1, 0, -1):
+            self.tree[i] = min(self.tree[2 * i], self.tree[2 * i + 1])
+
+    def clear(self, pos):
+        i = pos + self.size
+        self.tree[i] = INF
+        i //= 2
+        while i:
+            self.tree[i] = min(self.tree[2 * i], self.tree[2 * i + 1])
+            i //= 2
+
+    def min(self, lo, hi):
+        result = INF
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                result = min(result, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = min(result, self.tree[hi])
+            lo //= 2
+            hi //= 2
+        return result
+
+
+class GreedyPairing(PairingEngine):
+    # Oldest player first, paired with the oldest later player in range.
+    # Players are dropped from the trees once visited, so the minimum left in
+    # any MMR slice is always a later player.
+    name = "greedy"
+
+    def _pair(self, index, now, range_for):
+        queued = index.oldest_first()
+        rank = {entry.discord_id: i for i, entry in enumerate(queued)}
+        slices = {}
+        for region, bucket in index.buckets.items():
+            mmrs = [mmr for mmr, _, _ in bucket]
+            positions = {discord_id: i for i, (_, _, discord_id) in enumerate(bucket)}
+            tree = _MinTree([rank[discord_id] for _, _, discord_id in bucket])
+            slices[region] = (mmrs, positions, tree)
+
+        def drop(entry):
+            for region in entry.regions:
+                _, positions, tree = slices[region]
+                tree.clear(positions[entry.discord_id])
+
+        pairs = []
+        for p1 in queued:
+            if p1.discord_id not in index:
+                continue
+            drop(p1)
+            mmr_range = range_for(p1)
+            best = INF
+            for region in p1.regions:
+                mmrs, _, tree = slices[region]
+                lo = bisect.bisect_left(mmrs, p1.mmr - mmr_range)
+                hi = bisect.bisect_right(mmrs, p1.mmr + mmr_range)
+                best = min(best, tree.min(lo, hi))
+            if best == INF:
+                continue
+            p2 = queued[best]
+            drop(p2)
+            index.remove(p1.discord_id)
+            index.remove(p2.discord_id)
+            pairs.append((p1, p2))
+        return pairs
+
+
+class BatchPairing(PairingEngine):
+    # Pairs the whole queue at once, for the most matches possible. Two
+    # players can meet if they share a region and their gap is within either
+    # one's range.
+    #
+    # Each region bucket (scarcest first) is seeded with a DP over players
+    # adjacent in MMR, which is the cheapest pairing among neighbours but not
+    # always the largest: with uneven ranges a player can reach past their
+    # neighbour. Edmonds' augmenting paths then grow the seed to a maximum
+    # matching across all regions. The count is optimal unless a search runs
+    # out of SEARCH_BUDGET, which takes a dense queue of thousands of players.
+    # The cost is only minimised over the adjacent pairs the DP picked.
+    name = "batch"
+
+    def _pair(self, index, now, range_for):
+        players = index.oldest_first()
+        position = {entry.discord_id: i for i, entry in enumerate(players)}
+        ranges = [range_for(entry) for entry in players]
+        buckets = {}
+        for region, bucket in index.buckets.items():
+            ids = [position[discord_id] for _, _, discord_id in bucket]
+            buckets[region] = ([mmr for mmr, _, _ in bucket], ids, max(ranges[i] for i in ids))
+
+        mate = [-1] * len(players)
+        for region in sorted(buckets, key=lambda r: len(buckets[r][1])):
+            free = [i for i in buckets[region][1] if mate[i] == -1]
+            for a, b in self._pair_bucket(players, ranges, free, now):
+                mate[a], mate[b] = b, a
+
+        _Augmenter(players, ranges, buckets, mate).run()
+
+        pairs = []
+        for a, b in enumerate(mate):
+            if a < b:
+                p1, p2 = players[a], players[b]
+                index.remove(p1.discord_id)
+                index.remove(p2.discord_id)
+                pairs.append((p1, p2))
+        return pairs
+
+    def _pair_bucket(self, players, ranges, bucket, now):
+        # bucket holds player positions sorted by MMR
+        n = len(bucket)
+
+        # best[i] = (matches, -cost) using the first i players
+        best = [(0, 0.0)] * (n + 1)
+        took_pair = [False] * (n + 1)
+        for i in range(2, n + 1):
+            best[i] = best[i - 1]
+            a, b = bucket[i - 2], bucket[i - 1]
+            diff = players[b].mmr - players[a].mmr
+            if diff <= max(ranges[a], ranges[b]):
+                matches, neg_cost = best[i - 2]
+                candidate = (matches + 1, neg_cost - self._cost(players[a], players[b], diff, now))
+                if candidate > best[i]:
+                    best[i] = candidate
+                    took_pair[i] = True
+
+        chosen = []
+        i = n
+        while i >= 2:
+            if took_pair[i]:
+                chosen.append((bucket[i - 2], bucket[i - 1]))
+                i -= 2
+            else:
+                i -= 1
+        return chosen
+
+    @staticmethod
+    def _cost(a, b, diff, now):
+        waited_minutes = ((now - a.queued_at) + (now - b.queued_at)) / 60
+        shared_regions = (a.region_mask & b.region_mask).bit_count()
+        return diff - WAIT_WEIGHT * waited_minutes - REGION_WEIGHT * (shared_regions - 1)
+
+
+class _Augmenter:
+    # Edmonds' blossom search for augmenting paths, one free player at a
+    # time. Neighbours are found with bisect on the region buckets instead of
+    # an edge list, which would be quadratic in a dense queue. A search that
+    # fails leaves a tree none of whose players can be on a later augmenting
+    # path, so those players are dropped; a search over budget just stops.
+    def __init__(self, players, ranges, buckets, mate, budget=SEARCH_BUDGET):
+        self.players = players
+        self.ranges = ranges
+        self.buckets = buckets
+        self.mate = mate
+        self.budget = budget
+        self.checks = 0
+        self.dead = set()
+
+    def neighbours(self, v):
+        entry = self.players[v]
+        reach = self.ranges[v]
+        seen = set()
+        for region in entry.regions:
+            mmrs, ids, max_range = self.buckets[region]
+            lo = bisect.bisect_left(mmrs, entry.mmr - max_range)
+            hi = bisect.bisect_right(mmrs, entry.mmr + max_range)
+            self.checks += hi - lo
+            for k in range(lo, hi):
+                u = ids[k]
+                if u == v or u in seen or u in self.dead:
+                    continue
+                if abs(mmrs[k] - entry.mmr) <= max(reach, self.ranges[u]):
+                    seen.add(u)
+                    yield u
+
+    def run(self):
+        mate = self.mate
+        for root in range(len(mate)):
+            if mate[root] == -1 and root not in self.dead:
+                self.search(root)
+
+    def search(self, root):
+        mate = self.mate
+        parent = {}
+        base = {root: root}
+        members = {root: [root]}  # blossom base -> players shrunk into it
+        tree = [root]
+        outer = {root}
+        queue = deque([root])
+        self.checks = 0
+
+        def find(v):
+            return base.get(v, v)
+
+        def lca(a, b):
+            path = set()
+            while True:
+                a = find(a)
+                path.add(a)
+                if mate[a] == -1:
+                    break
+                a = parent[mate[a]]
+            while True:
+                b = find(b)
+                if b in path:
+                    return b
+                b = parent[mate[b]]
+
+        def mark(v, b, child, blossom):
+            while find(v) != b:
+                blossom.add(find(v))
+                blossom.add(find(mate[v]))
+                parent[v] = child
+                child = mate[v]
+                v = parent[mate[v]]
+
+        while queue:
+            if self.checks > self.budget:
+                return False
+            v = queue.popleft()
+            for to in self.neighbours(v):
+                if find(v) == find(to) or mate[v] == to:
+                    continue
+                if to == root or (mate[to] != -1 and mate[to] in parent):
+                    # Odd cycle: shrink it into a blossom around its base
+                    b = lca(v, to)
+                    blossom = set()
+                    mark(v, b, to, blossom)
+                    mark(to, b, v, blossom)
+                    for old in blossom:
+                        if old == b:
+                            continue
+                        moved = members.pop(old)
+                        self.checks += len(moved)
+                        members[b].extend(moved)
+                        for u in moved:
+                            base[u] = b
+                            if u not in outer:
+                                outer.add(u)
+                                queue.append(u)
+                elif to not in parent:
+                    parent[to] = v
+                    tree.append(to)
+                    members[to] = [to]
+                    if mate[to] == -1:
+                        self.augment(parent, to)
+                        return True
+                    outer.add(mate[to])
+                    tree.append(mate[to])
+                    members[mate[to]] = [mate[to]]
+                    queue.append(mate[to])
+        self.dead.update(tree)
+        return False
+
+    def augment(self, parent, v):
+        mate = self.mate
+        while v != -1:
+            pv = parent[v]
+            next_v = mate[pv]
+            mate[v] = pv
+            mate[pv] = v
+            v = next_v
+
+
+ENGINES = {engine.name: engine for engine in (GreedyPairing, BatchPairing)}
+
+
+def get_pairing_engine(name: str) -> PairingEngine:
+    try:
+        return ENGINES[name.lower()]()
+    except KeyError:
+        logging.warning(f"⚠️ Unknown pairing engine '{name}', falling back to greedy")
+        return GreedyPairing()
@@ -1,7 +1,9 @@
 import discord
 from discord.ext import commands
-import sqlite3
 import logging
+from db import db
+from guilds import guilds
+from outbound import outbound, REPLY, delete_command, reply
 
 PING_NO = 0
 PING_PUBLIC = 1
@@ -19,43 +21,38 @@ def register_ping_command(bot: commands.Bot):
 
         if not isinstance(ctx.channel, discord.DMChannel) and ctx.channel.name != "queue-here":
             logging.warning(f"User {ctx.author} tried to !ping from #{ctx.channel.name}, which is not allowed.")
-            await ctx.send("❌ You can only use `!ping` in DMs or in the #queue-here channel.")
-            await ctx.message.delete()
+            await reply(ctx, "❌ You can only use `!ping` in DMs or in the #queue-here channel.")
+            await delete_command(ctx)
             return
 
-        guild = discord.utils.get(bot.guilds)
+        guild = guilds.get_guild()
         member = guild.get_member(ctx.author.id)
 
         if not member:
-            await ctx.send("❌ Could not verify your account. Please try again later.")
+            await reply(ctx, "❌ Could not verify your account. Please try again later.")
             return
 
         # Determine ping setting
         ping_value = PING_DM if mode and mode.lower() == "dm" else PING_PUBLIC
 
         # Check if the player exists
-        conn = sqlite3.connect("mmr.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM players WHERE discord_id = ?", (user_id,))
-        if not cursor.fetchone():
-            await ctx.send("❌ You are not registered. Use `!rankcheck` first.")
-            conn.close()
+        if not await db.player_exists(user_id):
+            await reply(ctx, "❌ You are not registered. Use `!rankcheck` first.")
             return
 
         # Update ping column
-        cursor.execute("UPDATE players SET ping = ? WHERE discord_id = ?", (ping_value, user_id))
-        conn.commit()
-        conn.close()
+        await db.set_ping(user_id, ping_value)
         logging.info(f"Set ping = {ping_value} for {user_id}")
 
         # Add ping role if needed
-        ping_role = discord.utils.get(guild.roles, name="PING")
+        ping_role = guilds.role("PING")
         if ping_role:
-            await member.add_roles(ping_role)
+            await outbound.call(REPLY, f"guild:{guild.id}", member.add_roles, ping_role,
+                                description=f"PING role to {user_id}")
             logging.info(f"Gave PING role to {user_id}")
 
         # Send appropriate confirmation
         if ping_value == PING_DM:
-            await ctx.send("✅ You will now be **DM'd** for future match opportunities.")
+            await reply(ctx, "✅ You will now be **DM'd** for future match opportunities.")
         else:
-            await ctx.send("✅ You will now be pinged in **#queue-here** for future matches.")
+            await reply(ctx, "✅ You will now be pinged in **#queue-here** for future matches.")
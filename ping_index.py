@@ -0,0 +1,63 @@
+import bisect
+from collections import defaultdict
+from operator import itemgetter
+
+# Idle players with pings turned on (ping != 0), the only ones a new queuer
+# can ping. They are bucketed by their exact region mask and kept sorted by
+# MMR inside each bucket, so every subscriber sits in one bucket. Finding
+# who to ping is a bisect per bucket sharing a region with the queuer plus
+# a slice of the players in range, with no de-duplication across regions.
+# PlayerCache keeps it in sync with every write that changes ping, mmr,
+# region_mask or queue status.
+
+_mmr = itemgetter(0)
+
+
+class PingIndex:
+    def __init__(self):
+        self.buckets = defaultdict(list)  # region mask -> [(mmr, discord_id)]
+        self.entries = {}  # discord id -> (mmr, region_mask)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self, records):
+        self.buckets.clear()
+        self.entries.clear()
+        for record in records:
+            entry = self._entry(record)
+            if entry is not None:
+                self.entries[record.discord_id] = entry
+                self.buckets[entry[1]].append((entry[0], record.discord_id))
+        for bucket in self.buckets.values():
+            bucket.sort()
+
+    @staticmethod
+    def _entry(record):
+        if not record.ping or record.mmr is None or not record.region_mask or record.status != "IDLE":
+            return None
+        return (record.mmr, record.region_mask)
+
+    def update(self, record):
+        entry = self._entry(record)
+        old = self.entries.get(record.discord_id)
+        if entry == old:
+            return
+        if old is not None:
+            bucket = self.buckets[old[1]]
+            del bucket[bisect.bisect_left(bucket, (old[0], record.discord_id))]
+            if not bucket:
+                del self.buckets[old[1]]
+            del self.entries[record.discord_id]
+        if entry is not None:
+            bisect.insort(self.buckets[entry[1]], (entry[0], record.discord_id))
+            self.entries[record.discord_id] = entry
+
+    def in_range(self, min_mmr, max_mmr, region_mask) -> list[str]:
+        found = []
+        for mask, bucket in self.buckets.items():
+            if mask & region_mask:
+                lo = bisect.bisect_left(bucket, min_mmr, key=_mmr)
+                hi = bisect.bisect_right(bucket, max_mmr, lo, key=_mmr)
+                found.extend(discord_id for _, discord_id in bucket[lo:hi])
+        return found
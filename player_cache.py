@@ -0,0 +1,125 @@
+import logging
+import sys
+
+from ping_index import PingIndex
+from rank_index import RankIndex
+
+# Process-wide copy of the players table. Database loads it once and updates
+# it after every committed write that touches players, so per-player reads
+# are dictionary lookups. Once loaded, a miss means "not registered".
+# The RankIndex of standings and the PingIndex of idle ping subscribers are
+# maintained alongside.
+
+PLAYER_COLUMNS = (
+    "discord_id, ign, platform, mmr, rankcheck_date, wins, losses, "
+    "queue_status, queue_time, region_mask, ping, ping_time"
+)
+
+_STATUSES = {s: sys.intern(s) for s in ("IDLE", "IN_QUEUE", "IN_MATCH")}
+_RANKED_FIELDS = {"mmr", "wins", "losses"}
+_PING_FIELDS = {"ping", "mmr", "region_mask", "status"}
+
+
+class PlayerRecord:
+    __slots__ = (
+        "discord_id", "ign", "platform", "mmr", "rankcheck_date", "wins", "losses",
+        "status", "queue_time", "region_mask", "ping", "ping_time",
+    )
+
+    def __init__(self, discord_id, ign=None, platform=None, mmr=None, rankcheck_date=None, wins=0, losses=0,
+                 status="IDLE", queue_time=None, region_mask=0, ping=0, ping_time=None):
+        self.discord_id = discord_id
+        self.ign = ign
+        self.platform = platform
+        self.mmr = mmr
+        self.rankcheck_date = rankcheck_date
+        self.wins = wins
+        self.losses = losses
+        self.status = _STATUSES.get(status, status)
+        self.queue_time = queue_time
+        self.region_mask = region_mask
+        self.ping = ping
+        self.ping_time = ping_time
+
+    def __repr__(self):
+        return f"PlayerRecord({self.discord_id}, mmr={self.mmr}, status={self.status})"
+
+    def set_status(self, status):
+        self.status = _STATUSES.get(status, status)
+
+
+class PlayerCache:
+    def __init__(self):
+        self.records = {}
+        self.ranks = RankIndex()
+        self.pings = PingIndex()
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def load(self, rows):
+        self.records = {str(row[0]): PlayerRecord(str(row[0]), *row[1:]) for row in rows}
+        self.ranks.load(self.records.values())
+        self.pings.load(self.records.values())
+        self.loaded = True
+        stats = self.stats()
+        logging.info(
+            f"🧠 Player cache loaded: {stats['players']} players ({len(self.ranks)} ranked, {len(self.pings)} idle ping subscribers), "
+            f"{stats['bytes_per_10k'] / 1024:.0f} KiB per 10k players"
+        )
+
+    def get(self, discord_id):
+        record = self.records.get(str(discord_id))
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def put(self, record):
+        self.records[record.discord_id] = record
+        self.ranks.update(record)
+        self.pings.update(record)
+
+    def update(self, discord_id, **fields):
+        # Ignores players the cache doesn't know about (e.g. rows written by
+        # tools outside the bot); they show up on the next load.
+        record = self.records.get(str(discord_id))
+        if record is None:
+            return
+        for name, value in fields.items():
+            if name == "status":
+                record.set_status(value)
+            else:
+                setattr(record, name, value)
+        if not _RANKED_FIELDS.isdisjoint(fields):
+            self.ranks.update(record)
+        if not _PING_FIELDS.isdisjoint(fields):
+            self.pings.update(record)
+
+    def footprint(self) -> int:
+        # Bytes held by the records, their per-player values and the dict.
+        # Interned statuses and small ints are shared, so they aren't counted.
+        total = sys.getsizeof(self.records)
+        for key, record in self.records.items():
+            total += sys.getsizeof(record) + sys.getsizeof(key)
+            for name in ("ign", "platform", "mmr", "rankcheck_date", "queue_time", "ping_time"):
+                value = getattr(record, name)
+                if value is not None and not (isinstance(value, int) and -5 <= value <= 256):
+                    total += sys.getsizeof(value)
+        return total
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        footprint = self.footprint()
+        return {
+            "players": len(self.records),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "bytes": footprint,
+            "bytes_per_10k": footprint * 10_000 // len(self.records) if self.records else 0,
+        }
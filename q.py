@@ -1,15 +1,19 @@
-import sqlite3
 import discord
 from discord.ext import commands
-import datetime
 import logging
-import re
 
-from utils import get_rank, create_queue_embed
-from matchmaker import run_matchmaking, BASE_RANGE
+from utils import get_rank
+from db import db
+from matchmaker import request_matchmaking, BASE_RANGE
+from queue_index import queue_index
+from queue_status import queue_status
+from outbound import outbound, PING, delete_command, dm
+from guilds import guilds
 from ping import PING_PUBLIC, PING_DM
+from regions import REGION_ROLE_NAMES, regions_to_mask
+from timestamps import now_ts, to_datetime
 
-REGION_ROLE_NAMES = ["NA", "EU", "SAM", "MENA", "APAC", "OCE"]
+PING_MAX_AGE = 60  # Seconds a ping may wait behind match traffic before it's dropped
 
 def register_queue_command(bot: commands.Bot):
     @bot.command(aliases=["queue"])
@@ -20,42 +24,38 @@ def register_queue_command(bot: commands.Bot):
         # Disallow using the command in public channels except #queue-here
         if not isinstance(ctx.channel, discord.DMChannel) and ctx.channel.name != "queue-here":
             logging.warning(f"User {ctx.author} tried to queue from #{ctx.channel.name}, which is not allowed.")
-            await ctx.author.send("❌ You can only use `!q` in DMs or in the #queue-here channel.")
-            await ctx.message.delete()
+            await dm(ctx.author, "❌ You can only use `!q` in DMs or in the #queue-here channel.")
+            await delete_command(ctx)
             return
 
         user_id = str(ctx.author.id)
 
         # Get the guild and member object for role-checking
-        guild = discord.utils.get(bot.guilds)  # assumes bot is only in one server
+        guild = guilds.get_guild()
         member = guild.get_member(ctx.author.id)
         if not member:
-            await ctx.author.send("❌ Could not verify your roles. Please try again later.")
+            await dm(ctx.author, "❌ Could not verify your roles. Please try again later.")
             return
 
         # Determine region roles from user
         region_roles = [role.name for role in member.roles if role.name in REGION_ROLE_NAMES]
         logging.info(f"Region roles for {user_id}: {region_roles}")
         if not region_roles:
-            await ctx.author.send(
+            await dm(ctx.author, 
                 "❌ You need at least one region role to queue.\n"
                 "Please head over to <#1362802610796630340> and react to choose the regions you play in."
                 #TODO fix this channel link to be better
             )
             return
 
-        # Connect to DB and set queue_status to IN_QUEUE
-        conn = sqlite3.connect('mmr.db')
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT queue_status, mmr FROM players WHERE discord_id = ?", (user_id,))
-        row = cursor.fetchone()
+        # Look up the player, then set queue_status to IN_QUEUE
+        row = await db.get_player_status(user_id)
 
         if not row:
             logging.warning(f"User {user_id} not found in DB. Prompting registration.")
-            await ctx.author.send("❌ You are not registered. Please use `!rankcheck` before queueing.")
+            await dm(ctx.author, "❌ You are not registered. Please use `!rankcheck` before queueing.")
             if not isinstance(ctx.channel, discord.DMChannel):
-                await ctx.message.delete()
+                await delete_command(ctx)
             return
 
         status, mmr = row
@@ -65,86 +65,72 @@ def register_queue_command(bot: commands.Bot):
         if status != "IDLE" and status is not None:
             logging.warning(f"{user_id} attempted to queue while {status}")
             # You can uncomment this to enforce status logic
-            # await ctx.author.send(f"❌ You are currently marked as `{status}`. You can only queue if you're `IDLE`. You either need to confirm your match or report it.")
+            # await dm(ctx.author, f"❌ You are currently marked as `{status}`. You can only queue if you're `IDLE`. You either need to confirm your match or report it.")
             # if not isinstance(ctx.channel, discord.DMChannel):
-            #     await ctx.message.delete()
+            #     await delete_command(ctx)
             # return
 
         region_str = ",".join(region_roles)
+        region_mask = regions_to_mask(region_roles)
 
-        now = datetime.datetime.now(datetime.UTC)
-        logging.info(f"Setting {user_id} to IN_QUEUE at {now.isoformat()} for regions: {region_str}")
-        cursor.execute(
-            "UPDATE players SET queue_status = 'IN_QUEUE', queue_time = ?, regions = ? WHERE discord_id = ?",
-            (now, region_str, user_id)
-        )
-        conn.commit()
-
-
-        embed = create_queue_embed("A new player has joined the queue.")
+        now = now_ts()
+        logging.info(f"Setting {user_id} to IN_QUEUE at {to_datetime(now).isoformat()} for regions: {region_str}")
+        if not await db.join_queue(user_id, now, region_mask):
+            logging.warning(f"{user_id} is in a match; not queueing")
+            await dm(ctx.author, "❌ You're currently in a match. Report or cancel it before queueing again.")
+            if not isinstance(ctx.channel, discord.DMChannel):
+                await delete_command(ctx)
+            return
+        queue_index.add(user_id, mmr, now, region_mask)
+        queue_status.request(f"{user_id} joined the queue")
 
         # NEW PING LOGIC
         # Define MMR range for initial matchmaking
         min_mmr = mmr - BASE_RANGE
         max_mmr = mmr + BASE_RANGE
 
-        region_set = set(region_roles)
-        one_hour_ago = now - datetime.timedelta(hours=1)
+        one_hour_ago = now - 60 * 60
 
-        # Find ping candidates
-        cursor.execute("""
-            SELECT discord_id, regions, ping FROM players
-            WHERE queue_status = 'IDLE'
-            AND ping IN (?, ?)
-            AND mmr BETWEEN ? AND ?
-            AND (ping_time IS NULL OR ping_time < ?)
-        """, (PING_PUBLIC, PING_DM, min_mmr, max_mmr, one_hour_ago))
+        # Find ping candidates sharing at least one region
+        candidates = await db.get_ping_candidates((PING_PUBLIC, PING_DM), min_mmr, max_mmr, one_hour_ago, region_mask)
 
         mention_members = []
         dm_members = []
+        pinged_ids = []
+
+        for discord_id, ping_setting in candidates:
+            member = guild.get_member(int(discord_id))
+            if member:
+                if ping_setting == PING_PUBLIC:
+                    mention_members.append(member)
+                elif ping_setting == PING_DM:
+                    dm_members.append(member)
+                pinged_ids.append(str(discord_id))
 
-        for discord_id, regions, ping_setting in cursor.fetchall():
-            other_regions = set(re.split(r"[,\s]+", regions.strip()))
-            if region_set & other_regions:
-                member = guild.get_member(int(discord_id))
-                if member:
-                    if ping_setting == PING_PUBLIC:
-                        mention_members.append(member)
-                    elif ping_setting == PING_DM:
-                        dm_members.append(member)
-                    cursor.execute("UPDATE players SET ping_time = ? WHERE discord_id = ?", (now, str(discord_id)))
-
-        # Commit ping_time updates
-        conn.commit()
-        conn.close()
+        # Record ping_time updates in one write
+        if pinged_ids:
+            await db.set_ping_times(pinged_ids, now)
 
         # Send public pings
         if mention_members:
             mention_text = "🔔 Potential match found! " + " ".join(m.mention for m in mention_members)
-            queue_channel = discord.utils.get(guild.text_channels, name="queue-here")
+            queue_channel = guilds.text_channel("queue-here")
             if queue_channel:
-                await queue_channel.send(mention_text)
+                outbound.post(PING, f"channel:{queue_channel.id}", queue_channel.send, mention_text,
+                              description="public ping", droppable=True, idempotent=False, max_age=PING_MAX_AGE)
 
-        # Send DMs
+        # Send DMs; they queue behind match traffic and go stale rather than arrive late
         for member in dm_members:
-            try:
-                await member.send("🔔 A potential match was found in your region and MMR range! Use `!q` to queue up if interested.")
-            except Exception as e:
-                logging.warning(f"Failed to DM {member}: {e}")
+            outbound.post(PING, f"dm:{member.id}", member.send,
+                          "🔔 A potential match was found in your region and MMR range! Use `!q` to queue up if interested.",
+                          description=f"ping DM to {member.id}", droppable=True, idempotent=False, max_age=PING_MAX_AGE)
 
 
         # END
 
         if not isinstance(ctx.channel, discord.DMChannel):
-            await ctx.message.delete()
-            await ctx.channel.send(embed=embed)
-        else:
-            # Try to send embed to queue channel
-            queue_channel = discord.utils.get(guild.text_channels, name="queue-here")
-            if queue_channel:
-                await queue_channel.send(embed=embed)
+            await delete_command(ctx)
 
-        await ctx.author.send(f"✅ You’ve been added to the queue. Looking for opponents...\n\n**Regions you are queueing for**: {region_str}")
+        await dm(ctx.author, f"✅ You’ve been added to the queue. Looking for opponents...\n\n**Regions you are queueing for**: {region_str}")
 
-        logging.info(f"Running matchmaking for {user_id}...")
-        await run_matchmaking(bot)
+        request_matchmaking(f"{user_id} joined the queue")
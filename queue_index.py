@@ -0,0 +1,122 @@
+import bisect
+import itertools
+import logging
+from collections import defaultdict
+
+from deadlines import DeadlineHeap
+from regions import mask_to_regions
+
+
+class QueueEntry:
+    __slots__ = ("discord_id", "mmr", "queued_at", "region_mask", "regions", "order")
+
+    def __init__(self, discord_id, mmr, queued_at, region_mask, order):
+        self.discord_id = discord_id
+        self.mmr = mmr
+        self.queued_at = queued_at  # epoch seconds
+        self.region_mask = region_mask
+        self.regions = mask_to_regions(region_mask)  # bucket keys
+        self.order = order
+
+    def __repr__(self):
+        return f"QueueEntry({self.discord_id}, mmr={self.mmr}, regions={self.regions})"
+
+
+class QueueIndex:
+    # Per-region buckets of (mmr, seq, discord_id) kept sorted by MMR.
+    # Entries carry a (queued_at, seq) order key so "oldest first" matches
+    # a sort on queue_time. `version` changes whenever the queue does.
+
+    def __init__(self):
+        self.entries = {}
+        self.buckets = defaultdict(list)
+        self.by_age = DeadlineHeap()
+        self.loaded = False
+        self.version = 0
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, discord_id):
+        return str(discord_id) in self.entries
+
+    def load(self, rows):
+        self.entries.clear()
+        self.buckets.clear()
+        self.by_age.clear()
+        for discord_id, mmr, queued_at, region_mask in rows:
+            self.add(discord_id, mmr, queued_at, region_mask)
+        self.loaded = True
+        self.version += 1
+        logging.info(f"📚 Queue index loaded with {len(self.entries)} players")
+
+    def add(self, discord_id, mmr, queued_at, region_mask):
+        discord_id = str(discord_id)
+        self.remove(discord_id)
+
+        seq = next(self._seq)
+        entry = QueueEntry(discord_id, mmr, queued_at, region_mask, (queued_at, seq))
+        self.entries[discord_id] = entry
+        self.version += 1
+        self.by_age.schedule(discord_id, entry.queued_at)
+        for region in entry.regions:
+            bisect.insort(self.buckets[region], (mmr, seq, discord_id))
+        return entry
+
+    def remove(self, discord_id):
+        entry = self.entries.pop(str(discord_id), None)
+        if entry is None:
+            return None
+        self.version += 1
+        self.by_age.cancel(entry.discord_id)
+
+        key = (entry.mmr, entry.order[1], entry.discord_id)
+        for region in entry.regions:
+            bucket = self.buckets[region]
+            i = bisect.bisect_left(bucket, key)
+            if i < len(bucket) and bucket[i] == key:
+                del bucket[i]
+            if not bucket:
+                del self.buckets[region]
+        return entry
+
+    def oldest_queued_at(self) -> float | None:
+        return self.by_age.next_deadline()
+
+    def pop_queued_before(self, cutoff: float):
+        return [self.remove(discord_id) for discord_id in self.by_age.pop_due(cutoff)]
+
+    def oldest_first(self):
+        return sorted(self.entries.values(), key=lambda e: e.order)
+
+    def in_range(self, region, low, high):
+        bucket = self.buckets.get(region)
+        if not bucket:
+            return
+        i = bisect.bisect_left(bucket, (low,))
+        while i < len(bucket) and bucket[i][0] <= high:
+            yield self.entries[bucket[i][2]]
+            i += 1
+
+    def nearest_later_diff(self, entry, beyond=0):
+        # Smallest MMR gap larger than `beyond` between `entry` and any
+        # later-queued player sharing a region. Only the first later player
+        # past `beyond` on each side of `entry` matters.
+        best = None
+        for region in entry.regions:
+            bucket = self.buckets[region]
+            right = bisect.bisect_right(bucket, (entry.mmr + beyond, float("inf")))
+            left = bisect.bisect_left(bucket, (entry.mmr - beyond,)) - 1
+            for j, step in ((left, -1), (right, 1)):
+                while 0 <= j < len(bucket):
+                    mmr, _, other_id = bucket[j]
+                    if self.entries[other_id].order > entry.order:
+                        diff = abs(mmr - entry.mmr)
+                        if best is None or diff < best:
+                            best = diff
+                        break
+                    j += step
+        return best
+
+queue_index = QueueIndex()
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+
+import discord
+
+from db import db
+from guilds import guilds
+from outbound import outbound, REPLY
+from queue_index import queue_index
+from timestamps import discord_timestamp
+from utils import get_rank, REGION_EMOJIS
+
+QUEUE_CHANNEL = "queue-here"
+STATUS_TITLE = "📋 Queue Status"
+MAX_LINES = 60  # Keeps the embed under Discord's 4096 char description limit
+EDIT_INTERVAL_SECONDS = float(os.getenv("QUEUE_STATUS_EDIT_INTERVAL_SECONDS", "5"))  # At most one edit per window
+
+# One pinned message in #queue-here shows the queue and is edited in place.
+# The embed is rendered from the in-memory QueueIndex and cached against its
+# version, so it's only rebuilt when the queue changes. Requests made while
+# an edit is pending or inside the rate-limit window fold into the next edit;
+# requests that find the posted message already current cost nothing.
+
+
+class QueueStatusBoard:
+    def __init__(self, min_interval=EDIT_INTERVAL_SECONDS):
+        self.min_interval = min_interval
+        self.message_id = None
+        self.embed = None
+        self.rendered_version = None
+        self.posted_version = None
+        self.last_edit = float("-inf")
+        self.stats = {"requests": 0, "unchanged": 0, "coalesced": 0, "renders": 0, "edits": 0, "sends": 0, "failures": 0}
+        self._task = None
+
+    def request(self, reason=""):
+        self.stats["requests"] += 1
+        if queue_index.loaded and queue_index.version == self.posted_version:
+            self.stats["unchanged"] += 1
+            return
+        if self._task is not None and not self._task.done():
+            self.stats["coalesced"] += 1
+            return
+        logging.info(f"📋 Queue status update requested{f' ({reason})' if reason else ''}")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def render(self) -> discord.Embed:
+        if self.rendered_version == queue_index.version and self.embed is not None:
+            return self.embed
+
+        embed = discord.Embed(title=STATUS_TITLE, color=discord.Color.blurple())
+        entries = queue_index.oldest_first()
+        if not entries:
+            embed.description = "Queue is empty."
+        else:
+            lines = []
+            for entry in entries[:MAX_LINES]:
+                region_str = "".join(REGION_EMOJIS.get(r, r) for r in entry.regions) or "🌍"
+                lines.append(f"{region_str} - {get_rank(entry.mmr)} ({discord_timestamp(entry.queued_at)})")
+            if len(entries) > MAX_LINES:
+                lines.append(f"…and {len(entries) - MAX_LINES} more")
+            embed.description = f"**{len(entries)} in queue**\n\n" + "\n".join(lines)
+
+        self.embed = embed
+        self.rendered_version = queue_index.version
+        self.stats["renders"] += 1
+        return embed
+
+    async def _run(self):
+        if not queue_index.loaded:
+            queue_index.load(await db.get_queued_players())
+
+        while queue_index.version != self.posted_version:
+            wait = self.last_edit + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            channel = guilds.text_channel(QUEUE_CHANNEL)
+            if channel is None:
+                return
+
+            version = queue_index.version
+            self.last_edit = time.monotonic()
+            try:
+                await self._publish(channel, self.render())
+            except discord.NotFound:
+                # Our message was deleted; post a new one on the next pass
+                self.message_id = None
+                continue
+            except discord.HTTPException as e:
+                self.stats["failures"] += 1
+                logging.warning(f"⚠️ Could not update queue status: {e}")
+                return
+            self.posted_version = version
+
+    async def _publish(self, channel, embed):
+        if self.message_id is None:
+            self.message_id = await self._find_pinned(channel)
+
+        if self.message_id is not None:
+            await outbound.call(REPLY, f"channel:{channel.id}", channel.get_partial_message(self.message_id).edit,
+                                embed=embed, description="queue status edit")
+            self.stats["edits"] += 1
+            return
+
+        message = await outbound.call(REPLY, f"channel:{channel.id}", channel.send, embed=embed, idempotent=False,
+                                      description="queue status send")
+        self.message_id = message.id
+        self.stats["sends"] += 1
+        try:
+            await outbound.call(REPLY, f"channel:{channel.id}", message.pin, description="queue status pin")
+        except discord.HTTPException as e:
+            logging.warning(f"⚠️ Could not pin queue status message: {e}")
+
+    async def _find_pinned(self, channel):
+        # Pick up the message posted before a restart
+        for message in await channel.pins():
+            if message.author == channel.guild.me and message.embeds and message.embeds[0].title == STATUS_TITLE:
+                return message.id
+        return None
+
+
+queue_status = QueueStatusBoard()
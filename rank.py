@@ -0,0 +1,32 @@
+import discord
+from discord.ext import commands
+from db import db
+from members import members
+from outbound import reply
+from utils import get_rank
+
+NEIGHBOURS = 2  # Players shown above and below
+
+
+def register_rank_command(bot: commands.Bot):
+    @bot.command()
+    async def rank(ctx, *, target: discord.Member = None):
+        target = target or ctx.author
+        position, total, around = await db.get_standing(str(target.id), radius=NEIGHBOURS)
+
+        if position is None:
+            await reply(ctx, f"❌ {target.display_name} isn't on the leaderboard yet.")
+            return
+
+        lines = []
+        for pos, discord_id, mmr in around:
+            name = await members.display_name(ctx.guild, discord_id) or "Unknown"
+            line = f"#{pos} {name} - {mmr} ({get_rank(mmr)})"
+            lines.append(f"**{line}**" if pos == position else line)
+
+        embed = discord.Embed(
+            title=f"{target.display_name} is #{position} of {total}",
+            description="\n".join(lines),
+            color=discord.Color.blue()
+        )
+        await reply(ctx, embed=embed)
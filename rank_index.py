@@ -0,0 +1,170 @@
+import bisect
+
+# Standings for every ranked player (at least one reported match), highest
+# MMR first, ties broken by discord id. Kept as sorted (-mmr, discord_id)
+# keys, so a player's position and the players around them are a bisect
+# away. PlayerCache keeps it in sync with every write that changes mmr, wins
+# or losses.
+
+RUN_LENGTH = 256  # Keys per run in _SortedKeys; runs split at twice this
+
+
+class _SortedKeys:
+    # Sorted keys split into short runs, with a Fenwick tree over the run
+    # lengths. Inserting or removing a key only shifts one run, and a
+    # position is a bisect over the run maxima plus an O(log n) prefix sum,
+    # instead of the O(n) shift of one big sorted list.
+    __slots__ = ("runs", "maxes", "tree", "size")
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self.runs = [keys[i:i + RUN_LENGTH] for i in range(0, len(keys), RUN_LENGTH)]
+        self._reindex()
+
+    def _reindex(self):
+        # After runs are split or dropped
+        self.maxes = [run[-1] for run in self.runs]
+        self.tree = [0] * (len(self.runs) + 1)
+        for i, run in enumerate(self.runs, start=1):
+            self.tree[i] += len(run)
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+        self.size = sum(map(len, self.runs))
+
+    def _grow(self, run_index, delta):
+        i = run_index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _before(self, run_index):
+        # Number of keys in the runs before this one
+        total = 0
+        i = run_index
+        while i:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position):
+        # (run index, offset in run) of the key at a 0-based position
+        i = 0
+        step = 1 << (len(self.tree) - 1).bit_length() >> 1
+        while step:
+            if i + step < len(self.tree) and self.tree[i + step] <= position:
+                i += step
+                position -= self.tree[i]
+            step >>= 1
+        return i, position
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for run in self.runs:
+            yield from run
+
+    def add(self, key):
+        if not self.runs:
+            self.runs.append([key])
+            self._reindex()
+            return
+        i = min(bisect.bisect_left(self.maxes, key), len(self.runs) - 1)
+        run = self.runs[i]
+        bisect.insort(run, key)
+        self.maxes[i] = run[-1]
+        self.size += 1
+        if len(run) > 2 * RUN_LENGTH:
+            self.runs[i:i + 1] = [run[:RUN_LENGTH], run[RUN_LENGTH:]]
+            self._reindex()
+        else:
+            self._grow(i, 1)
+
+    def remove(self, key):
+        i = bisect.bisect_left(self.maxes, key)
+        run = self.runs[i]
+        del run[bisect.bisect_left(run, key)]
+        self.size -= 1
+        if run:
+            self.maxes[i] = run[-1]
+            self._grow(i, -1)
+        else:
+            del self.runs[i]
+            self._reindex()
+
+    def index(self, key) -> int:
+        i = bisect.bisect_left(self.maxes, key)
+        if i == len(self.runs):
+            return self.size
+        return self._before(i) + bisect.bisect_left(self.runs[i], key)
+
+    def slice(self, start, stop) -> list:
+        i, offset = self._locate(start)
+        keys = []
+        while i < len(self.runs) and len(keys) < stop - start:
+            keys.extend(self.runs[i][offset:offset + stop - start - len(keys)])
+            i += 1
+            offset = 0
+        return keys
+
+
+class RankIndex:
+    def __init__(self):
+        self.keys = _SortedKeys()
+        self.entries = {}  # discord id -> key in self.keys
+        self.version = 0  # bumped on every change, for caches built from it
+
+    def __len__(self):
+        return len(self.keys)
+
+    def load(self, records):
+        self.entries = {
+            record.discord_id: key
+            for record in records
+            if (key := self._key(record)) is not None
+        }
+        self.keys = _SortedKeys(self.entries.values())
+        self.version += 1
+
+    @staticmethod
+    def _key(record):
+        if record.mmr is None or not (record.wins or record.losses):
+            return None
+        return (-record.mmr, record.discord_id)
+
+    def update(self, record):
+        key = self._key(record)
+        old = self.entries.get(record.discord_id)
+        if key == old:
+            return
+        if old is not None:
+            self.keys.remove(old)
+            del self.entries[record.discord_id]
+        if key is not None:
+            self.keys.add(key)
+            self.entries[record.discord_id] = key
+        self.version += 1
+
+    def position(self, discord_id) -> int | None:
+        # 1-based
+        key = self.entries.get(str(discord_id))
+        if key is None:
+            return None
+        return self.keys.index(key) + 1
+
+    def around(self, discord_id, radius=2) -> list[tuple[int, str, int]]:
+        # (position, discord id, mmr) for the player and up to `radius`
+        # players on either side
+        position = self.position(discord_id)
+        if position is None:
+            return []
+        start = max(position - 1 - radius, 0)
+        return [
+            (start + i + 1, other_id, -neg_mmr)
+            for i, (neg_mmr, other_id) in enumerate(self.keys.slice(start, position + radius))
+        ]
+
+    def ordered(self):
+        for neg_mmr, discord_id in self.keys:
+            yield discord_id, -neg_mmr
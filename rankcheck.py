@@ -1,14 +1,13 @@
-import sqlite3
 import discord
 from discord.ext import commands
-import aiohttp
-import os
-import datetime
 import logging
 
 from utils import get_rank
-
-RLSTATS_API_KEY = os.getenv("RLSTATS_API_KEY")
+from db import db
+from guilds import guilds
+from timestamps import now_ts
+from rlstats import rlstats
+from outbound import outbound, REPLY, react, reply
 
 # Maps for platform and playlist names to their IDs
 PLATFORM_MAP = {
@@ -38,92 +37,78 @@ def register_rankcheck_command(bot: commands.Bot):
         if ctx.channel.name != "rank-check":
             return
 
-        await ctx.message.add_reaction("⏳")
+        await react(ctx, "⏳")
 
         if get_platform_id(platform) is None:
-            await ctx.send(f"⚠️ Invalid rankcheck format. Ex: !rankcheck <platform> <id>")
+            await reply(ctx, f"⚠️ Invalid rankcheck format. Ex: !rankcheck <platform> <id>")
             logging.warning(f"Invalid platform `{platform}` on rankcheck triggered by {ctx.author.name} ({ctx.author.id})")
             return
 
         user_id = str(ctx.author.id)
-        now = datetime.datetime.now(datetime.UTC)
+        now = now_ts()
         logging.info(f"Rankcheck command triggered by {ctx.author.name} ({ctx.author.id})")
 
-        conn = sqlite3.connect('mmr.db')
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT ign, platform, mmr, rankcheck_date FROM players WHERE discord_id = ?', (user_id,))
-        existing = cursor.fetchone()
+        existing = await db.get_registration(user_id)
 
         if existing:
-            last_check_str = existing[3]
-            if last_check_str:
-                last_check = datetime.datetime.fromisoformat(last_check_str)
-                if (now - last_check).days < 14:
-                    days_remaining = 14 - (now - last_check).days
-                    await ctx.send(f"⏳ {ctx.author.mention}, you can check your rank again in {days_remaining} day(s).")
+            last_check = existing[3]
+            if last_check:
+                days_since = (now - last_check) // (24 * 60 * 60)
+                if days_since < 14:
+                    days_remaining = 14 - days_since
+                    await reply(ctx, f"⏳ {ctx.author.mention}, you can check your rank again in {days_remaining} day(s).")
                     logging.info(f"User {ctx.author.name} has recently checked their rank. Days remaining: {days_remaining}")
-                    conn.close()
                     return
 
         logging.info(f"Fetching rank for {ign} on {platform}")
         # Fetch MMR from RLStats API
         rank = await get_player_mmr(platform, ign)
         if not rank:
-            await ctx.send(f"⚠️ Couldn’t find stats for `{ign}` on `{platform}`.")
+            await reply(ctx, f"⚠️ Couldn’t find stats for `{ign}` on `{platform}`.")
             logging.error(f"Failed to fetch stats for {ign} on {platform}.")
-            conn.close()
             return
 
-        rankcheck_date = now.isoformat()
+        rankcheck_date = now
         logging.info(f"Found MMR for {ign} on {platform}: {rank}")
 
+        await db.save_rankcheck(user_id, ign, platform, rank, rankcheck_date, existing is not None)
         if existing:
-            cursor.execute(
-                'UPDATE players SET ign = ?, platform = ?, mmr = ?, rankcheck_date = ? WHERE discord_id = ?',
-                (ign, platform, rank, rankcheck_date, user_id)
-            )
             action = "updated"
             logging.info(f"Updated rankcheck for {ign} in database.")
         else:
-            cursor.execute(
-                'INSERT INTO players (discord_id, ign, platform, mmr, rankcheck_date) VALUES (?, ?, ?, ?, ?)',
-                (user_id, ign, platform, rank, rankcheck_date)
-            )
             action = "registered"
             logging.info(f"Registered new player {ign} in database.")
 
-        conn.commit()
-        conn.close()
-
         # Role assignment
         role_name = get_rank(rank)
         guild = ctx.guild
-        role = discord.utils.get(guild.roles, name=role_name)
+        role = guilds.role(role_name)
 
         if role:
             # Remove existing "Rank " roles before adding the new one
             rank_roles = [r for r in ctx.author.roles if r.name.startswith("Rank ")]
             try:
-                await ctx.author.remove_roles(*rank_roles)
+                await outbound.call(REPLY, f"guild:{guild.id}", ctx.author.remove_roles, *rank_roles,
+                                    description=f"remove rank roles from {user_id}")
                 logging.info(f"Removed old rank roles from {ctx.author.name}.")
             except discord.Forbidden:
-                await ctx.message.add_reaction("⚠️")
-                await ctx.send("⚠️ I don’t have permission to remove some roles.")
+                await react(ctx, "⚠️")
+                await reply(ctx, "⚠️ I don’t have permission to remove some roles.")
                 logging.error(f"Permission error while removing rank roles from {ctx.author.name}.")
 
             try:
-                await ctx.author.add_roles(role)
-                await ctx.message.add_reaction("✅")
-                await ctx.send(f"✅ {ctx.author.mention} {action}: `{ign}` on `{platform}` — 1v1 MMR: **{rank}** → Assigned **{role_name}**")
+                await outbound.call(REPLY, f"guild:{guild.id}", ctx.author.add_roles, role,
+                                    description=f"give {role_name} to {user_id}")
+                await react(ctx, "✅")
+                await reply(ctx, f"✅ {ctx.author.mention} {action}: `{ign}` on `{platform}` — 1v1 MMR: **{rank}** → Assigned **{role_name}**")
                 logging.info(f"Assigned role {role_name} to {ctx.author.name}.")
             except discord.Forbidden:
-                await ctx.message.add_reaction("⚠️")
-                await ctx.send(f"⚠️ {ctx.author.mention} I don’t have permission to assign the role **{role_name}**.")
+                await react(ctx, "⚠️")
+                await reply(ctx, f"⚠️ {ctx.author.mention} I don’t have permission to assign the role **{role_name}**.")
                 logging.error(f"Permission error while assigning role {role_name} to {ctx.author.name}.")
         else:
-            await ctx.message.add_reaction("✅")
-            await ctx.send(f"✅ {ctx.author.mention} {action}: `{ign}` on `{platform}` — 1v1 MMR: **{rank}**\n⚠️ Role **{role_name}** not found on this server.")
+            await react(ctx, "✅")
+            await reply(ctx, f"✅ {ctx.author.mention} {action}: `{ign}` on `{platform}` — 1v1 MMR: **{rank}**\n⚠️ Role **{role_name}** not found on this server.")
             logging.warning(f"Role {role_name} not found for {ctx.author.name}.")
 
 
@@ -136,22 +121,8 @@ def get_playlist_id(playlist_name: str) -> int | None:
 
 
 async def get_player_stats(platform_id, player_id):
-    url = f"https://api.rlstats.net/v1/profile/stats"
-    params = {
-        "apikey": RLSTATS_API_KEY,
-        "platformid": get_platform_id(platform_id),
-        "playerid": player_id
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as response:
-            if response.status == 200:
-                logging.info(f"Successfully fetched stats for {player_id} on platform {platform_id}.")
-                return await response.json()
-            else:
-                logging.error(f"Failed: {response.status}")
-                logging.error(await response.text())
-                return None
+    # Pooled, cached and retried; see rlstats.py
+    return await rlstats.get_profile_stats(get_platform_id(platform_id), player_id)
 
 async def get_player_mmr(platform_id, player_id, playlist_id=PLAYLIST_MAP['duel']):
     data = await get_player_stats(platform_id, player_id)
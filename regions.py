@@ -0,0 +1,25 @@
+import re
+
+# Regions are stored as a bitmask, one bit per role in REGION_ROLE_NAMES.
+# Bit positions are persisted in the DB: only ever append to this list.
+REGION_ROLE_NAMES = ["NA", "EU", "SAM", "MENA", "APAC", "OCE"]
+REGION_BITS = {name: 1 << i for i, name in enumerate(REGION_ROLE_NAMES)}
+ALL_REGIONS = (1 << len(REGION_ROLE_NAMES)) - 1
+
+
+def regions_to_mask(names) -> int:
+    mask = 0
+    for name in names:
+        mask |= REGION_BITS.get(name, 0)
+    return mask
+
+
+def mask_to_regions(mask: int) -> list[str]:
+    return [name for name, bit in REGION_BITS.items() if mask & bit]
+
+
+def parse_region_string(regions_str) -> int:
+    # Legacy comma separated column, e.g. "NA,EU"
+    if not regions_str:
+        return 0
+    return regions_to_mask(r for r in re.split(r"[,\s]+", regions_str.strip()) if r)
@@ -0,0 +1,29 @@
+import asyncio
+import random
+
+import aiohttp
+import discord
+
+# Shared retry policy for everything that talks to Discord or RLStats.
+
+RETRY_BASE_SECONDS = 1.0
+
+# Retrying these can't help
+PERMANENT_ERRORS = (discord.Forbidden, discord.NotFound)
+# Network trouble worth another try
+TRANSIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)
+# The request may have gone through before these, so a send isn't repeated
+AMBIGUOUS_ERRORS = (asyncio.TimeoutError, aiohttp.ServerDisconnectedError)
+
+
+def backoff_delay(attempt: int) -> float:
+    # Exponential from RETRY_BASE_SECONDS with ±20% jitter; attempt is 1-based
+    return RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+
+
+def is_transient(error, idempotent=True) -> bool:
+    if not idempotent and isinstance(error, AMBIGUOUS_ERRORS):
+        return False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return isinstance(error, discord.HTTPException) and not isinstance(error, PERMANENT_ERRORS) and error.status >= 500
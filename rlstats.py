@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+
+import aiohttp
+
+from retry import TRANSIENT_ERRORS, backoff_delay
+from ttl_cache import TTLCache
+
+# Long-lived client for the RLStats API. One pooled session (keep-alive, so
+# no new TCP/TLS handshake per !rankcheck) with bounded timeouts, a TTL cache
+# of profiles keyed by (platform id, ign), one in-flight request per key,
+# and retries with backoff on 429, 5xx and connection errors.
+#
+# RLSTATS_BASE_URL points it somewhere else, e.g. rlstats_stub.py.
+
+BASE_URL = os.getenv("RLSTATS_BASE_URL", "https://api.rlstats.net")
+CACHE_TTL_SECONDS = float(os.getenv("RLSTATS_CACHE_TTL_SECONDS", "300"))
+MISS_TTL_SECONDS = 60  # Unknown players are cached for less time
+CACHE_SIZE = 1000
+MAX_ATTEMPTS = 3
+MAX_RETRY_AFTER_SECONDS = 30
+CONNECTIONS = 10
+TIMEOUT = aiohttp.ClientTimeout(total=10, connect=3)
+
+
+class RLStatsClient:
+    def __init__(self, api_key=None, base_url=BASE_URL, ttl=CACHE_TTL_SECONDS):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.session = None
+        self.cache = TTLCache(CACHE_SIZE, ttl)  # (platform id, ign) -> payload or None
+        self.counters = {"requests": 0, "retried": 0, "not_found": 0, "errors": 0}
+
+    @property
+    def stats(self):
+        return {"cached": self.cache.hits, "coalesced": self.cache.coalesced, **self.counters}
+
+    def _session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=CONNECTIONS, ttl_dns_cache=300, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=TIMEOUT)
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def get_profile_stats(self, platform_id: int, ign: str) -> dict | None:
+        key = (platform_id, ign.strip().lower())
+        return await self.cache.get_or_fetch(key, lambda: self._fetch(key, platform_id, ign))
+
+    async def _fetch(self, key, platform_id, ign):
+        params = {"apikey": self.api_key or "", "platformid": platform_id, "playerid": ign}
+        url = f"{self.base_url}/v1/profile/stats"
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.counters["requests"] += 1
+            delay = backoff_delay(attempt)
+            try:
+                async with self._session().get(url, params=params) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        logging.info(f"Successfully fetched stats for {ign} on platform {platform_id}.")
+                        self.cache.put(key, data)
+                        return data
+                    if response.status == 404:
+                        self.counters["not_found"] += 1
+                        self.cache.put(key, None, MISS_TTL_SECONDS)
+                        return None
+                    body = await response.text()
+                    if response.status != 429 and response.status < 500:
+                        self.counters["errors"] += 1
+                        logging.error(f"RLStats request for {ign} failed: {response.status} {body[:200]}")
+                        return None
+                    retry_after = response.headers.get("Retry-After")
+                    if retry_after is not None:
+                        try:
+                            delay = min(float(retry_after), MAX_RETRY_AFTER_SECONDS)
+                        except ValueError:
+                            pass
+                    error = f"{response.status} {body[:200]}"
+            except TRANSIENT_ERRORS as e:
+                error = repr(e)
+
+            if attempt == MAX_ATTEMPTS:
+                break
+            self.counters["retried"] += 1
+            logging.warning(f"🔁 RLStats request for {ign} failed ({error}); retry {attempt}/{MAX_ATTEMPTS - 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        self.counters["errors"] += 1
+        logging.error(f"RLStats request for {ign} failed after {MAX_ATTEMPTS} attempts: {error}")
+        return None
+
+
+rlstats = RLStatsClient(os.getenv("RLSTATS_API_KEY"))
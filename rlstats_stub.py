@@ -0,0 +1,112 @@
+# Local stand-in for the RLStats API.
+#
+# Serves /v1/profile/stats with the fields rankcheck reads (SeasonInfo and
+# RankedSeasons -> playlist -> SkillRating). Duel MMR is derived from the
+# player id so repeated lookups agree. Players whose id starts with
+# "missing" get a 404. --fail-every and --rate-limit-every inject 503s and
+# 429s to exercise the client's retries:
+#
+#   python rlstats_stub.py --port 8089 --rate-limit-every 3
+#   RLSTATS_BASE_URL=http://127.0.0.1:8089 python start.py
+#
+# --check starts the stub, runs the bot's RLStatsClient against it and
+# prints the client's counters as JSON.
+
+import argparse
+import asyncio
+import json
+import zlib
+
+from aiohttp import web
+
+SEASON_ID = 14
+DUEL_PLAYLIST = "10"
+
+
+def profile(platform_id, player_id):
+    mmr = 600 + zlib.crc32(f"{platform_id}:{player_id}".encode()) % 1200
+    return {
+        "ProfileInfo": {"PlayerID": player_id, "PlatformID": platform_id},
+        "SeasonInfo": {"SeasonID": SEASON_ID},
+        "RankedSeasons": {
+            str(SEASON_ID): {
+                DUEL_PLAYLIST: {"SkillRating": mmr, "Tier": 0, "Division": 0, "MatchesPlayed": 10},
+            }
+        },
+    }
+
+
+def make_app(fail_every=0, rate_limit_every=0, delay=0.0):
+    counters = {"requests": 0}
+
+    async def stats(request):
+        counters["requests"] += 1
+        n = counters["requests"]
+        if delay:
+            await asyncio.sleep(delay)
+        if rate_limit_every and n % rate_limit_every == 0:
+            return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "0.05"})
+        if fail_every and n % fail_every == 0:
+            return web.json_response({"error": "unavailable"}, status=503)
+
+        platform_id = request.query.get("platformid")
+        player_id = request.query.get("playerid")
+        if not platform_id or not player_id:
+            return web.json_response({"error": "platformid and playerid are required"}, status=400)
+        if player_id.startswith("missing"):
+            return web.json_response({"error": "player not found"}, status=404)
+        return web.json_response(profile(int(platform_id), player_id))
+
+    app = web.Application()
+    app["counters"] = counters
+    app.router.add_get("/v1/profile/stats", stats)
+    return app
+
+
+async def check(app, port):
+    import retry
+    import rlstats
+    from rankcheck import get_player_mmr
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    retry.RETRY_BASE_SECONDS = 0.05
+    client = rlstats.rlstats
+    client.base_url = f"http://127.0.0.1:{port}"
+    try:
+        # Ten concurrent lookups of one player share a request, repeats hit the cache
+        mmrs = await asyncio.gather(*(get_player_mmr("steam", "player1") for _ in range(10)))
+        mmrs += [await get_player_mmr("epic", f"player{i}") for i in range(5)]
+        mmrs += [await get_player_mmr("epic", f"player{i}") for i in range(5)]
+        missing = await get_player_mmr("epic", "missing1")
+        print(json.dumps({
+            "mmrs": sorted(set(mmrs)),
+            "missing": missing,
+            "server_requests": app["counters"]["requests"],
+            "client": client.stats,
+        }))
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake RLStats /v1/profile/stats endpoint.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with a 503")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with a 429")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--check", action="store_true", help="run the bot's client against the stub and exit")
+    args = parser.parse_args(argv)
+
+    app = make_app(args.fail_every, args.rate_limit_every, args.delay)
+    if args.check:
+        asyncio.run(check(app, args.port))
+    else:
+        web.run_app(app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
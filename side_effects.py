@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+
+
+# Background worker for Discord side effects that don't need to hold up a
+# command's reply (channel cleanup, role updates).
+#
+# Jobs go into lanes: a lane runs its jobs one at a time in submission order,
+# different lanes run concurrently up to CONCURRENCY. Each job carries an
+# idempotency key; submitting a key that is queued, running or recently
+# completed is a no-op, so a repeated command can't double-apply anything.
+# Jobs run once: the Discord calls inside them go through outbound, which
+# already retries what is worth retrying. Failed jobs are forgotten so they
+# can be submitted again.
+
+CONCURRENCY = 4
+REMEMBERED_KEYS = 10_000
+
+
+class SideEffects:
+    def __init__(self, concurrency=CONCURRENCY):
+        self.lanes = {}
+        self.keys = set()  # queued or running
+        self.done = OrderedDict()
+        self.stats = {"submitted": 0, "skipped": 0, "succeeded": 0, "failed": 0}
+        self._slots = asyncio.Semaphore(concurrency)
+
+    def submit(self, lane, key, job, *args, description=None) -> bool:
+        # job(*args) must return a fresh coroutine on every call
+        if key in self.keys or key in self.done:
+            self.stats["skipped"] += 1
+            logging.info(f"🧾 Skipping duplicate side effect {key}")
+            return False
+
+        self.keys.add(key)
+        self.stats["submitted"] += 1
+        queue = self.lanes.get(lane)
+        if queue is None:
+            queue = self.lanes[lane] = deque()
+            asyncio.get_running_loop().create_task(self._run_lane(lane, queue))
+        queue.append((key, job, args, description or key))
+        return True
+
+    async def _run_lane(self, lane, queue):
+        try:
+            while queue:
+                key, job, args, description = queue[0]
+                succeeded = await self._run_job(job, args, description)
+                queue.popleft()
+                self.keys.discard(key)
+                if succeeded:
+                    self._remember(key)
+        finally:
+            del self.lanes[lane]
+
+    async def _run_job(self, job, args, description) -> bool:
+        try:
+            async with self._slots:
+                await job(*args)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logging.error(f"⚠️ Side effect '{description}' failed: {e}")
+            return False
+        self.stats["succeeded"] += 1
+        return True
+
+    def _remember(self, key):
+        self.done[key] = None
+        while len(self.done) > REMEMBERED_KEYS:
+            self.done.popitem(last=False)
+
+
+side_effects = SideEffects()
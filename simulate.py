@@ -0,0 +1,269 @@
+# Offline matchmaking simulator.
+#
+# Feeds synthetic arrivals into the real matchmaker.run_matchmaking against a
+# throwaway SQLite DB and a stub bot, on a virtual clock, and prints one JSON
+# object per scenario:
+#
+#   python simulate.py --sizes 10,100,1000,10000,50000 --output bench_output.txt
+#   python simulate.py --engine batch --arrivals-per-minute 30 --base-range 100
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from regions import REGION_BITS, regions_to_mask
+
+DEFAULT_REGION_MIX = "NA:40,EU:35,SAM:10,OCE:5,APAC:5,MENA:5"
+
+
+class StubLoop:
+    # Coroutines the matchmaker would fire off (confirmation DMs, timeout DMs)
+    # are dropped; the simulator reads outcomes from the DB instead.
+    def create_task(self, coro):
+        coro.close()
+
+
+class StubBot:
+    def __init__(self):
+        self.loop = StubLoop()
+
+
+class VirtualClock:
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+def parse_region_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        region, weight = part.split(":")
+        if region.strip() not in REGION_BITS:
+            raise ValueError(f"unknown region {region.strip()!r}")
+        mix[region.strip()] = float(weight)
+    return mix
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(values, digits=2):
+    return {
+        "p50": round(percentile(values, 50), digits) if values else None,
+        "p90": round(percentile(values, 90), digits) if values else None,
+        "p99": round(percentile(values, 99), digits) if values else None,
+        "max": round(max(values), digits) if values else None,
+        "mean": round(statistics.fmean(values), digits) if values else None,
+    }
+
+
+class Scenario:
+    def __init__(self, args, initial_queue, seed):
+        self.args = args
+        self.initial_queue = initial_queue
+        self.rng = random.Random(seed)
+        self.regions = parse_region_mix(args.region_mix)
+        self.next_id = 1
+        self.arrived_at = {}
+        self.player_mmr = {}
+
+    def new_player(self, now):
+        discord_id = str(self.next_id)
+        self.next_id += 1
+        mmr = max(0, int(self.rng.gauss(self.args.mmr_mean, self.args.mmr_sd)))
+        names, weights = zip(*self.regions.items())
+        regions = {self.rng.choices(names, weights)[0]}
+        if self.rng.random() < self.args.second_region_chance:
+            regions.add(self.rng.choices(names, weights)[0])
+        return discord_id, mmr, now, regions_to_mask(regions)
+
+    def enqueue(self, conn, players, queue_index):
+        conn.executemany(
+            "INSERT INTO players (discord_id, mmr, queue_status, queue_time, region_mask) VALUES (?, ?, 'IN_QUEUE', ?, ?)",
+            [(pid, mmr, int(ts), region_mask) for pid, mmr, ts, region_mask in players]
+        )
+        conn.commit()
+        for pid, mmr, ts, region_mask in players:
+            queue_index.add(pid, mmr, int(ts), region_mask)
+            self.arrived_at[pid] = ts
+            self.player_mmr[pid] = mmr
+
+
+async def run_scenario(args, initial_queue, seed):
+    fd, db_path = tempfile.mkstemp(prefix="duelsbot-sim-", suffix=".db")
+    os.close(fd)
+
+    import matchmaker
+    from db import db
+    from migrations import migrate
+    from pairing import get_pairing_engine
+    from queue_index import queue_index
+
+    if args.engine:
+        matchmaker.pairing_engine = get_pairing_engine(args.engine)
+    if args.base_range is not None:
+        matchmaker.BASE_RANGE = args.base_range
+    if args.range_expand_per_minute is not None:
+        matchmaker.RANGE_EXPAND_PER_MINUTE = args.range_expand_per_minute
+    if args.timeout_minutes is not None:
+        matchmaker.TIMEOUT_MINUTES = args.timeout_minutes
+    clock = VirtualClock(time.time())
+    matchmaker.clock = clock
+
+    migrate(db_path)
+    conn = sqlite3.connect(db_path)
+    db.open(db_path)
+    queue_index.load([])
+
+    scenario = Scenario(args, initial_queue, seed)
+    bot = StubBot()
+
+    # Spread the preloaded queue over the first half of the timeout window
+    timeout_seconds = matchmaker.TIMEOUT_MINUTES * 60
+    preload = []
+    for _ in range(initial_queue):
+        pid, mmr, _, regions = scenario.new_player(clock.now)
+        preload.append((pid, mmr, clock.now - scenario.rng.uniform(0, timeout_seconds / 2), regions))
+    scenario.enqueue(conn, preload, queue_index)
+
+    tick_latencies_ms = []
+    queue_sizes = []
+    waits_minutes = []
+    mmr_gaps = []
+    last_match_id = 0
+    arrivals = len(preload)
+    ticks = int(args.duration_minutes * 60 / args.tick_seconds)
+    per_tick_rate = args.arrivals_per_minute * args.tick_seconds / 60
+
+    for _ in range(ticks):
+        clock.now += args.tick_seconds
+        incoming = []
+        for _ in range(poisson(scenario.rng, per_tick_rate)):
+            pid, mmr, _, regions = scenario.new_player(clock.now)
+            incoming.append((pid, mmr, clock.now - scenario.rng.uniform(0, args.tick_seconds), regions))
+        if incoming:
+            scenario.enqueue(conn, incoming, queue_index)
+            arrivals += len(incoming)
+
+        queue_sizes.append(len(queue_index))
+        started = time.perf_counter()
+        await matchmaker.run_matchmaking(bot)
+        tick_latencies_ms.append((time.perf_counter() - started) * 1000)
+
+        rows = conn.execute(
+            "SELECT match_id, player1_id, player2_id FROM matches WHERE match_id > ? ORDER BY match_id",
+            (last_match_id,)
+        ).fetchall()
+        for match_id, p1, p2 in rows:
+            last_match_id = match_id
+            mmr_gaps.append(abs(scenario.player_mmr[p1] - scenario.player_mmr[p2]))
+            for pid in (p1, p2):
+                waits_minutes.append((clock.now - scenario.arrived_at[pid]) / 60)
+
+    timeouts = conn.execute("SELECT COUNT(*) FROM players WHERE queue_status = 'IDLE'").fetchone()[0]
+    matched_players = conn.execute("SELECT COUNT(*) FROM players WHERE queue_status = 'IN_MATCH'").fetchone()[0]
+    conn.close()
+    db.close()
+    os.remove(db_path)
+
+    return {
+        "engine": matchmaker.pairing_engine.name,
+        "initial_queue": initial_queue,
+        "arrivals": arrivals,
+        "seed": seed,
+        "config": {
+            "base_range": matchmaker.BASE_RANGE,
+            "range_expand_per_minute": matchmaker.RANGE_EXPAND_PER_MINUTE,
+            "timeout_minutes": matchmaker.TIMEOUT_MINUTES,
+            "tick_seconds": args.tick_seconds,
+            "duration_minutes": args.duration_minutes,
+            "arrivals_per_minute": args.arrivals_per_minute,
+            "mmr_mean": args.mmr_mean,
+            "mmr_sd": args.mmr_sd,
+            "region_mix": args.region_mix,
+        },
+        "ticks": ticks,
+        "tick_latency_ms": summarize(tick_latencies_ms),
+        "queue_size": summarize(queue_sizes, 0),
+        "wait_minutes": summarize(waits_minutes),
+        "mmr_gap": summarize(mmr_gaps, 0),
+        "mmr_gap_histogram": histogram(mmr_gaps, args.gap_bucket),
+        "matches": len(mmr_gaps),
+        "match_rate": round(matched_players / arrivals, 4) if arrivals else None,
+        "timeout_rate": round(timeouts / arrivals, 4) if arrivals else None,
+        "still_queued": arrivals - matched_players - timeouts,
+    }
+
+
+def poisson(rng, lam):
+    # Knuth's method is fine for the per-tick rates used here; fall back to a
+    # normal approximation for large rates.
+    if lam > 50:
+        return max(0, int(round(rng.gauss(lam, lam ** 0.5))))
+    threshold = pow(2.718281828459045, -lam)
+    k, p = 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= threshold:
+            return k
+        k += 1
+
+
+def histogram(values, width):
+    buckets = {}
+    for v in values:
+        start = int(v // width * width)
+        buckets[start] = buckets.get(start, 0) + 1
+    return {f"{start}-{start + width - 1}": buckets[start] for start in sorted(buckets)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate matchmaking load against the real matchmaker code.")
+    parser.add_argument("--sizes", default="10,100,1000,10000,50000", help="comma separated initial queue sizes")
+    parser.add_argument("--engine", help="pairing engine to use (defaults to MATCHMAKING_ENGINE)")
+    parser.add_argument("--base-range", type=float, help="override matchmaker.BASE_RANGE")
+    parser.add_argument("--range-expand-per-minute", type=float, help="override matchmaker.RANGE_EXPAND_PER_MINUTE")
+    parser.add_argument("--timeout-minutes", type=float, help="override matchmaker.TIMEOUT_MINUTES")
+    parser.add_argument("--arrivals-per-minute", type=float, default=5.0)
+    parser.add_argument("--duration-minutes", type=float, default=120.0)
+    parser.add_argument("--tick-seconds", type=float, default=60.0)
+    parser.add_argument("--mmr-mean", type=float, default=1000.0)
+    parser.add_argument("--mmr-sd", type=float, default=200.0)
+    parser.add_argument("--region-mix", default=DEFAULT_REGION_MIX, help="REGION:weight pairs, e.g. NA:40,EU:35")
+    parser.add_argument("--second-region-chance", type=float, default=0.3)
+    parser.add_argument("--gap-bucket", type=int, default=50, help="MMR gap histogram bucket width")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="append JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+            result = asyncio.run(run_scenario(args, size, args.seed))
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,13 +17,19 @@ logging.basicConfig(
 from q import register_queue_command
 from leave import register_leave_command
 from report import register_report_command
-from report import register_leaderboard_command
+from leaderboard import register_leaderboard_command
 from rankcheck import register_rankcheck_command
 from status import register_status_command
-from matchmaker import matchmaking_loop
+from matchmaker import start_matchmaking_scheduler, register_confirmation_buttons
 from stats import register_stats_command
+from rank import register_rank_command
 from ping import register_ping_command
 from mute import register_mute_command
+from channel_pool import warm_channel_pool
+from guilds import register_guild_registry
+from db import db, DB_PATH
+from migrations import migrate
+from rlstats import rlstats
 
 DISCORD_BOT_TOKEN = os.getenv("FEER_DUELS_TOKEN")
 RLSTATS_API_KEY = os.getenv("RLSTATS_API_KEY")
@@ -36,7 +42,19 @@ intents.dm_messages = True
 intents.guilds = True
 intents.members = True  # if you use fetch_user or access member info
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+migrate(DB_PATH)
+
+class DuelsBot(commands.Bot):
+    async def close(self):
+        try:
+            await super().close()
+        finally:
+            # Release the pooled RLStats connections on shutdown
+            await rlstats.close()
+
+
+bot = DuelsBot(command_prefix="!", intents=intents)
+register_guild_registry(bot)
 register_queue_command(bot)
 register_report_command(bot)
 register_rankcheck_command(bot)
@@ -44,13 +62,17 @@ register_leave_command(bot)
 register_status_command(bot)
 register_leaderboard_command(bot)
 register_stats_command(bot)
+register_rank_command(bot)
 register_ping_command(bot)
 register_mute_command(bot)
+register_confirmation_buttons(bot)
 
 @bot.event
 async def on_ready():
     logging.info(f"✅ Logged in as {bot.user.name} (ID: {bot.user.id})")
-    bot.loop.create_task(matchmaking_loop(bot))
+    bot.loop.create_task(db.load_players())
+    start_matchmaking_scheduler(bot)
+    bot.loop.create_task(warm_channel_pool(bot))
 
 # @bot.command()
 # async def ping(ctx):
@@ -1,7 +1,8 @@
 import discord
 from discord.ext import commands
-import datetime
-import sqlite3
+from db import db
+from outbound import reply
+from timestamps import now_ts
 
 def register_stats_command(bot: commands.Bot):
     @bot.command()
@@ -9,25 +10,11 @@ def register_stats_command(bot: commands.Bot):
         target = target or ctx.author
         user_id = target.id
 
-        conn = sqlite3.connect("mmr.db")
-        cursor = conn.cursor()
-
         # Fetch the 5 most recent matches involving the user
-        cursor.execute("""
-            SELECT player1_id, player2_id, winner_id, created_at
-            FROM matches
-            WHERE player1_id = ? OR player2_id = ?
-                AND status == 'REPORTED'
-                AND winner_id IS NOT NULL
-            ORDER BY created_at DESC
-            LIMIT 5
-        """, (user_id, user_id))
-
-        matches = cursor.fetchall()
-        conn.close()
+        matches = await db.get_recent_matches(user_id, limit=5)
 
         if not matches:
-            await ctx.send(f"❌ {target.display_name} has no recent matches.")
+            await reply(ctx, f"❌ {target.display_name} has no recent matches.")
             return
 
         embed = discord.Embed(
@@ -41,7 +28,6 @@ def register_stats_command(bot: commands.Bot):
             opponent_id = p2 if p1 == user_id else p1
             result = "✅ Win" if winner == user_id else "❌ Loss"
 
-            timestamp = datetime.datetime.fromisoformat(timestamp)
             relative_time = get_relative_time(timestamp)
 
             display = "Unknown"
@@ -58,13 +44,10 @@ def register_stats_command(bot: commands.Bot):
             lines.append(f"{result} - {display} ({relative_time})")
 
         embed.description = "\n".join(lines)
-        await ctx.send(embed=embed)
-
-def get_relative_time(past: datetime.datetime) -> str:
-    now = datetime.datetime.now(datetime.UTC)
-    diff = now - past
+        await reply(ctx, embed=embed)
 
-    seconds = diff.total_seconds()
+def get_relative_time(past: int) -> str:
+    seconds = now_ts() - past
     minutes = seconds // 60
     hours = minutes // 60
     days = hours // 24
@@ -2,17 +2,15 @@
 
 from discord.ext import commands
 import discord
-import sqlite3
-from utils import create_queue_embed
+from queue_status import queue_status
+from outbound import delete_command
 
 def register_status_command(bot: commands.Bot):
     @bot.command(aliases=['s'])
     async def status(ctx):
         if ctx.channel.name != "queue-here":
             return
-            
-        # Create anonymous embed
-        embed = create_queue_embed("Updated Queue Status")
 
-        await ctx.message.delete()
-        await ctx.channel.send(embed=embed)
+        # The pinned status message is kept current; this only nudges it
+        queue_status.request(f"!status from {ctx.author}")
+        await delete_command(ctx)
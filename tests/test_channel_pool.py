@@ -0,0 +1,74 @@
+import asyncio
+import itertools
+import unittest
+from unittest import mock
+
+import channel_pool as pool_module
+from channel_pool import ChannelPool, POOL_PREFIX
+
+
+class FakeChannel:
+    def __init__(self, channel_id, name, guild):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+        self.delete = mock.AsyncMock(side_effect=lambda **kwargs: guild.channels.pop(self.id, None))
+        self.edit = mock.AsyncMock()
+        self.purge = mock.AsyncMock()
+
+
+class FakeGuild:
+    def __init__(self):
+        self.id = 1
+        self.channels = {}
+        self.default_role = object()
+        self._ids = itertools.count(100)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def create_text_channel(self, name, overwrites, category):
+        await asyncio.sleep(0.01)
+        channel = FakeChannel(next(self._ids), name, self)
+        self.channels[channel.id] = channel
+        return channel
+
+
+class ChannelPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.guild = FakeGuild()
+        # An existing pooled channel and an unrelated channel in the category
+        for channel in (FakeChannel(1, f"{POOL_PREFIX}2", self.guild), FakeChannel(2, "rules", self.guild)):
+            self.guild.channels[channel.id] = channel
+        category = mock.MagicMock()
+        category.text_channels = list(self.guild.channels.values())
+        mock.patch.object(pool_module.guilds, "category", return_value=category).start()
+        mock.patch.object(pool_module.db, "get_active_match_channels", mock.AsyncMock(return_value={})).start()
+        self.pool = ChannelPool()
+
+    async def asyncTearDown(self):
+        mock.patch.stopall()
+
+    def pooled_names(self):
+        return sorted(c.name for c in self.guild.channels.values() if c.name.startswith(POOL_PREFIX))
+
+    async def test_concurrent_creates_get_distinct_names(self):
+        channels = await asyncio.gather(*(self.pool.lease(self.guild, match_id, {}) for match_id in range(4)))
+        await asyncio.sleep(0.2)  # Let the top-up finish
+
+        names = self.pooled_names()
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual({c.name for c in channels[1:]}, {f"{POOL_PREFIX}{n}" for n in (1, 3, 4)})
+
+    async def test_deleted_channel_numbers_are_reused(self):
+        mock.patch.object(self.pool, "target_idle", return_value=0).start()
+        first = await self.pool.lease(self.guild, 1, {})
+        second = await self.pool.lease(self.guild, 2, {})
+        self.assertEqual((first.name, second.name), (f"{POOL_PREFIX}2", f"{POOL_PREFIX}1"))
+
+        await self.pool.release(first)
+        first.delete.assert_awaited_once()
+        self.assertEqual((await self.pool.lease(self.guild, 3, {})).name, f"{POOL_PREFIX}2")
+
+if __name__ == "__main__":
+    unittest.main()
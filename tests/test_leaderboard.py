@@ -0,0 +1,115 @@
+import unittest
+from unittest import mock
+
+import leaderboard
+from leaderboard import BOARD_MARKER, LeaderboardBoard
+
+
+class FakeMessage:
+    def __init__(self, message_id, author, content):
+        self.id = message_id
+        self.author = author
+        self.content = content
+
+
+class FakeChannel:
+    def __init__(self, history):
+        self.id = 10
+        self.name = "leaderboard"
+        self.guild = mock.MagicMock()
+        self.me = self.guild.me
+        self._history = history
+        self.partials = {}
+        self.send = mock.AsyncMock(return_value=FakeMessage(99, self.me, ""))
+
+    async def history(self, limit):
+        # Newest first, like discord.py's default
+        for message in reversed(self._history[-limit:]):
+            yield message
+
+    def get_partial_message(self, message_id):
+        return self.partials.setdefault(message_id, mock.MagicMock(edit=mock.AsyncMock(), delete=mock.AsyncMock()))
+
+
+async def direct_call(priority, bucket, fn, *args, description=None, idempotent=True, **kwargs):
+    return await fn(*args, **kwargs)
+
+
+class LeaderboardBoardTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        mock.patch.object(leaderboard.outbound, "call", direct_call).start()
+
+    async def asyncTearDown(self):
+        mock.patch.stopall()
+
+    async def test_adopts_only_board_messages(self):
+        channel = FakeChannel([])
+        channel._history = [
+            FakeMessage(1, channel.me, f"```\nold board\n```\n{BOARD_MARKER}"),
+            FakeMessage(2, channel.me, "```\nRank  MMR\n```\nPage 1/1"),
+            FakeMessage(3, mock.MagicMock(), f"```\nfake\n```\n{BOARD_MARKER}"),
+        ]
+        board = LeaderboardBoard()
+        await board.update(channel, ["```\nnew board\n```"])
+
+        channel.partials[1].edit.assert_awaited_once_with(content=f"```\nnew board\n```\n{BOARD_MARKER}")
+        self.assertNotIn(2, channel.partials)
+        self.assertNotIn(3, channel.partials)
+        channel.send.assert_not_awaited()
+        self.assertEqual(board.messages[channel.id], [(1, f"```\nnew board\n```\n{BOARD_MARKER}")])
+
+    async def test_adopts_newest_board_in_order(self):
+        channel = FakeChannel([])
+        channel._history = [FakeMessage(i, channel.me, f"```\n{i}\n```\n{BOARD_MARKER}") for i in range(1, 61)]
+        board = LeaderboardBoard()
+        await board._adopt(channel)
+
+        adopted = [message_id for message_id, _ in board.messages[channel.id]]
+        self.assertEqual(adopted, list(range(11, 61)))
+
+    async def test_deletes_unmarked_boards_once(self):
+        channel = FakeChannel([])
+        channel._history = [
+            FakeMessage(1, channel.me, "```\npre-marker board\n```"),
+            FakeMessage(2, channel.me, "✅ Refreshed"),
+            FakeMessage(3, mock.MagicMock(), "```\nsomeone else's code\n```"),
+            FakeMessage(4, channel.me, f"```\nboard\n```\n{BOARD_MARKER}"),
+        ]
+        board = LeaderboardBoard()
+        await board.update(channel, ["```\nboard\n```"])
+
+        channel.partials[1].delete.assert_awaited_once()
+        self.assertEqual(sorted(channel.partials), [1])
+        self.assertEqual(board.messages[channel.id], [(4, f"```\nboard\n```\n{BOARD_MARKER}")])
+
+        await board.update(channel, ["```\nboard\n```"])
+        channel.partials[1].delete.assert_awaited_once()
+
+
+class LeaderboardPageTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        mock.patch.object(leaderboard.outbound, "call", direct_call).start()
+        mock.patch.object(leaderboard.rendered, "get", mock.AsyncMock(return_value=["page one", "page two"])).start()
+        commands = {}
+        bot = mock.MagicMock()
+        bot.command.return_value = lambda fn: commands.setdefault(fn.__name__, fn)
+        leaderboard.register_leaderboard_command(bot)
+        self.leaderboard = commands["leaderboard"]
+
+    async def asyncTearDown(self):
+        mock.patch.stopall()
+
+    async def test_page_is_sent_by_dm(self):
+        ctx = mock.MagicMock()
+        ctx.channel.name = "leaderboard"
+        ctx.author.send = mock.AsyncMock()
+        ctx.reply = mock.AsyncMock()
+        await self.leaderboard(ctx, 2)
+
+        ctx.author.send.assert_awaited_once_with("page two\nPage 2/2")
+        ctx.reply.assert_not_awaited()
+        ctx.channel.send.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import discord
+
+import leave
+from db import db
+from migrations import migrate
+from queue_index import queue_index
+from timestamps import now_ts
+
+
+class CommandCollector:
+    # Stands in for commands.Bot: keeps the decorated callbacks
+    def __init__(self):
+        self.commands = {}
+
+    def command(self, **kwargs):
+        def decorator(fn):
+            self.commands[fn.__name__] = fn
+            return fn
+        return decorator
+
+
+def make_ctx(user_id, channel_name="queue-here"):
+    ctx = mock.MagicMock()
+    ctx.author.id = int(user_id)
+    ctx.author.send = mock.AsyncMock()
+    ctx.message.delete = mock.AsyncMock()
+    ctx.channel = mock.MagicMock(spec=discord.TextChannel)
+    ctx.channel.name = channel_name
+    ctx.guild = mock.MagicMock()
+    return ctx
+
+
+class LeaveCommandTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="duelsbot-test-")
+        self.path = os.path.join(self.tmp, "test.db")
+        migrate(self.path)
+        conn = sqlite3.connect(self.path)
+        conn.executemany(
+            "INSERT INTO players (discord_id, ign, platform, mmr, queue_status, queue_time, region_mask) VALUES (?, ?, 'epic', ?, ?, ?, 1)",
+            [
+                ("1", "queued", 1000, "IN_QUEUE", now_ts()),
+                ("2", "idle", 1000, "IDLE", None),
+                ("3", "opponent", 1000, "IN_QUEUE", now_ts()),
+            ]
+        )
+        conn.commit()
+        conn.close()
+
+        db.open(self.path)
+        queue_index.load(await db.get_queued_players())
+
+        bot = CommandCollector()
+        leave.register_leave_command(bot)
+        self.leave = bot.commands["leave"]
+
+        self.status_request = mock.patch.object(leave.queue_status, "request").start()
+        self.matchmaking = mock.patch.object(leave, "request_matchmaking").start()
+
+    async def asyncTearDown(self):
+        mock.patch.stopall()
+        db.close()
+        queue_index.load([])
+        for name in os.listdir(self.tmp):
+            os.remove(os.path.join(self.tmp, name))
+        os.rmdir(self.tmp)
+
+    def status_in_db(self, discord_id):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("SELECT queue_status FROM players WHERE discord_id = ?", (discord_id,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    async def test_leave_removes_queued_player(self):
+        ctx = make_ctx("1")
+        await self.leave(ctx)
+
+        self.assertEqual(self.status_in_db("1"), "IDLE")
+        self.assertEqual((await db.get_player("1")).status, "IDLE")
+        self.assertNotIn("1", queue_index)
+        self.status_request.assert_called_once()
+        self.matchmaking.assert_called_once()
+        ctx.message.delete.assert_awaited_once()
+        ctx.author.send.assert_awaited_once_with("✅ You have left the queue.")
+
+    async def test_leave_when_not_queued(self):
+        ctx = make_ctx("2")
+        await self.leave(ctx)
+
+        self.assertEqual(self.status_in_db("2"), "IDLE")
+        self.status_request.assert_not_called()
+        ctx.author.send.assert_awaited_once_with("ℹ️ You are not currently in the queue.")
+
+    async def test_leave_loses_race_with_pairing(self):
+        # The status check saw IN_QUEUE, then the matchmaker paired the player
+        await db.create_matches([("1", "3")], now_ts())
+        ctx = make_ctx("1")
+        with mock.patch.object(leave.db, "get_player_status", mock.AsyncMock(return_value=("IN_QUEUE", 1000))):
+            await self.leave(ctx)
+
+        self.assertEqual(self.status_in_db("1"), "IN_MATCH")
+        self.assertEqual((await db.get_player("1")).status, "IN_MATCH")
+        self.status_request.assert_not_called()
+        ctx.author.send.assert_awaited_once()
+        self.assertIn("already been matched", ctx.author.send.await_args.args[0])
+
+    async def test_join_queue_refuses_players_in_a_match(self):
+        await db.create_matches([("1", "3")], now_ts())
+        self.assertEqual(await db.join_queue("1", now_ts(), 1), 0)
+        self.assertEqual(self.status_in_db("1"), "IN_MATCH")
+        self.assertEqual(await db.join_queue("2", now_ts(), 1), 1)
+        self.assertEqual((await db.get_player("2")).status, "IN_QUEUE")
+
+
+if __name__ == "__main__":
+    unittest.main()
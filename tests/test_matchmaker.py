@@ -0,0 +1,165 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import matchmaker
+from db import db
+from migrations import migrate
+from queue_index import queue_index
+from timestamps import now_ts
+
+
+class MatchmakerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="duelsbot-test-")
+        self.path = os.path.join(self.tmp, "test.db")
+        migrate(self.path)
+        conn = sqlite3.connect(self.path)
+        conn.executemany(
+            "INSERT INTO players (discord_id, ign, platform, mmr, queue_status, queue_time, region_mask) VALUES (?, ?, 'epic', ?, 'IN_QUEUE', ?, 1)",
+            [("1", "first", 1000, now_ts() - 60), ("2", "second", 1020, now_ts())]
+        )
+        conn.commit()
+        conn.close()
+
+        db.open(self.path)
+        await db.load_players()
+        queue_index.load(await db.get_queued_players())
+
+        self.bot = mock.MagicMock()
+        mock.patch.object(matchmaker, "_confirmations_restored", asyncio.Event()).start()
+        mock.patch.object(matchmaker.queue_status, "request").start()
+        mock.patch.object(matchmaker.guilds, "text_channel", return_value=None).start()
+        self.confirmation = mock.patch.object(matchmaker, "send_match_confirmation", mock.MagicMock()).start()
+
+    async def asyncTearDown(self):
+        mock.patch.stopall()
+        matchmaker.pending_matches.clear()
+        matchmaker.confirmation_deadlines.clear()
+        db.close()
+        queue_index.load([])
+        for name in os.listdir(self.tmp):
+            os.remove(os.path.join(self.tmp, name))
+        os.rmdir(self.tmp)
+
+
+class RunMatchmakingTest(MatchmakerTestCase):
+    async def test_pairs_leave_the_index_once_the_match_is_written(self):
+        await matchmaker.run_matchmaking(self.bot)
+
+        self.assertEqual(len(queue_index), 0)
+        self.assertEqual((await db.get_player("1")).status, "IN_MATCH")
+        self.confirmation.assert_called_once()
+
+    async def test_failed_match_write_keeps_players_queued(self):
+        with mock.patch.object(matchmaker.db, "create_matches", mock.AsyncMock(side_effect=RuntimeError("disk I/O error"))):
+            with self.assertRaises(RuntimeError):
+                await matchmaker.run_matchmaking(self.bot)
+
+        self.assertIn("1", queue_index)
+        self.assertIn("2", queue_index)
+        self.assertEqual([e.discord_id for e in queue_index.oldest_first()], ["1", "2"])
+        self.confirmation.assert_not_called()
+
+    def leave_during_write(self, *steps):
+        # Runs steps (e.g. a !leave) after pairing but before the match write
+        create_matches = db.create_matches
+
+        async def racing(*args):
+            for step in steps:
+                await step()
+            return await create_matches(*args)
+        return mock.patch.object(matchmaker.db, "create_matches", racing)
+
+    async def test_player_leaving_during_write_is_not_matched(self):
+        with self.leave_during_write(lambda: db.leave_queue("1")):
+            await matchmaker.run_matchmaking(self.bot)
+
+        self.assertEqual((await db.get_player("1")).status, "IDLE")
+        self.assertEqual((await db.get_player("2")).status, "IN_QUEUE")
+        self.assertEqual([e.discord_id for e in queue_index.oldest_first()], ["2"])
+        self.assertIsNone(await db.get_match(1))
+        self.confirmation.assert_not_called()
+
+    async def test_player_requeueing_during_write_is_not_matched(self):
+        requeued_at = now_ts() + 5
+
+        async def requeue():
+            await db.join_queue("1", requeued_at, 1)
+            queue_index.add("1", 1000, requeued_at, 1)
+
+        with self.leave_during_write(lambda: db.leave_queue("1"), requeue):
+            await matchmaker.run_matchmaking(self.bot)
+
+        self.assertEqual((await db.get_player("1")).status, "IN_QUEUE")
+        self.assertEqual((await db.get_player("2")).status, "IN_QUEUE")
+        self.assertEqual(sorted(queue_index.entries), ["1", "2"])
+        self.assertEqual(queue_index.entries["1"].queued_at, requeued_at)
+        self.assertIsNone(await db.get_match(1))
+        self.confirmation.assert_not_called()
+
+
+def make_interaction():
+    interaction = mock.MagicMock()
+    interaction.response.edit_message = mock.AsyncMock()
+    interaction.response.send_message = mock.AsyncMock()
+    interaction.response.defer = mock.AsyncMock()
+    return interaction
+
+
+class ConfirmationClickTest(MatchmakerTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.match_id = (await db.create_matches([("1", "2")], now_ts()))[0]
+        for discord_id in ("1", "2"):
+            queue_index.remove(discord_id)
+        mock.patch.object(matchmaker, "RESTORE_WAIT_SECONDS", 0.05).start()
+        mock.patch.object(matchmaker, "send_dm", mock.AsyncMock()).start()
+
+    async def test_click_before_restore_keeps_buttons(self):
+        interaction = make_interaction()
+        await matchmaker.handle_confirmation_response(self.bot, interaction, self.match_id, "1", matchmaker.CONFIRM)
+
+        interaction.response.edit_message.assert_not_awaited()
+        interaction.response.send_message.assert_awaited_once()
+
+    async def test_click_after_restore_is_recorded(self):
+        await matchmaker.restore_pending_confirmations(self.bot)
+        interaction = make_interaction()
+        await matchmaker.handle_confirmation_response(self.bot, interaction, self.match_id, "1", matchmaker.CONFIRM)
+
+        self.assertEqual(matchmaker.pending_matches[self.match_id].responses["1"], matchmaker.CONFIRM)
+        self.assertNotIn("view", interaction.response.edit_message.await_args.kwargs)
+
+    async def test_click_on_closed_match_strips_buttons(self):
+        await matchmaker.abandon_match(self.match_id, ["1"], ["2"])
+        interaction = make_interaction()
+        await matchmaker.handle_confirmation_response(self.bot, interaction, self.match_id, "1", matchmaker.CONFIRM)
+
+        self.assertIsNone(interaction.response.edit_message.await_args.kwargs["view"])
+
+    async def test_missing_member_cancels_match(self):
+        await matchmaker.restore_pending_confirmations(self.bot)
+        pending = matchmaker.pending_matches[self.match_id]
+        lease = mock.patch.object(matchmaker.channel_pool, "lease", mock.AsyncMock()).start()
+        mock.patch.object(matchmaker.guilds, "get_guild").start()
+        mock.patch.object(matchmaker.members, "member",
+                          mock.AsyncMock(side_effect=lambda guild, pid: None if pid == "2" else mock.MagicMock())).start()
+        mock.patch.object(matchmaker, "request_matchmaking").start()
+        matchmaker.send_dm.reset_mock()
+
+        await matchmaker.start_confirmed_match(self.bot, pending)
+
+        lease.assert_not_awaited()
+        self.assertEqual(db.players.get("1").status, "IN_QUEUE")
+        self.assertEqual(db.players.get("2").status, "IDLE")
+        self.assertIn("1", queue_index)
+        matchmaker.send_dm.assert_awaited_once()
+        self.assertEqual(matchmaker.send_dm.await_args.args[1], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
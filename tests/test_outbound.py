@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+from collections import Counter
+from unittest import mock
+
+import retry
+from outbound import Dropped, Outbound, MATCH, PING, REPLY
+
+
+class OutboundRetryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        mock.patch.object(retry, "RETRY_BASE_SECONDS", 0.001).start()
+        self.outbound = Outbound()
+
+    async def asyncTearDown(self):
+        mock.patch.stopall()
+
+    async def test_idempotent_call_is_retried_after_timeout(self):
+        fn = mock.AsyncMock(side_effect=[asyncio.TimeoutError(), "ok"])
+        self.assertEqual(await self.outbound.call(REPLY, "channel:1", fn), "ok")
+        self.assertEqual(fn.await_count, 2)
+
+    async def test_send_is_not_repeated_after_timeout(self):
+        send = mock.AsyncMock(side_effect=[asyncio.TimeoutError(), "sent twice"])
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.outbound.call(REPLY, "dm:1", send, "hi", idempotent=False)
+        send.assert_awaited_once_with("hi")
+
+    async def test_send_is_retried_after_connection_error(self):
+        send = mock.AsyncMock(side_effect=[ConnectionResetError(), "ok"])
+        self.assertEqual(await self.outbound.call(REPLY, "dm:1", send, idempotent=False), "ok")
+
+
+class OutboundPriorityTest(unittest.IsolatedAsyncioTestCase):
+    async def test_higher_classes_go_first_and_stale_pings_are_dropped(self):
+        outbound = Outbound(concurrency=1)
+        order = []
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def record(name):
+            order.append(name)
+
+        first = asyncio.ensure_future(outbound.call(REPLY, "a", blocker))
+        await asyncio.sleep(0)
+        ping = asyncio.ensure_future(outbound.call(PING, "b", record, "ping", droppable=True, max_age=0))
+        match = asyncio.ensure_future(outbound.call(MATCH, "c", record, "match"))
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(first, match)
+
+        with self.assertRaises(Dropped):
+            await ping
+        self.assertEqual(order, ["match"])
+
+    async def test_bucket_runs_one_call_at_a_time_and_low_classes_are_capped(self):
+        outbound = Outbound(concurrency=4, low_priority_slots=1)
+        running = Counter()
+        peak = Counter()
+
+        async def record(key):
+            running[key] += 1
+            peak[key] = max(peak[key], running[key])
+            await asyncio.sleep(0.001)
+            running[key] -= 1
+
+        await asyncio.gather(
+            *(outbound.call(REPLY, "channel:1", record, "channel:1") for _ in range(5)),
+            *(outbound.call(PING, f"dm:{i}", record, "pings") for i in range(5)),
+        )
+        self.assertEqual(peak["channel:1"], 1)
+        self.assertEqual(peak["pings"], 1)
+        self.assertEqual(outbound.stats["sent"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import random
+import unittest
+
+from pairing import BatchPairing, GreedyPairing
+from queue_index import QueueIndex
+
+NOW = 100_000
+
+
+def make_index(players):
+    # players: (mmr, range, region_mask); queued one second apart, oldest first
+    index = QueueIndex()
+    ranges = {}
+    for i, (mmr, mmr_range, region_mask) in enumerate(players):
+        index.add(str(i), mmr, NOW - 1000 + i, region_mask)
+        ranges[str(i)] = mmr_range
+    index.loaded = True
+    return index, lambda entry: ranges[entry.discord_id]
+
+
+def compatible(a, b, range_for):
+    return bool(a.region_mask & b.region_mask) and abs(a.mmr - b.mmr) <= max(range_for(a), range_for(b))
+
+
+def max_pairs(entries, range_for):
+    # Brute force maximum matching
+    if len(entries) < 2:
+        return 0
+    first, rest = entries[0], entries[1:]
+    best = max_pairs(rest, range_for)
+    for i, other in enumerate(rest):
+        if compatible(first, other, range_for):
+            best = max(best, 1 + max_pairs(rest[:i] + rest[i + 1:], range_for))
+    return best
+
+
+def full_scan_greedy(entries, range_for):
+    # The pairing loop from before the queue index: every unmatched player,
+    # oldest first, takes the first later player in range
+    matched = set()
+    pairs = []
+    for i, p1 in enumerate(entries):
+        if p1.discord_id in matched:
+            continue
+        for p2 in entries[i + 1:]:
+            if p2.discord_id in matched:
+                continue
+            if abs(p1.mmr - p2.mmr) <= range_for(p1) and p1.region_mask & p2.region_mask:
+                matched.update((p1.discord_id, p2.discord_id))
+                pairs.append((p1.discord_id, p2.discord_id))
+                break
+    return pairs
+
+
+def random_players(rng, n):
+    return [(rng.randint(600, 1600), rng.randint(50, 400), rng.choice((1, 1, 2, 3, 4, 6))) for _ in range(n)]
+
+
+class BatchPairingTest(unittest.TestCase):
+    def pair(self, engine, players):
+        index, range_for = make_index(players)
+        entries = list(index.entries.values())
+        pairs = engine.pair(index, NOW, range_for)
+        return pairs, entries, range_for, index
+
+    def assert_valid(self, pairs, range_for, index):
+        seen = set()
+        for p1, p2 in pairs:
+            self.assertTrue(compatible(p1, p2, range_for), (p1, p2))
+            self.assertLess(p1.order, p2.order)
+            self.assertNotIn(p1.discord_id, seen)
+            self.assertNotIn(p2.discord_id, seen)
+            seen.update((p1.discord_id, p2.discord_id))
+        self.assertTrue(seen.isdisjoint(index.entries))
+
+    def test_reaches_past_neighbours(self):
+        pairs, _, range_for, index = self.pair(BatchPairing(), [(937, 331, 1), (1027, 374, 1), (1037, 212, 1), (1274, 205, 1)])
+        self.assert_valid(pairs, range_for, index)
+        self.assertEqual(len(pairs), 2)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(4)
+        for _ in range(300):
+            players = random_players(rng, rng.randint(2, 10))
+            pairs, entries, range_for, index = self.pair(BatchPairing(), players)
+            self.assert_valid(pairs, range_for, index)
+            self.assertEqual(len(pairs), max_pairs(entries, range_for), players)
+
+    def test_never_fewer_pairs_than_greedy(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            players = random_players(rng, rng.randint(2, 60))
+            batch, _, range_for, index = self.pair(BatchPairing(), players)
+            self.assert_valid(batch, range_for, index)
+            greedy, _, _, _ = self.pair(GreedyPairing(), players)
+            self.assertGreaterEqual(len(batch), len(greedy), players)
+
+
+class GreedyPairingTest(unittest.TestCase):
+    def test_matches_full_scan(self):
+        rng = random.Random(11)
+        for _ in range(300):
+            index = QueueIndex()
+            ranges = {}
+            for i in range(rng.randint(0, 60)):
+                # Coarse queue times so ties on queued_at are common
+                index.add(str(i), rng.randint(600, 1600), NOW - rng.randint(0, 20) * 60, rng.choice((1, 2, 3, 4, 6)))
+                ranges[str(i)] = rng.randint(0, 300)
+            index.loaded = True
+            range_for = lambda entry: ranges[entry.discord_id]
+            expected = full_scan_greedy(index.oldest_first(), range_for)
+
+            pairs = GreedyPairing().pair(index, NOW, range_for)
+            self.assertEqual([(p1.discord_id, p2.discord_id) for p1, p2 in pairs], expected)
+            self.assertFalse({discord_id for pair in expected for discord_id in pair} & set(index.entries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import random
+import unittest
+
+from player_cache import PlayerCache, PlayerRecord
+
+
+class PingIndexTest(unittest.TestCase):
+    def test_in_range_matches_a_scan(self):
+        rng = random.Random(4)
+        cache = PlayerCache()
+        cache.load([
+            (str(i), f"p{i}", "epic", rng.randint(600, 1400), None, 0, 0,
+             rng.choice(("IDLE", "IN_QUEUE", "IN_MATCH")), None, rng.randint(0, 63), rng.choice((0, 1, 2)), None)
+            for i in range(500)
+        ])
+        for _ in range(2000):
+            discord_id = str(rng.randrange(500))
+            field, value = rng.choice((
+                ("status", rng.choice(("IDLE", "IN_QUEUE"))),
+                ("ping", rng.choice((0, 1, 2))),
+                ("mmr", rng.randint(600, 1400)),
+                ("region_mask", rng.randint(0, 63)),
+            ))
+            cache.update(discord_id, **{field: value})
+        cache.put(PlayerRecord("new", mmr=1000, region_mask=1, ping=1))
+
+        for _ in range(200):
+            low = rng.randint(600, 1400)
+            high = low + rng.uniform(0, 300)
+            mask = rng.randint(1, 63)
+            expected = {
+                r.discord_id for r in cache.records.values()
+                if r.ping and r.status == "IDLE" and r.region_mask & mask and low <= r.mmr <= high
+            }
+            found = cache.pings.in_range(low, high, mask)
+            self.assertEqual(len(found), len(set(found)))
+            self.assertEqual(set(found), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
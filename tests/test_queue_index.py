@@ -0,0 +1,105 @@
+import random
+import unittest
+
+from deadlines import DeadlineHeap
+from queue_index import QueueIndex
+from regions import REGION_BITS
+
+
+class QueueIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = QueueIndex()
+
+    def test_add_replaces_and_remove_clears_buckets(self):
+        self.index.add(1, 1000, 10, REGION_BITS["NA"] | REGION_BITS["EU"])
+        self.index.add("1", 1200, 20, REGION_BITS["EU"])
+
+        self.assertEqual(len(self.index), 1)
+        self.assertNotIn("NA", self.index.buckets)
+        self.assertEqual(self.index.buckets["EU"], [(1200, 1, "1")])
+
+        self.assertEqual(self.index.remove(1).mmr, 1200)
+        self.assertIsNone(self.index.remove(1))
+        self.assertEqual(dict(self.index.buckets), {})
+        self.assertEqual(len(self.index.by_age), 0)
+
+    def test_oldest_first_breaks_ties_by_arrival(self):
+        self.index.add("a", 1000, 50, 1)
+        self.index.add("b", 1000, 40, 1)
+        self.index.add("c", 1000, 50, 1)
+        self.assertEqual([e.discord_id for e in self.index.oldest_first()], ["b", "a", "c"])
+
+    def test_pop_queued_before(self):
+        for i, queued_at in enumerate((30, 10, 20, 40)):
+            self.index.add(str(i), 1000, queued_at, 1)
+        self.index.remove("2")
+        self.index.add("1", 1000, 35, 1)  # Re-queued later
+
+        expired = self.index.pop_queued_before(30)
+        self.assertEqual([e.discord_id for e in expired], ["0"])
+        self.assertEqual(sorted(self.index.entries), ["1", "3"])
+        self.assertEqual(self.index.oldest_queued_at(), 35)
+
+    def test_in_range(self):
+        for i, mmr in enumerate((900, 1000, 1100, 1200)):
+            self.index.add(str(i), mmr, i, REGION_BITS["NA"])
+        self.index.add("eu", 1000, 9, REGION_BITS["EU"])
+        found = [e.discord_id for e in self.index.in_range("NA", 1000, 1100)]
+        self.assertEqual(found, ["1", "2"])
+        self.assertEqual(list(self.index.in_range("OCE", 0, 5000)), [])
+
+    def test_nearest_later_diff_matches_a_scan(self):
+        rng = random.Random(5)
+        for _ in range(200):
+            index = QueueIndex()
+            for i in range(rng.randint(1, 30)):
+                index.add(str(i), rng.randint(800, 1200), rng.randint(0, 20), rng.randint(1, 7))
+            for entry in index.entries.values():
+                beyond = rng.choice((0, 0, 25, 100))
+                diffs = [
+                    abs(other.mmr - entry.mmr)
+                    for other in index.entries.values()
+                    if other.order > entry.order and other.region_mask & entry.region_mask
+                    and abs(other.mmr - entry.mmr) > beyond
+                ]
+                expected = min(diffs) if diffs else None
+                self.assertEqual(index.nearest_later_diff(entry, beyond), expected)
+
+
+class DeadlineHeapTest(unittest.TestCase):
+    def test_reschedule_and_cancel_leave_no_stale_deadlines(self):
+        heap = DeadlineHeap()
+        heap.schedule("a", 10)
+        heap.schedule("b", 20)
+        heap.schedule("c", 30)
+        heap.schedule("a", 25)
+        heap.cancel("b")
+
+        self.assertEqual(len(heap), 2)
+        self.assertNotIn("b", heap)
+        self.assertEqual(heap.next_deadline(), 25)
+        self.assertEqual(heap.pop_due(20), [])
+        self.assertEqual(heap.pop_due(30), ["a", "c"])
+        self.assertIsNone(heap.next_deadline())
+
+    def test_pop_due_order(self):
+        rng = random.Random(9)
+        heap = DeadlineHeap()
+        live = {}
+        for _ in range(500):
+            key = rng.randint(0, 50)
+            if rng.random() < 0.2:
+                heap.cancel(key)
+                live.pop(key, None)
+            else:
+                live[key] = rng.randint(0, 1000)
+                heap.schedule(key, live[key])
+
+        due = heap.pop_due(500)
+        self.assertEqual(sorted(due), sorted(k for k, when in live.items() if when <= 500))
+        self.assertEqual([live[k] for k in due], sorted(live[k] for k in due))
+        self.assertEqual(len(heap), sum(when > 500 for when in live.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import bisect
+import random
+import unittest
+from types import SimpleNamespace
+
+from rank_index import RankIndex, _SortedKeys
+
+
+class SortedKeysTest(unittest.TestCase):
+    def test_matches_a_sorted_list(self):
+        rng = random.Random(7)
+        for _ in range(30):
+            reference = sorted(rng.sample(range(10_000), rng.randint(0, 1500)))
+            keys = _SortedKeys(reference)
+            for _ in range(1500):
+                if reference and rng.random() < 0.5:
+                    key = rng.choice(reference)
+                    reference.remove(key)
+                    keys.remove(key)
+                else:
+                    key = rng.random() * 10_000
+                    bisect.insort(reference, key)
+                    keys.add(key)
+                probe = rng.random() * 10_000
+                self.assertEqual(keys.index(probe), bisect.bisect_left(reference, probe))
+                start = rng.randint(0, len(reference))
+                self.assertEqual(keys.slice(start, start + 5), reference[start:start + 5])
+            self.assertEqual(list(keys), reference)
+            self.assertEqual(len(keys), len(reference))
+
+
+class RankIndexTest(unittest.TestCase):
+    def test_positions_follow_updates(self):
+        rng = random.Random(3)
+        records = {
+            str(i): SimpleNamespace(discord_id=str(i), mmr=rng.randint(500, 1500), wins=1, losses=0)
+            for i in range(2000)
+        }
+        index = RankIndex()
+        index.load(records.values())
+        for _ in range(3000):
+            record = rng.choice(list(records.values()))
+            record.mmr = rng.randint(500, 1500)
+            record.wins, record.losses = rng.choice([(0, 0), (1, 0), (2, 1)])
+            index.update(record)
+
+        standings = sorted((-r.mmr, r.discord_id) for r in records.values() if r.wins or r.losses)
+        self.assertEqual(len(index), len(standings))
+        for position, (neg_mmr, discord_id) in enumerate(standings[:100], start=1):
+            self.assertEqual(index.position(discord_id), position)
+            around = index.around(discord_id)
+            expected = standings[max(position - 3, 0):position + 2]
+            self.assertEqual([other for _, other, _ in around], [other for _, other in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
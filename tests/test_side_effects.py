@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from side_effects import SideEffects
+
+
+class SideEffectsTest(unittest.IsolatedAsyncioTestCase):
+    async def drain(self, side_effects):
+        while side_effects.lanes:
+            await asyncio.sleep(0)
+
+    async def test_lane_runs_in_order_and_skips_duplicates(self):
+        side_effects = SideEffects()
+        order = []
+
+        async def job(name):
+            await asyncio.sleep(0.001)
+            order.append(name)
+
+        self.assertTrue(side_effects.submit("lane", "first", job, "first"))
+        self.assertTrue(side_effects.submit("lane", "second", job, "second"))
+        self.assertFalse(side_effects.submit("lane", "first", job, "again"))
+        await self.drain(side_effects)
+        self.assertFalse(side_effects.submit("lane", "second", job, "again"))
+
+        self.assertEqual(order, ["first", "second"])
+        self.assertEqual(side_effects.stats["skipped"], 2)
+
+    async def test_failed_job_runs_once_and_can_be_resubmitted(self):
+        side_effects = SideEffects()
+        job = mock.AsyncMock(side_effect=[ConnectionResetError(), None])
+
+        side_effects.submit("lane", "key", job)
+        await self.drain(side_effects)
+        self.assertEqual(job.await_count, 1)
+        self.assertEqual(side_effects.stats["failed"], 1)
+
+        self.assertTrue(side_effects.submit("lane", "key", job))
+        await self.drain(side_effects)
+        self.assertEqual(side_effects.stats["succeeded"], 1)
+
+    async def test_lanes_share_the_concurrency_limit(self):
+        side_effects = SideEffects(concurrency=2)
+        running = 0
+        peak = 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+
+        for lane in range(5):
+            side_effects.submit(lane, lane, job)
+        await self.drain(side_effects)
+        self.assertEqual(peak, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
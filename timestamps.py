@@ -0,0 +1,37 @@
+import datetime
+import time
+
+# Every timestamp column (queue_time, ping_time, rankcheck_date, created_at)
+# holds integer seconds since the epoch, UTC. Convert at the edges only.
+
+
+def now_ts() -> int:
+    return int(time.time())
+
+
+def to_epoch(value) -> int | None:
+    # Accepts what older rows and callers may hold: epoch numbers, datetimes
+    # (naive ones are UTC) and ISO strings, including sqlite's
+    # "YYYY-MM-DD HH:MM:SS" CURRENT_TIMESTAMP format.
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(float(value))
+        except ValueError:
+            value = datetime.datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.UTC)
+    return int(value.timestamp())
+
+
+def to_datetime(ts) -> datetime.datetime | None:
+    if ts is None:
+        return None
+    return datetime.datetime.fromtimestamp(ts, datetime.UTC)
+
+
+def discord_timestamp(ts, style="R") -> str:
+    return f"<t:{int(ts)}:{style}>"
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+# Bounded LRU whose entries expire, with one in-flight fetch per key.
+# get_or_fetch returns a live cached value, or waits on the fetch already
+# running for the key, or starts `fetch()`. The fetch decides what gets
+# cached (and for how long) by calling put() itself, so failures can be
+# left uncached.
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires at, value)
+        self.inflight = {}  # key -> task fetching it
+        self.hits = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self.entries[key]
+            return default
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value, ttl=None):
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def get_or_fetch(self, key, fetch):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await task
+
+        task = asyncio.get_running_loop().create_task(fetch())
+        self.inflight[key] = task
+        try:
+            return await task
+        finally:
+            self.inflight.pop(key, None)
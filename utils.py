@@ -1,10 +1,3 @@
-import discord
-import sqlite3
-from collections import defaultdict
-import re
-import logging
-import datetime
-
 FEER_GUILD_ID = 491059327038259231
 
 def get_rank(mmr: int) -> str:
@@ -40,47 +33,3 @@ REGION_EMOJIS = {
     "MENA": "🇸🇦",
     "OCE": "🇦🇺",
 }
-
-def create_queue_embed(description) -> discord.Embed:
-    # Connect to the database and fetch queued players
-    conn = sqlite3.connect("mmr.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT mmr, queue_time, regions FROM players WHERE queue_status = 'IN_QUEUE'"
-    )
-    rows = cursor.fetchall()
-    conn.close()
-
-    now = datetime.datetime.now(datetime.UTC)
-
-    embed = discord.Embed(
-        title="🔒 Queue Updated",
-        description=f"{description}\n\n**Current Queue Status:**",
-        color=discord.Color.blurple()
-    )
-
-    if not rows:
-        embed.description += "\n\nQueue is empty."
-    else:
-        lines = []
-        for mmr, queue_time, region_roles in rows:
-            try:
-                # Ensure queue_time is parsed as UTC datetime if it's stored as a string
-                if isinstance(queue_time, str):
-                    queue_time = datetime.datetime.fromisoformat(queue_time)
-                delta = now - queue_time
-
-                rank = get_rank(mmr)
-                queued_for = f"<t:{int(queue_time.timestamp())}:R>"
-
-                region_list = sorted(filter(None, re.split(r"[,\s]+", region_roles.strip())))
-                region_emojis = [REGION_EMOJIS.get(r, r) for r in region_list]
-                region_str = "".join(region_emojis) if region_emojis else "🌍"
-
-                lines.append(f"{region_str} - {rank} ({queued_for})")
-            except Exception as e:
-                logging.warning(f"Failed to format queue entry: {e}")
-
-        embed.description += "\n\n" + "\n".join(lines)
-
-    return embed